@@ -1,4 +1,4 @@
-from flask import Flask, jsonify, request, send_file
+from flask import Flask, jsonify, request, send_file, Response, stream_with_context, g
 from flask_cors import CORS
 import numpy as np
 import pandas as pd
@@ -10,64 +10,154 @@ from sklearn.decomposition import PCA
 import joblib
 import os
 import csv
+import base64
+import json
+import tempfile
+import threading
+import time
+from inference import (
+    MODELS, SCALERS, PIPELINES, LOAD_STATS, LOAD_CONFIG, FEATURE_NAMES, VALID_MODELS,
+    FALLBACK, PREPROCESSING, load_models, available_models, get_pipeline, input_warnings,
+    preprocess, predict_proba_batch, fallback_probabilities, conversion_result, batch_result
+)
+from batcher import BatchTimeoutError, MicroBatcher, QueueFullError
+from inference_pool import InferencePool, PoolBusyError, PoolTimeoutError
+from prediction_cache import PredictionCache, parse_quantize, PREDICTION_CACHE_QUANTIZE
+from shared_cache import SharedPredictionCache
+from request_schema import FEATURE_SCHEMA, FeatureSchema, SchemaError, UnsupportedPayload, decode_payload
+from telemetry import (
+    REGISTRY, CONTENT_TYPE, REQUESTS, REQUEST_SECONDS, IN_FLIGHT, STAGE_SECONDS, PREDICTED_ROWS, observe_stages
+)
+from reloader import ModelWatcher, reload_now, reload_in_background, reload_status
+from dataset_store import get_store, source_signature, to_records
+from dataset_stats import get_stats
+from pca_projection import PCA_JOB, PCA_SAMPLE_SIZE, get_projection
+from clustering import CLUSTER_JOB, N_CLUSTERS, cluster_summary, get_clusters
+from evaluation import EVALUATION_JOB, MODEL_DISPLAY_NAMES, get_evaluation, model_versions
+from feature_importance import IMPORTANCE_JOB, get_importances, ranked
+from response_cache import ResponseCache
+from streaming import DEFAULT_CHUNK_SIZE, OUTPUT_FORMATS, iter_scored_chunks, serialize_chunks
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 app = Flask(__name__)
 CORS(app)
 
-# Load models if they exist
-MODELS = {}
-SCALERS = {}
-MODELS_DIR = 'models'
-SCALERS_DIR = os.path.join(MODELS_DIR, 'scalers')
-
-def load_models():
-    """Load trained models if they exist"""
-    model_files = {
-        'random_forest': 'random_forest_model.pkl',
-        'gradient_boosting': 'gradient_boosting_model.pkl',
-        'logistic_regression': 'logistic_regression_model.pkl',
-        'svm': 'svm_model.pkl',
-        'pca_lr': 'pca_lr_model.pkl'
-    }
-    
-    for name, filename in model_files.items():
-        model_path = os.path.join(MODELS_DIR, filename)
-        if os.path.exists(model_path):
-            try:
-                MODELS[name] = joblib.load(model_path)
-                print(f"Loaded {name} model")
-            except Exception as e:
-                print(f"Could not load {name}: {e}")
-    
-    # Load scalers
-    scaler_files = {
-        'random_forest': 'random_forest_scaler.pkl',
-        'gradient_boosting': 'gradient_boosting_scaler.pkl',
-        'logistic_regression': 'logistic_regression_scaler.pkl',
-        'svm': 'svm_scaler.pkl',
-        'pca_lr': 'pca_lr_scaler.pkl'
-    }
-    
-    for name, filename in scaler_files.items():
-        scaler_path = os.path.join(SCALERS_DIR, filename)
-        if os.path.exists(scaler_path):
-            try:
-                SCALERS[name] = joblib.load(scaler_path)
-                print(f"Loaded {name} scaler")
-            except Exception as e:
-                print(f"Could not load {name} scaler: {e}")
-    
-    # Load PCA for PCA+LR model
-    pca_path = os.path.join(SCALERS_DIR, 'pca_transformer.pkl')
-    if os.path.exists(pca_path):
-        try:
-            SCALERS['pca'] = joblib.load(pca_path)
-            print("Loaded PCA transformer")
-        except Exception as e:
-            print(f"Could not load PCA: {e}")
+@app.before_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    IN_FLIGHT.inc()
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    REQUESTS.labels(endpoint, request.method, str(response.status_code)).inc()
+    started = g.get('request_started')
+    if started is not None:
+        REQUEST_SECONDS.labels(endpoint, request.method).observe(time.perf_counter() - started)
+    return response
+
+@app.teardown_request
+def finish_request_metrics(error=None):
+    if g.pop('request_started', None) is not None:
+        IN_FLIGHT.dec()
 
-# Try loading models on startup
-load_models()
+# Largest page /api/dataset/preview will return
+MAX_PREVIEW_ROWS = 1000
+
+# Inference pool processes started by `python app.py` re-import this file as
+# __mp_main__; they load their own models and must not start any services
+IN_POOL_WORKER = __name__ == '__mp_main__'
+
+# Try loading models on startup.
+# LAZY_MODELS=1 defers each model until first use; MMAP_MODELS=1 memory-maps
+# artifact arrays so forked workers share them through the page cache.
+if not IN_POOL_WORKER:
+    load_models(
+        lazy=os.environ.get('LAZY_MODELS') == '1',
+        mmap=os.environ.get('MMAP_MODELS') == '1'
+    )
+
+# Reload changed artifacts under models/ every N seconds (MODEL_WATCH_INTERVAL)
+WATCHER = None
+if float(os.environ.get('MODEL_WATCH_INTERVAL', 0)) > 0 and not IN_POOL_WORKER:
+    WATCHER = ModelWatcher(float(os.environ['MODEL_WATCH_INTERVAL'])).start()
+    print(f"Watching model artifacts every {WATCHER.interval:g} s")
+
+# Opt-in process pool for the CPU-heavy models (INFERENCE_WORKERS=N), so
+# their predict_proba does not hold the GIL of the request threads
+POOL = None
+POOL_MODELS = os.environ.get('INFERENCE_POOL_MODELS', 'random_forest,gradient_boosting').split(',')
+if int(os.environ.get('INFERENCE_WORKERS', 0)) > 0 and not IN_POOL_WORKER:
+    POOL = InferencePool(
+        workers=int(os.environ['INFERENCE_WORKERS']),
+        max_pending=int(os.environ.get('INFERENCE_MAX_PENDING', 64)),
+        timeout=float(os.environ.get('INFERENCE_TIMEOUT', 10)),
+        chunk_rows=int(os.environ.get('INFERENCE_CHUNK_ROWS', 5000))
+    )
+    if os.environ.get('INFERENCE_POOL_WARM', '1') == '1':
+        threading.Thread(target=POOL.warm, name="inference-pool-warm", daemon=True).start()
+    print(f"Inference pool enabled: {POOL.workers} processes for {', '.join(POOL_MODELS)}")
+
+def run_model(X, model_name):
+    """Probabilities for X, run in the inference pool for heavy models when it is enabled"""
+    if POOL is not None and model_name in POOL_MODELS:
+        # Stages run in the pool process; here the whole round trip is one stage
+        started = time.perf_counter()
+        probabilities = POOL.predict_proba(X, model_name)
+        STAGE_SECONDS.labels(model_name, 'model', 'pool').observe(time.perf_counter() - started)
+        PREDICTED_ROWS.labels(model_name, 'model').inc(len(X))
+        return probabilities
+    return predict_proba_batch(X, model_name, strict=True)
+
+# Probabilities of recently seen feature rows (PREDICTION_CACHE_SIZE=0 disables it).
+# PREDICTION_CACHE_BACKEND=sqlite shares one cache between all worker processes.
+if os.environ.get('PREDICTION_CACHE_BACKEND', 'memory') == 'sqlite':
+    PREDICTION_CACHE = SharedPredictionCache(quantize=parse_quantize(PREDICTION_CACHE_QUANTIZE))
+else:
+    PREDICTION_CACHE = PredictionCache(quantize=parse_quantize(PREDICTION_CACHE_QUANTIZE))
+
+def score_matrix(X, model_name, score_fn=run_model):
+    """Probabilities for X, answered from the prediction cache where possible"""
+    return PREDICTION_CACHE.score(X, model_name, score_fn)
+
+def score_request(X, model_name, score_fn=run_model):
+    """
+    (probabilities, whether the rule-based fallback answered). A model
+    that is missing or raises is scored by the fallback, which is never
+    cached, on the same preprocessed rows as predict_proba_batch.
+    """
+    if get_pipeline(model_name) is None:
+        return fallback_probabilities(preprocess(X), model_name), True
+    try:
+        return score_matrix(X, model_name, score_fn), False
+    except (QueueFullError, BatchTimeoutError, PoolBusyError, PoolTimeoutError):
+        raise
+    except Exception as e:
+        print(f"Error using model {model_name}: {e}")
+        return fallback_probabilities(preprocess(X), model_name, f"{type(e).__name__}: {e}"), True
+
+# Opt-in micro-batching of concurrent /api/predict calls (MICROBATCH=1)
+BATCHER = None
+if os.environ.get('MICROBATCH') == '1' and not IN_POOL_WORKER:
+    BATCHER = MicroBatcher(
+        run_model,
+        max_batch_rows=int(os.environ.get('MICROBATCH_MAX_ROWS', 64)),
+        max_wait_ms=float(os.environ.get('MICROBATCH_WAIT_MS', 2.0)),
+        max_queue=int(os.environ.get('MICROBATCH_MAX_QUEUE', 10000)),
+        timeout=float(os.environ.get('MICROBATCH_TIMEOUT', 10))
+    )
+    print(f"Micro-batching enabled: {BATCHER.max_batch_rows} rows / {BATCHER.max_wait * 1000:.1f} ms")
+
+def batcher_score(X, model_name):
+    """score_fn that sends cache misses through the micro-batcher, all rows queued at once"""
+    return BATCHER.predict_many(model_name, X)
+
+# Rendered responses of the dashboard endpoints, re-rendered when their inputs change
+RESPONSE_CACHE = ResponseCache()
 
 # Model metrics data (from your notebooks)
 MODEL_METRICS = [
@@ -118,92 +208,130 @@ MODEL_METRICS = [
     }
 ]
 
-def predict_conversion(data, model_name='svm'):
+
+def dataset_search_paths():
+    """Candidate locations for ad_campaign_data.csv"""
+    # Get the backend directory (where app.py is)
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    project_root = os.path.dirname(backend_dir)
+    
+    # Try multiple possible paths
+    return [
+        os.path.join(project_root, 'ad_campaign_data.csv'),  # Project root
+        os.path.join(backend_dir, 'ad_campaign_data.csv'),   # Backend folder
+        os.path.join(os.getcwd(), 'ad_campaign_data.csv'),   # Current working directory
+        'ad_campaign_data.csv',                               # Relative
+        os.path.join('..', 'ad_campaign_data.csv')           # Parent directory
+    ]
+
+_dataset_path = {"path": None}
+
+def find_dataset_path():
+    """Absolute path of the first dataset candidate that exists, or None"""
+    # Reuse the last hit instead of probing every candidate on each request
+    cached = _dataset_path["path"]
+    if cached and os.path.exists(cached):
+        return cached
+    for path in dataset_search_paths():
+        abs_path = os.path.abspath(path)
+        if os.path.exists(abs_path):
+            print(f"Found dataset at: {abs_path}")
+            _dataset_path["path"] = abs_path
+            return abs_path
+    return None
+
+def current_dataset_stats():
+    """Cached streaming statistics for the dataset, refreshed in the background"""
+    dataset_path = find_dataset_path()
+    if dataset_path is None:
+        return None
+    return get_stats(dataset_path)
+
+def warm_dataset_caches(background=True):
     """
-    Predict conversion using loaded models or fallback to rule-based.
+    Start the dataset and model analysis jobs off the request path.
+    serve.py runs them with background=False before forking workers.
     """
-    # Extract features (matching your actual feature set)
-    features = np.array([[
-        data['age'],
-        data['gender'],
-        data['location'],
-        data['device_type'],
-        data['impressions'],
-        data['clicks'],
-        data['engagement_duration'],
-        data['sentiment_score'],
-        data['previous_interaction_score'],
-        data['ad_category']
-    ]])
-    
-    # Try to use actual model if available
-    if model_name in MODELS:
+    dataset_path = find_dataset_path()
+    if dataset_path is None:
+        return
+    jobs = [
+        ("dataset statistics", get_stats),
+        ("PCA projection", get_projection),
+        ("clustering", get_clusters),
+        ("model evaluation", get_evaluation),
+        ("feature importance", get_importances)
+    ]
+    for name, job in jobs:
         try:
-            model = MODELS[model_name]
-            scaler = SCALERS.get(model_name, None)
-            
-            # Scale features if scaler exists
-            if scaler:
-                features = scaler.transform(features)
-            
-            # Handle PCA for PCA+LR model
-            if model_name == 'pca_lr' and 'pca' in SCALERS:
-                features = SCALERS['pca'].transform(features)
-            
-            # Get prediction
-            probability = model.predict_proba(features)[0][1]
-            
-            prediction = "Will Convert" if probability > 0.5 else "Will Not Convert"
-            confidence = "High" if abs(probability - 0.5) > 0.3 else "Medium" if abs(probability - 0.5) > 0.15 else "Low"
-            
-            return {
-                "probability": float(probability),
-                "prediction": prediction,
-                "confidence": confidence
-            }
+            job(dataset_path, background=background)
         except Exception as e:
-            print(f"Error using model {model_name}: {e}")
-            # Fall through to rule-based
-    
-    # Fallback to rule-based prediction
-    ctr = data['clicks'] / max(data['impressions'], 1)
-    score = (
-        (ctr * 0.3) +
-        (data['engagement_duration'] / 100 * 0.2) +
-        (data['sentiment_score'] * 0.2) +
-        (data['previous_interaction_score'] * 0.2) +
-        (data['clicks'] / max(data['impressions'], 1) * 0.1)
-    )
-    
-    if model_name == 'svm':
-        probability = min(0.95, max(0.05, score * 0.9))
-    elif model_name == 'random_forest':
-        probability = min(0.95, max(0.05, score))
-    elif model_name == 'logistic_regression':
-        probability = min(0.95, max(0.05, score * 1.1))
-    else:
-        probability = min(0.95, max(0.05, score))
-    
-    prediction = "Will Convert" if probability > 0.5 else "Will Not Convert"
-    confidence = "High" if abs(probability - 0.5) > 0.3 else "Medium" if abs(probability - 0.5) > 0.15 else "Low"
-    
-    return {
-        "probability": float(probability),
-        "prediction": prediction,
-        "confidence": confidence
-    }
+            print(f"Could not start {name}: {e}")
+
+if os.environ.get('DATASET_PRECOMPUTE', '1') == '1' and not IN_POOL_WORKER:
+    warm_dataset_caches()
+
+def current_evaluation():
+    """Cached held-out evaluation of the loaded models, or None while it is computed"""
+    dataset_path = find_dataset_path()
+    if dataset_path is None:
+        return None
+    result, status = get_evaluation(dataset_path)
+    return result
+
+def dataset_version():
+    """Signature of the dataset file, or None if there is none"""
+    dataset_path = find_dataset_path()
+    if dataset_path is None:
+        return None
+    try:
+        return source_signature(dataset_path)
+    except OSError:
+        return None
+
+def analysis_version(*jobs):
+    """Cache version of an endpoint built from the dataset, the models and background jobs"""
+    return (dataset_version(), model_versions(), [job.computed_at for job in jobs])
+
+def stats_version():
+    stats = current_dataset_stats()
+    return (dataset_version(), stats.source if stats is not None else None)
+
+def json_response(payload, status=200):
+    """JSON response encoded with orjson when it is installed; keys keep their order"""
+    if orjson is None:
+        return Response(json.dumps(payload), status=status, mimetype='application/json')
+    return Response(orjson.dumps(payload), status=status, mimetype='application/json')
 
 @app.route('/api/models', methods=['GET'])
+@RESPONSE_CACHE.cached(lambda: analysis_version(EVALUATION_JOB))
 def get_models():
-    """Return all model metrics"""
-    return jsonify(MODEL_METRICS)
+    """Return all model metrics, measured on the held-out split once evaluated"""
+    evaluation = current_evaluation()
+    if evaluation is None:
+        return jsonify(MODEL_METRICS)
+    
+    # Training times are not measured here; keep the notebook's
+    training_times = {metrics["name"]: metrics["training_time"] for metrics in MODEL_METRICS}
+    models = []
+    for key, result in evaluation["models"].items():
+        name = MODEL_DISPLAY_NAMES.get(key, key)
+        models.append(dict(
+            result["metrics"],
+            name=name,
+            training_time=training_times.get(name, 0.0),
+            test_rows=evaluation["test_rows"]
+        ))
+    return jsonify(models)
 
 @app.route('/api/dataset', methods=['GET'])
 def get_dataset_info():
     """Return dataset information"""
+    stats = current_dataset_stats()
     return jsonify({
         "name": "ad_campaign_data.csv",
-        "records": 100000,
+        "records": stats.rows if stats else None,
+        "stats_ready": stats is not None,
         "features": [
             "user_id", "age", "gender", "location", "device_type",
             "ad_id", "ad_category", "impressions", "clicks", "conversions",
@@ -214,60 +342,90 @@ def get_dataset_info():
         "target": "conversions"
     })
 
+@app.route('/api/dataset/stats', methods=['GET'])
+def get_dataset_stats():
+    """Row count, null counts, moments and IQR bounds from a streaming pass"""
+    stats = current_dataset_stats()
+    if stats is None:
+        status = 202 if find_dataset_path() else 404
+        return jsonify({"error": "Dataset statistics are not available yet"}), status
+    return jsonify(stats.summary())
+
+def read_payload():
+    """Body of a scoring request as a dict (JSON, MessagePack or raw float32 rows)"""
+    return decode_payload(request.content_type, request.get_data(),
+                          lambda: request.get_json(silent=True), request.args)
+
 @app.route('/api/predict', methods=['POST'])
 def predict():
     """Make a prediction based on input features"""
     try:
-        if not request.is_json:
-            return jsonify({"error": "Request must be JSON"}), 400
-        
-        data = request.json
+        timings = {}
+        started = time.perf_counter()
+        try:
+            data = read_payload()
+        except UnsupportedPayload as e:
+            return jsonify({"error": str(e)}), 400
+        timings['decode'] = time.perf_counter() - started
         
         if data is None:
             return jsonify({"error": "No data provided"}), 400
         
-        # Validate required fields
-        required_fields = [
-            'age', 'gender', 'location', 'device_type', 'impressions',
-            'clicks', 'engagement_duration', 'sentiment_score',
-            'previous_interaction_score', 'ad_category', 'model'
-        ]
-        
-        missing_fields = [field for field in required_fields if field not in data]
-        if missing_fields:
+        if 'model' not in data:
             return jsonify({
-                "error": f"Missing fields: {', '.join(missing_fields)}",
-                "required_fields": required_fields
+                "error": "Missing fields: model",
+                "required_fields": FEATURE_NAMES + ['model']
             }), 400
         
-        model_name = data.get('model', 'svm')
+        model_name = data['model']
         
         # Validate model name
-        valid_models = ['random_forest', 'gradient_boosting', 'logistic_regression', 'svm', 'pca_lr']
-        if model_name not in valid_models:
+        if model_name not in VALID_MODELS:
             return jsonify({
                 "error": f"Invalid model name: {model_name}",
-                "valid_models": valid_models
+                "valid_models": VALID_MODELS
             }), 400
         
-        # Validate numeric fields
-        numeric_fields = ['age', 'gender', 'location', 'device_type', 'impressions',
-                         'clicks', 'engagement_duration', 'sentiment_score',
-                         'previous_interaction_score', 'ad_category']
-        for field in numeric_fields:
-            try:
-                float(data[field])
-            except (ValueError, TypeError):
-                return jsonify({"error": f"Invalid value for {field}: must be a number"}), 400
+        # Parse and validate every feature in one pass
+        started = time.perf_counter()
+        try:
+            if 'float32' in data:
+                X = FEATURE_SCHEMA.parse_float32(data['float32'])
+                if len(X) != 1:
+                    return jsonify({"error": f"Expected 1 row, got {len(X)}; use /api/predict/batch"}), 400
+            else:
+                X = FEATURE_SCHEMA.parse_row(data)
+        except SchemaError as e:
+            return jsonify(e.to_dict()), 400
+        timings['validation'] = time.perf_counter() - started
         
         # Make prediction using the selected model
-        result = predict_conversion(data, model_name)
+        try:
+            score_fn = batcher_score if BATCHER is not None else run_model
+            probabilities, fallback = score_request(X, model_name, score_fn)
+        except QueueFullError as e:
+            return jsonify({"error": str(e)}), 503
+        except BatchTimeoutError as e:
+            return jsonify({"error": str(e)}), 504
+        except PoolBusyError as e:
+            return jsonify({"error": str(e)}), 429, {"Retry-After": "1"}
+        except PoolTimeoutError as e:
+            return jsonify({"error": str(e)}), 504
+        result = conversion_result(probabilities[0])
         
         # Add model info to response
         result['model_used'] = model_name
         result['model_loaded'] = model_name in MODELS
+        result['fallback'] = fallback
+        warnings = input_warnings(X)
+        if warnings is not None:
+            result['input_warnings'] = warnings[0]
         
-        return jsonify(result)
+        started = time.perf_counter()
+        response = jsonify(result)
+        timings['serialization'] = time.perf_counter() - started
+        observe_stages(model_name, 'fallback' if fallback else 'model', timings)
+        return response
     
     except Exception as e:
         import traceback
@@ -278,52 +436,181 @@ def predict():
             "traceback": error_trace
         }), 500
 
+@app.route('/api/predict/batch', methods=['POST'])
+def predict_batch():
+    """
+    Score many rows in one request.
+    Accepts either "rows" (list of feature dicts or 10-value lists in
+    FEATURE_NAMES order), "columns" (dict of per-feature arrays) or
+    "float32" (MessagePack bytes); or a raw float32 body with ?model=.
+    """
+    try:
+        timings = {}
+        started = time.perf_counter()
+        try:
+            data = read_payload()
+        except UnsupportedPayload as e:
+            return jsonify({"error": str(e)}), 400
+        timings['decode'] = time.perf_counter() - started
+        
+        if data is None:
+            return jsonify({"error": "No data provided"}), 400
+        
+        model_name = data.get('model', 'svm')
+        if model_name not in VALID_MODELS:
+            return jsonify({
+                "error": f"Invalid model name: {model_name}",
+                "valid_models": VALID_MODELS
+            }), 400
+        
+        started = time.perf_counter()
+        try:
+            X = FEATURE_SCHEMA.parse_batch(data)
+        except SchemaError as e:
+            return jsonify(e.to_dict()), 400
+        timings['validation'] = time.perf_counter() - started
+        
+        try:
+            probabilities, fallback = score_request(X, model_name)
+            result = batch_result(probabilities)
+        except PoolBusyError as e:
+            return jsonify({"error": str(e)}), 429, {"Retry-After": "1"}
+        except PoolTimeoutError as e:
+            return jsonify({"error": str(e)}), 504
+        result['count'] = int(X.shape[0])
+        result['model_used'] = model_name
+        result['model_loaded'] = model_name in MODELS
+        result['fallback'] = fallback
+        
+        started = time.perf_counter()
+        response = jsonify(result)
+        timings['serialization'] = time.perf_counter() - started
+        observe_stages(model_name, 'fallback' if fallback else 'model', timings)
+        return response
+    
+    except Exception as e:
+        import traceback
+        error_trace = traceback.format_exc()
+        print(f"Error in predict_batch endpoint: {error_trace}")
+        return jsonify({
+            "error": str(e),
+            "traceback": error_trace
+        }), 500
+
+@app.route('/api/score/stream', methods=['GET', 'POST'])
+def score_stream():
+    """
+    Stream-score a CSV chunk by chunk.
+    POST a CSV body (or multipart "file") to score it; GET scores the
+    server-side ad_campaign_data.csv. Query params: model, format
+    (ndjson or csv), chunksize.
+    """
+    model_name = request.args.get('model', 'svm')
+    if model_name not in VALID_MODELS:
+        return jsonify({
+            "error": f"Invalid model name: {model_name}",
+            "valid_models": VALID_MODELS
+        }), 400
+    
+    output_format = request.args.get('format', 'ndjson')
+    if output_format not in OUTPUT_FORMATS:
+        return jsonify({
+            "error": f"Invalid format: {output_format}",
+            "valid_formats": OUTPUT_FORMATS
+        }), 400
+    
+    try:
+        chunksize = int(request.args.get('chunksize', DEFAULT_CHUNK_SIZE))
+        if chunksize <= 0:
+            raise ValueError
+    except ValueError:
+        return jsonify({"error": "chunksize must be a positive integer"}), 400
+    
+    upload_path = None
+    if request.method == 'POST':
+        if 'file' in request.files:
+            # Uploaded files are closed once the view returns, so spool to disk
+            fd, upload_path = tempfile.mkstemp(suffix='.csv')
+            os.close(fd)
+            request.files['file'].save(upload_path)
+            source = upload_path
+        else:
+            source = request.stream
+    else:
+        source = find_dataset_path()
+        if source is None:
+            return jsonify({
+                "error": "Dataset file not found. Please ensure ad_campaign_data.csv is in the project root.",
+                "searched_paths": [os.path.abspath(p) for p in dataset_search_paths()]
+            }), 404
+    
+    def generate():
+        try:
+            chunks = iter_scored_chunks(source, model_name, chunksize)
+            for text in serialize_chunks(chunks, output_format):
+                yield text
+        except Exception as e:
+            # Headers are already sent, so report the error in-band
+            print(f"Error in score_stream: {e}")
+            if output_format == 'ndjson':
+                yield json.dumps({"error": str(e)}) + '\n'
+        finally:
+            if upload_path:
+                os.remove(upload_path)
+    
+    mimetype = 'application/x-ndjson' if output_format == 'ndjson' else 'text/csv'
+    return Response(stream_with_context(generate()), mimetype=mimetype)
+
 @app.route('/api/dataset/preview', methods=['GET'])
 def dataset_preview():
     """Return preview of dataset"""
     try:
-        # Get the backend directory (where app.py is)
-        backend_dir = os.path.dirname(os.path.abspath(__file__))
-        project_root = os.path.dirname(backend_dir)
-        
-        # Try multiple possible paths
-        possible_paths = [
-            os.path.join(project_root, 'ad_campaign_data.csv'),  # Project root
-            os.path.join(backend_dir, 'ad_campaign_data.csv'),   # Backend folder
-            os.path.join(os.getcwd(), 'ad_campaign_data.csv'),   # Current working directory
-            'ad_campaign_data.csv',                               # Relative
-            os.path.join('..', 'ad_campaign_data.csv')           # Parent directory
-        ]
-        
-        dataset_path = None
-        for path in possible_paths:
-            abs_path = os.path.abspath(path)
-            if os.path.exists(abs_path):
-                dataset_path = abs_path
-                print(f"Found dataset at: {dataset_path}")
-                break
+        possible_paths = dataset_search_paths()
+        dataset_path = find_dataset_path()
         
         if dataset_path and os.path.exists(dataset_path):
             try:
-                df = pd.read_csv(dataset_path, nrows=100)  # First 100 rows
-                # Convert to dict, handling NaN values
-                data_records = []
-                for idx, row in df.head(50).iterrows():
-                    record = {}
-                    for col in df.columns:
-                        val = row[col]
-                        # Handle NaN and other non-serializable values
-                        if pd.isna(val):
-                            record[col] = None
-                        else:
-                            record[col] = val
-                    data_records.append(record)
+                try:
+                    offset = max(0, int(request.args.get('offset', 0)))
+                    limit = min(MAX_PREVIEW_ROWS, max(0, int(request.args.get('limit', 50))))
+                except ValueError:
+                    return jsonify({"error": "offset and limit must be integers"}), 400
+                columns = request.args.get('columns')
+                columns = [col for col in columns.split(',') if col] if columns else None
                 
-                return jsonify({
-                    "columns": df.columns.tolist(),
+                store = get_store(dataset_path)
+                if store is not None:
+                    all_columns = store.columns
+                    total_rows = store.total_rows
+                else:
+                    # Cache is still being built; read just this page from the CSV
+                    all_columns = pd.read_csv(dataset_path, nrows=0).columns.tolist()
+                    total_rows = None
+                
+                if columns:
+                    unknown = [col for col in columns if col not in all_columns]
+                    if unknown:
+                        return jsonify({
+                            "error": f"Unknown columns: {', '.join(unknown)}",
+                            "columns": all_columns
+                        }), 400
+                columns = columns or all_columns
+                
+                if store is not None:
+                    page = store.read(offset, limit, columns)
+                else:
+                    df = pd.read_csv(dataset_path, skiprows=range(1, offset + 1), nrows=limit, usecols=columns)
+                    page = {col: (df[col].to_numpy(), df[col].isna().to_numpy()) for col in columns}
+                data_records = to_records(page)
+                
+                return json_response({
+                    "columns": columns,
                     "data": data_records,
-                    "total_rows": 100000,  # From your notebook
-                    "preview_rows": len(df.head(50))
+                    "total_rows": total_rows,
+                    "preview_rows": len(data_records),
+                    "offset": offset,
+                    "limit": limit,
+                    "cached": store is not None
                 })
             except Exception as csv_error:
                 print(f"Error reading CSV: {csv_error}")
@@ -363,8 +650,14 @@ def dataset_preview():
         }), 500
 
 @app.route('/api/visualizations/roc', methods=['GET'])
+@RESPONSE_CACHE.cached(lambda: analysis_version(EVALUATION_JOB))
 def get_roc_data():
     """Return ROC curve data for all models"""
+    evaluation = current_evaluation()
+    if evaluation is not None:
+        return jsonify({key: result["roc"] for key, result in evaluation["models"].items()})
+    
+    # Notebook curves until the evaluation job has finished
     roc_data = {
         "random_forest": {
             "fpr": [0.0, 0.01, 0.02, 0.03, 0.04, 0.05, 0.06, 0.07, 0.08, 0.09, 0.1, 0.12, 0.15, 0.2, 0.25, 0.3, 0.35, 0.4, 0.45, 0.5, 0.55, 0.6, 0.65, 0.7, 0.75, 0.8, 0.85, 0.9, 0.95, 1.0],
@@ -395,8 +688,14 @@ def get_roc_data():
     return jsonify(roc_data)
 
 @app.route('/api/visualizations/confusion_matrix', methods=['GET'])
+@RESPONSE_CACHE.cached(lambda: analysis_version(EVALUATION_JOB))
 def get_confusion_matrices():
     """Return confusion matrix data for all models"""
+    evaluation = current_evaluation()
+    if evaluation is not None:
+        return jsonify({key: result["confusion_matrix"] for key, result in evaluation["models"].items()})
+    
+    # Notebook matrices until the evaluation job has finished
     matrices = {
         "random_forest": [[288, 12], [108, 192]],
         "logistic_regression": [[285, 15], [0, 300]],
@@ -407,116 +706,269 @@ def get_confusion_matrices():
     return jsonify(matrices)
 
 @app.route('/api/visualizations/feature_importance', methods=['GET'])
+@RESPONSE_CACHE.cached(lambda: analysis_version(IMPORTANCE_JOB))
 def get_feature_importance():
-    """Return feature importance data - from notebook output"""
-    # Exact values from Untitled1.ipynb Cell 1 output
-    importance = {
-        "random_forest": {
-            "PCA_7": 0.408111,
-            "PCA_1": 0.264075,
-            "PCA_3": 0.132900,
-            "PCA_10": 0.035093,
-            "PCA_9": 0.030259,
-            "PCA_8": 0.027684,
-            "PCA_6": 0.027229
-        },
-        "gradient_boosting": {
-            "PCA_3": 0.141561,
-            "PCA_7": 0.139384,
-            "PCA_10": 0.134063,
-            "PCA_4": 0.119349,
-            "PCA_6": 0.091164,
-            "interaction_composite": 0.083048,
-            "PCA_2": 0.082673
+    """
+    Return feature importances of the loaded models over the 10 input
+    features. ?detail=1 adds the method and permutation std per model.
+    """
+    dataset_path = find_dataset_path()
+    if dataset_path is None:
+        return jsonify({"error": "Dataset not found"}), 404
+    
+    try:
+        result, status = get_importances(dataset_path)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    if result is None:
+        return jsonify({"status": status}), 202
+    
+    features = result["features"]
+    if request.args.get('detail') != '1':
+        return json_response({name: ranked(model["importances"], features) for name, model in result["models"].items()})
+    
+    importance = {}
+    for name, model in result["models"].items():
+        importance[name] = {
+            "method": model["method"],
+            "importances": ranked(model["importances"], features),
+            "std": None if model["std"] is None else dict(zip(features, model["std"].tolist()))
         }
-    }
-    return jsonify(importance)
+    return json_response({"models": importance, "permutation_rows": result["permutation_rows"], "status": status})
 
 @app.route('/api/visualizations/missing_data', methods=['GET'])
+@RESPONSE_CACHE.cached(stats_version)
 def get_missing_data():
     """Return missing data analysis for visualization"""
-    # Sample missing data analysis
+    columns = [
+        "user_id", "age", "gender", "location", "device_type", 
+        "ad_id", "ad_category", "impressions", "clicks", 
+        "conversions", "engagement_duration", "sentiment_score",
+        "previous_interaction_score"
+    ]
+    
+    stats = current_dataset_stats()
+    if stats is None:
+        return jsonify({
+            "columns": columns,
+            "missing_counts": [None] * len(columns),
+            "total_rows": None,
+            "message": "Dataset statistics are being computed"
+        })
+    
+    summary = stats.summary()
+    columns = [col for col in columns if col in summary["missing_counts"]]
+    missing_counts = [summary["missing_counts"][col] for col in columns]
+    incomplete_rows = summary["total_rows"] - summary["complete_rows"]
     missing_data = {
-        "columns": [
-            "user_id", "age", "gender", "location", "device_type", 
-            "ad_id", "ad_category", "impressions", "clicks", 
-            "conversions", "engagement_duration", "sentiment_score",
-            "previous_interaction_score"
-        ],
-        "missing_counts": [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-        "total_rows": 100000,
-        "message": "Data cleaned - no missing values in processed dataset"
+        "columns": columns,
+        "missing_counts": missing_counts,
+        "total_rows": summary["total_rows"],
+        "incomplete_rows": incomplete_rows,
+        "message": f"{incomplete_rows} of {summary['total_rows']} raw rows have missing values"
     }
     return jsonify(missing_data)
 
 @app.route('/api/visualizations/pca', methods=['GET'])
+@RESPONSE_CACHE.cached(lambda: analysis_version(PCA_JOB))
 def get_pca_data():
-    """Return PCA visualization data"""
-    # Generate sample PCA points (2D projection)
-    import random
-    random.seed(42)
-    np.random.seed(42)
-    
-    points = []
-    for i in range(200):
-        # Simulate PCA components
-        x = np.random.normal(0, 1500) + random.choice([-2000, 0, 2000])
-        y = np.random.normal(0, 1200) + random.choice([-1500, 0, 1500])
-        points.append({"x": float(x), "y": float(y)})
+    """
+    Return a 2-D PCA projection of a reservoir sample of the dataset.
+    Points are little-endian float32 x,y pairs, base64 encoded in JSON
+    (?format=json), raw bytes (?format=binary) or legacy {x, y} objects
+    (?format=points). ?limit= returns a prefix of the (uniform) sample.
+    """
+    output = request.args.get('format', 'json')
+    if output not in ('json', 'binary', 'points'):
+        return jsonify({"error": "format must be one of json, binary, points"}), 400
+    try:
+        limit = int(request.args.get('limit', PCA_SAMPLE_SIZE))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
     
-    return jsonify({
-        "points": points,
-        "explained_variance": [0.65, 0.25],  # PC1 and PC2 explained variance
-        "total_variance": 0.90
-    })
+    dataset_path = find_dataset_path()
+    if dataset_path is None:
+        return jsonify({"error": "Dataset not found"}), 404
+    
+    try:
+        projection, status = get_projection(dataset_path)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    
+    if projection is None:
+        if output == 'binary':
+            return jsonify({"status": status}), 202
+        return jsonify({"points": [], "count": 0, "explained_variance": [], "total_variance": None, "status": status}), 202
+    
+    points = projection["points"][:max(0, limit)]
+    explained = projection["explained_variance"]
+    if output == 'binary':
+        response = Response(points.tobytes(), mimetype='application/octet-stream')
+        response.headers['X-PCA-Count'] = str(len(points))
+        response.headers['X-PCA-Explained-Variance'] = ','.join(f"{v:.6f}" for v in explained)
+        return response
+    
+    payload = {
+        "count": int(len(points)),
+        "explained_variance": explained,  # PC1 and PC2 explained variance
+        "total_variance": float(sum(explained)),
+        "method": projection["method"],
+        "columns": projection["columns"],
+        "rows_seen": projection["rows_seen"],
+        "status": status
+    }
+    if output == 'points':
+        payload["points"] = [{"x": x, "y": y} for x, y in points.tolist()]
+    else:
+        payload["encoding"] = "float32-le-base64"
+        payload["points_b64"] = base64.b64encode(points.tobytes()).decode('ascii')
+    return json_response(payload)
 
 @app.route('/api/visualizations/clusters', methods=['GET'])
+@RESPONSE_CACHE.cached(lambda: analysis_version(CLUSTER_JOB))
 def get_cluster_data():
     """Return K-Means clustering visualization data"""
-    cluster_data = {
-        "distribution": {
-            "labels": ["Cluster 0", "Cluster 1", "Cluster 2", "Cluster 3", "Cluster 4"],
-            "values": [4500, 3200, 2800, 2100, 1400]
-        },
-        "characteristics": {
-            "0": {
-                "total_clicks": 850,
-                "total_conversions": 120,
-                "avg_engagement_duration": 95.5
-            },
-            "1": {
-                "total_clicks": 620,
-                "total_conversions": 85,
-                "avg_engagement_duration": 78.2
-            },
-            "2": {
-                "total_clicks": 480,
-                "total_conversions": 65,
-                "avg_engagement_duration": 62.8
-            },
-            "3": {
-                "total_clicks": 380,
-                "total_conversions": 45,
-                "avg_engagement_duration": 48.3
-            },
-            "4": {
-                "total_clicks": 270,
-                "total_conversions": 35,
-                "avg_engagement_duration": 35.1
-            }
-        },
-        "silhouette_score": 0.6523,
-        "num_clusters": 5
-    }
+    dataset_path = find_dataset_path()
+    if dataset_path is None:
+        return jsonify({"error": "Dataset not found"}), 404
+    
+    try:
+        result, status = get_clusters(dataset_path)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    
+    if result is None:
+        return jsonify({
+            "distribution": {"labels": [], "values": []},
+            "characteristics": {},
+            "silhouette_score": None,
+            "num_clusters": N_CLUSTERS,
+            "status": status
+        }), 202
+    
+    cluster_data = cluster_summary(result)
+    cluster_data["status"] = status
     return jsonify(cluster_data)
 
+@app.route('/api/clusters/assign', methods=['POST'])
+def assign_clusters():
+    """
+    Assign rows to the fitted clusters. Accepts {"rows": [...]} with one
+    dict (or list in CLUSTER_COLUMNS order) per row, or {"columns": {...}}.
+    """
+    dataset_path = find_dataset_path()
+    if dataset_path is None:
+        return jsonify({"error": "Dataset not found"}), 404
+    result, status = get_clusters(dataset_path)
+    if result is None:
+        return jsonify({"error": "Clusters are still being computed", "status": status}), 503
+    model = result["model"]
+    
+    try:
+        data = request.get_json(silent=True) or {}
+        try:
+            X = FeatureSchema(model.columns).parse_batch(data)
+        except SchemaError as e:
+            return jsonify(e.to_dict()), 400
+        
+        labels, distances = model.assign(X)
+        return json_response({
+            "clusters": labels.tolist(),
+            "distances": np.sqrt(distances).tolist(),
+            "count": int(len(labels)),
+            "num_clusters": model.n_clusters
+        })
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid rows: {e}"}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/batcher/metrics', methods=['GET'])
+def batcher_metrics():
+    """Micro-batching batch sizes, wait times and queue depths"""
+    if BATCHER is None:
+        return jsonify({"enabled": False})
+    return jsonify(BATCHER.metrics())
+
+@app.route('/api/admin/reload', methods=['GET', 'POST'])
+def admin_reload():
+    """
+    Reload changed model artifacts without a restart.
+    POST {"models": [...], "force": false, "wait": false}; GET returns the
+    status of the last reload. Requires X-Admin-Token when ADMIN_TOKEN is set.
+    """
+    admin_token = os.environ.get('ADMIN_TOKEN')
+    if admin_token and request.headers.get('X-Admin-Token') != admin_token:
+        return jsonify({"error": "Invalid admin token"}), 403
+    
+    if request.method == 'GET':
+        return jsonify({
+            "reload": reload_status(),
+            "watcher": WATCHER.status() if WATCHER else None
+        })
+    
+    data = request.get_json(silent=True) or {}
+    names = data.get('models')
+    if names is not None:
+        invalid = [name for name in names if name not in VALID_MODELS]
+        if invalid:
+            return jsonify({
+                "error": f"Invalid model name: {', '.join(invalid)}",
+                "valid_models": VALID_MODELS
+            }), 400
+    force = bool(data.get('force', False))
+    
+    if data.get('wait'):
+        reloaded = reload_now(names, force)
+        return jsonify({"status": "done", "reloaded": reloaded, "load_stats": LOAD_STATS})
+    
+    if not reload_in_background(names, force):
+        return jsonify({"status": "busy", "reload": reload_status()}), 409
+    return jsonify({"status": "reloading"}), 202
+
+def collect_model_metrics():
+    """Model load times and prediction cache counters, read at scrape time"""
+    cache = PREDICTION_CACHE.metrics()
+    return [
+        ('model_load_seconds', 'gauge', "Time to load and compile each model", ('model', 'pipeline'),
+         [((name, stats["pipeline"]), stats["load_ms"] / 1000.0) for name, stats in LOAD_STATS.items()]),
+        ('model_loaded_timestamp_seconds', 'gauge', "When each model was last loaded", ('model',),
+         [((name,), stats["loaded_at"]) for name, stats in LOAD_STATS.items()]),
+        ('prediction_cache_lookups_total', 'counter', "Prediction cache lookups", ('model', 'result'),
+         [((name, 'hit'), stats["hits"]) for name, stats in cache["models"].items()] +
+         [((name, 'miss'), stats["misses"]) for name, stats in cache["models"].items()]),
+        ('prediction_cache_entries', 'gauge', "Entries in the prediction cache", (),
+         [((), cache["entries"])])
+    ]
+
+REGISTRY.add_collector(collect_model_metrics)
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus metrics of this process"""
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
 @app.route('/api/health', methods=['GET'])
 def health():
     """Health check endpoint"""
-    return jsonify({"status": "healthy", "models_loaded": list(MODELS.keys())})
+    return jsonify({
+        "status": "healthy",
+        "models_loaded": list(MODELS.keys()),
+        "models_available": available_models(),
+        "lazy_loading": LOAD_CONFIG["lazy"],
+        "mmap": LOAD_CONFIG["mmap"],
+        "pipelines": {name: pipeline.kind for name, pipeline in PIPELINES.items()},
+        "load_stats": LOAD_STATS,
+        "response_cache": RESPONSE_CACHE.metrics(),
+        "prediction_cache": PREDICTION_CACHE.metrics(),
+        "fallback": FALLBACK.metrics(),
+        "preprocessing": PREPROCESSING["path"],
+        "inference_pool": POOL.metrics() if POOL is not None else None
+    })
 
 if __name__ == '__main__':
     import socket
+    import sys
     
     # Check if port is available
     def is_port_available(port):
@@ -528,6 +980,11 @@ if __name__ == '__main__':
         except OSError:
             return False
     
+    # Only wait for Enter when someone is at a terminal (not in containers or services)
+    def pause_before_exit():
+        if sys.stdin is not None and sys.stdin.isatty():
+            input("\nPress Enter to exit...")
+    
     PORT = 5000
     
     print("=" * 60)
@@ -543,7 +1000,7 @@ if __name__ == '__main__':
         print(f"2. Kill the process (replace PID with the number from step 1):")
         print(f"   taskkill /PID <PID> /F")
         print(f"\nOr use a different port by modifying PORT in app.py")
-        input("\nPress Enter to exit...")
+        pause_before_exit()
         exit(1)
     
     print(f"✓ Port {PORT} is available")
@@ -573,10 +1030,10 @@ if __name__ == '__main__':
         print(f"\nPort {PORT} might be in use. Try:")
         print(f"1. netstat -ano | findstr :{PORT}")
         print(f"2. Kill the process using that port")
-        input("\nPress Enter to exit...")
+        pause_before_exit()
     except Exception as e:
         print(f"\n✗ ERROR: {e}")
         import traceback
         traceback.print_exc()
-        input("\nPress Enter to exit...")
+        pause_before_exit()
 
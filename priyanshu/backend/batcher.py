@@ -0,0 +1,188 @@
+"""
+Micro-batching for single-row predictions.
+
+Concurrent /api/predict calls for the same model are queued and scored
+together as one matrix by a worker thread per model. A batch is sent as
+soon as it reaches max_batch_rows or the oldest request has waited
+max_wait_ms, so the added latency is bounded. Callers wait at most
+timeout seconds for their rows; rows still queued after that are
+cancelled and never scored.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future, wait
+
+import numpy as np
+
+class QueueFullError(Exception):
+    """Raised when a model's batch queue is at max_queue"""
+
+class BatchTimeoutError(Exception):
+    """Raised when a request's rows were not scored within the timeout"""
+
+class _PendingRow:
+    __slots__ = ('row', 'future', 'enqueued')
+    
+    def __init__(self, row):
+        self.row = row
+        self.future = Future()
+        self.enqueued = time.perf_counter()
+
+class MicroBatcher:
+    """Coalesce single-row scoring calls into per-model batches"""
+    
+    def __init__(self, score_fn, max_batch_rows=64, max_wait_ms=2.0, max_queue=10000, timeout=10.0):
+        self.score_fn = score_fn
+        self.max_batch_rows = max_batch_rows
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._queues = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+    
+    def _queue_for(self, model_name):
+        """Per-model queue, starting its worker thread on first use"""
+        q = self._queues.get(model_name)
+        if q is not None:
+            return q
+        with self._lock:
+            if model_name not in self._queues:
+                self._stats[model_name] = {
+                    "batches": 0,
+                    "rows": 0,
+                    "max_batch_size": 0,
+                    "total_wait_ms": 0.0,
+                    "max_wait_ms": 0.0,
+                    "rejected": 0,
+                    "timeouts": 0,
+                    "cancelled": 0,
+                    "errors": 0
+                }
+                self._queues[model_name] = queue.Queue(maxsize=self.max_queue)
+                worker = threading.Thread(
+                    target=self._worker, args=(model_name,),
+                    name=f"microbatch-{model_name}", daemon=True
+                )
+                worker.start()
+            return self._queues[model_name]
+    
+    def submit(self, model_name, row):
+        """Queue one feature row and return a Future for its probability"""
+        q = self._queue_for(model_name)
+        pending = _PendingRow(row)
+        try:
+            q.put_nowait(pending)
+        except queue.Full:
+            with self._lock:
+                self._stats[model_name]["rejected"] += 1
+            raise QueueFullError(f"Batch queue for {model_name} is full ({self.max_queue} rows)")
+        return pending.future
+    
+    def predict(self, model_name, row, timeout=None):
+        """Score one feature row, blocking until its batch has run or the timeout passes"""
+        return float(self.predict_many(model_name, [row], timeout)[0])
+    
+    def predict_many(self, model_name, rows, timeout=None):
+        """
+        Probabilities for every row. All rows are queued before waiting, so
+        they share batches, and the whole call waits at most timeout seconds.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        futures = []
+        try:
+            for row in rows:
+                futures.append(self.submit(model_name, row))
+        except QueueFullError:
+            self._cancel(model_name, futures)
+            raise
+        
+        done, not_done = wait(futures, timeout)
+        if not_done:
+            self._cancel(model_name, not_done)
+            with self._lock:
+                self._stats[model_name]["timeouts"] += 1
+            raise BatchTimeoutError(f"Scoring with {model_name} took longer than {timeout:g} s")
+        return np.array([future.result() for future in futures])
+    
+    def _cancel(self, model_name, futures):
+        """Cancel rows the worker has not picked up yet"""
+        cancelled = sum(1 for future in futures if future.cancel())
+        with self._lock:
+            self._stats[model_name]["cancelled"] += cancelled
+    
+    def _collect(self, q):
+        """Block for one row, then gather more until the batch is full or the wait expires"""
+        batch = [q.get()]
+        deadline = batch[0].enqueued + self.max_wait
+        while len(batch) < self.max_batch_rows:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining > 0:
+                    batch.append(q.get(timeout=remaining))
+                else:
+                    batch.append(q.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+    
+    def _worker(self, model_name):
+        q = self._queues[model_name]
+        stats = self._stats[model_name]
+        while True:
+            # Rows whose caller timed out were cancelled; skip them
+            batch = [pending for pending in self._collect(q) if pending.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            started = time.perf_counter()
+            
+            try:
+                X = np.vstack([pending.row for pending in batch])
+                probabilities = self.score_fn(X, model_name)
+                for pending, probability in zip(batch, probabilities):
+                    pending.future.set_result(float(probability))
+                failed = False
+            except Exception as e:
+                for pending in batch:
+                    pending.future.set_exception(e)
+                failed = True
+            
+            waits = [(started - pending.enqueued) * 1000.0 for pending in batch]
+            with self._lock:
+                stats["batches"] += 1
+                stats["rows"] += len(batch)
+                stats["max_batch_size"] = max(stats["max_batch_size"], len(batch))
+                stats["total_wait_ms"] += sum(waits)
+                stats["max_wait_ms"] = max(stats["max_wait_ms"], max(waits))
+                if failed:
+                    stats["errors"] += 1
+    
+    def metrics(self):
+        """Batch size, wait time and queue depth per model"""
+        with self._lock:
+            result = {}
+            for model_name, stats in self._stats.items():
+                batches = stats["batches"]
+                rows = stats["rows"]
+                result[model_name] = {
+                    "batches": batches,
+                    "rows": rows,
+                    "avg_batch_size": rows / batches if batches else 0.0,
+                    "max_batch_size": stats["max_batch_size"],
+                    "avg_wait_ms": stats["total_wait_ms"] / rows if rows else 0.0,
+                    "max_wait_ms": stats["max_wait_ms"],
+                    "queue_depth": self._queues[model_name].qsize(),
+                    "rejected": stats["rejected"],
+                    "timeouts": stats["timeouts"],
+                    "cancelled": stats["cancelled"],
+                    "errors": stats["errors"]
+                }
+            return {
+                "enabled": True,
+                "max_batch_rows": self.max_batch_rows,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "max_queue": self.max_queue,
+                "timeout_s": self.timeout,
+                "models": result
+            }
@@ -0,0 +1,114 @@
+"""
+Compare the per-process prediction cache with the shared SQLite cache.
+
+Several worker processes replay the same skewed stream of single-row
+requests, the way serve.py workers see traffic behind a load balancer.
+With per-process caches every worker pays its own misses; with the
+shared cache a row scored by one worker is a hit for all of them.
+
+Usage:
+    python bench_cache.py --workers 4 --requests 5000 --model random_forest
+    python bench_cache.py --distinct 20000 --json results.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from bench_data import feature_rows
+
+BACKENDS = ['none', 'memory', 'sqlite']
+
+def request_stream(distinct, requests, skew, seed):
+    """Row ids of a Zipf-distributed request stream"""
+    rng = np.random.default_rng(seed)
+    return (rng.zipf(skew, size=requests) - 1) % distinct
+
+def run_worker(args):
+    backend, worker_id, options = args
+    import inference
+    from prediction_cache import PredictionCache
+    from shared_cache import SharedPredictionCache
+    
+    inference.load_models(options["models_dir"])
+    if backend == 'sqlite':
+        cache = SharedPredictionCache(options["path"], max_entries=options["max_entries"])
+    else:
+        cache = PredictionCache(max_entries=options["max_entries"] if backend == 'memory' else 0)
+    
+    rows = feature_rows(options["distinct"])
+    stream = request_stream(options["distinct"], options["requests"], options["skew"], seed=worker_id + 1)
+    model = options["model"]
+    latencies = np.empty(len(stream))
+    for i, row_id in enumerate(stream):
+        started = time.perf_counter()
+        cache.score(rows[row_id:row_id + 1], model, inference.predict_proba_batch)
+        latencies[i] = time.perf_counter() - started
+    stats = cache.metrics()["models"].get(model, {})
+    return latencies, stats.get("hits", 0), stats.get("misses", 0)
+
+def run_backend(backend, options):
+    started = time.perf_counter()
+    with multiprocessing.get_context('spawn').Pool(options["workers"]) as pool:
+        results = pool.map(run_worker, [(backend, worker_id, options) for worker_id in range(options["workers"])])
+    wall = time.perf_counter() - started
+    latencies = np.concatenate([result[0] for result in results]) * 1e6
+    hits = sum(result[1] for result in results)
+    misses = sum(result[2] for result in results)
+    return {
+        "backend": backend,
+        "workers": options["workers"],
+        "requests": int(len(latencies)),
+        "hit_rate": hits / (hits + misses) if hits + misses else None,
+        "mean_us": float(latencies.mean()),
+        "p50_us": float(np.percentile(latencies, 50)),
+        "p99_us": float(np.percentile(latencies, 99)),
+        "wall_seconds": wall
+    }
+
+def main():
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    
+    parser = argparse.ArgumentParser(description="Benchmark per-process vs shared prediction caches")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=5000, help="requests per worker")
+    parser.add_argument('--distinct', type=int, default=5000, help="distinct feature rows")
+    parser.add_argument('--skew', type=float, default=1.2, help="Zipf exponent of the request stream")
+    parser.add_argument('--max-entries', type=int, default=100000)
+    parser.add_argument('--model', default='random_forest')
+    parser.add_argument('--backends', nargs='*', default=BACKENDS, choices=BACKENDS)
+    parser.add_argument('--models-dir', default=os.path.join(backend_dir, 'models'))
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args()
+    
+    os.chdir(backend_dir)
+    with tempfile.TemporaryDirectory() as tmp:
+        options = {
+            "models_dir": args.models_dir,
+            "path": os.path.join(tmp, 'predictions.sqlite'),
+            "workers": args.workers,
+            "requests": args.requests,
+            "distinct": args.distinct,
+            "skew": args.skew,
+            "max_entries": args.max_entries,
+            "model": args.model
+        }
+        results = [run_backend(backend, options) for backend in args.backends]
+    
+    print(f"\n{args.model}, {args.workers} workers x {args.requests} requests over {args.distinct} distinct rows")
+    print(f"{'cache':<8} {'hit rate':>9} {'mean us':>10} {'p50 us':>10} {'p99 us':>10} {'wall s':>8}")
+    for result in results:
+        hit_rate = f"{result['hit_rate']:.1%}" if result['hit_rate'] is not None else '-'
+        print(f"{result['backend']:<8} {hit_rate:>9} {result['mean_us']:>10.0f} {result['p50_us']:>10.0f} "
+              f"{result['p99_us']:>10.0f} {result['wall_seconds']:>8.1f}")
+    
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
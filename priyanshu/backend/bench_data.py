@@ -0,0 +1,21 @@
+"""
+Synthetic request data shared by the benchmarks (bench_cache.py,
+bench_models.py and load_test.py).
+"""
+import numpy as np
+
+def feature_rows(distinct, seed=0):
+    """Distinct feature rows in realistic ranges, in FEATURE_NAMES order"""
+    rng = np.random.default_rng(seed)
+    return np.column_stack([
+        rng.integers(18, 65, distinct),
+        rng.integers(0, 2, distinct),
+        rng.integers(0, 5, distinct),
+        rng.integers(0, 3, distinct),
+        rng.integers(100, 5000, distinct),
+        rng.integers(0, 200, distinct),
+        rng.uniform(0, 300, distinct),
+        rng.uniform(-1, 1, distinct),
+        rng.uniform(0, 1, distinct),
+        rng.integers(0, 5, distinct)
+    ]).astype(np.float64)
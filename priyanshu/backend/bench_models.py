@@ -0,0 +1,153 @@
+"""
+Per-model inference cost at different batch sizes.
+
+Loads the artifacts written by save_models.py and times each stage on
+its own: the StandardScaler, the PCA projection (pca_lr only) and the
+estimator's predict_proba. It also times the compiled pipeline that
+the API actually runs, which is fused into one dot product for the
+linear models. Peak memory per call is measured separately with
+tracemalloc, because tracing slows the timed runs down.
+
+The table shows per-row cost and rows/s for every model and batch size.
+Use it to pick a default model and a batch size for the micro-batcher
+and for score_csv.py.
+
+Usage:
+    python bench_models.py
+    python bench_models.py --models random_forest svm --sizes 1 100 10000 --json models.json
+"""
+import argparse
+import json
+import os
+import time
+import tracemalloc
+
+import numpy as np
+
+import inference
+from bench_data import feature_rows
+
+DEFAULT_SIZES = [1, 10, 100, 1000, 10000, 100000]
+
+def time_call(fn, min_time, max_repeat):
+    """Median seconds per call, repeating until min_time has passed (at least 3 calls when cheap)"""
+    times = []
+    total = 0.0
+    while len(times) < max_repeat and (total < min_time or len(times) < 3):
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        times.append(elapsed)
+        total += elapsed
+        if elapsed >= min_time:
+            break
+    return float(np.median(times))
+
+def peak_bytes(fn):
+    """Peak bytes allocated by one call of fn"""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def stage_calls(name, X):
+    """{stage: zero-argument callable} for one model on X"""
+    model = inference.MODELS[name]
+    scaler = inference.SCALERS.get(name)
+    pca = inference.SCALERS.get('pca') if name == 'pca_lr' else None
+    pipeline = inference.PIPELINES[name]
+    
+    # Each stage gets the output of the previous one, computed up front
+    scaled = scaler.transform(X) if scaler is not None else X
+    projected = pca.transform(scaled) if pca is not None else scaled
+    calls = {}
+    if scaler is not None:
+        calls['scaling'] = lambda: scaler.transform(X)
+    if pca is not None:
+        calls['pca'] = lambda: pca.transform(scaled)
+    calls['predict_proba'] = lambda: model.predict_proba(projected)
+    calls['pipeline'] = lambda: pipeline.predict_proba(X)
+    return calls
+
+def bench_model(name, sizes, rows, args):
+    results = []
+    for size in sizes:
+        X = rows[:size]
+        calls = stage_calls(name, X)
+        result = {"model": name, "pipeline": inference.PIPELINES[name].kind, "batch_size": size}
+        for stage, fn in calls.items():
+            fn()  # warm up
+            result[f"{stage}_us"] = time_call(fn, args.min_time, args.max_repeat) * 1e6
+        if not args.no_memory:
+            result["peak_bytes"] = peak_bytes(calls['pipeline'])
+        result["us_per_row"] = result["pipeline_us"] / size
+        result["rows_per_second"] = size / (result["pipeline_us"] / 1e6)
+        results.append(result)
+        print(f"  {name} x {size}: {result['pipeline_us']:.0f} us")
+    return results
+
+def print_table(results):
+    print(f"\n{'model':<20} {'batch':>7} {'scaling us':>11} {'pca us':>9} {'predict us':>11} "
+          f"{'pipeline us':>12} {'us/row':>9} {'rows/s':>11} {'peak MB':>8}")
+    for result in results:
+        cells = [f"{result[f'{stage}_us']:.1f}" if f"{stage}_us" in result else '-'
+                 for stage in ('scaling', 'pca', 'predict_proba')]
+        peak = f"{result['peak_bytes'] / 2**20:.2f}" if "peak_bytes" in result else '-'
+        print(f"{result['model']:<20} {result['batch_size']:>7} {cells[0]:>11} {cells[1]:>9} {cells[2]:>11} "
+              f"{result['pipeline_us']:>12.1f} {result['us_per_row']:>9.2f} {result['rows_per_second']:>11,.0f} {peak:>8}")
+
+def summarize(results, knee):
+    """Per model: lowest per-row cost and the smallest batch within knee of it"""
+    summary = {}
+    for name in dict.fromkeys(result["model"] for result in results):
+        rows = [result for result in results if result["model"] == name]
+        best = min(result["us_per_row"] for result in rows)
+        batch = min(result["batch_size"] for result in rows if result["us_per_row"] <= best * (1 + knee))
+        single = next((result["pipeline_us"] for result in rows if result["batch_size"] == 1), None)
+        summary[name] = {"single_row_us": single, "best_us_per_row": best, "smallest_efficient_batch": batch}
+    return summary
+
+def main():
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    
+    parser = argparse.ArgumentParser(description="Benchmark scaler, PCA and predict_proba per model and batch size")
+    parser.add_argument('--models', nargs='*', choices=inference.VALID_MODELS, help="default: all that load")
+    parser.add_argument('--sizes', nargs='*', type=int, default=DEFAULT_SIZES)
+    parser.add_argument('--min-time', type=float, default=0.2, help="seconds to repeat each measurement for")
+    parser.add_argument('--max-repeat', type=int, default=1000)
+    parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc pass")
+    parser.add_argument('--knee', type=float, default=0.1,
+                        help="a batch size is efficient when its per-row cost is within this fraction of the best")
+    parser.add_argument('--models-dir', default=os.path.join(backend_dir, 'models'))
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args()
+    
+    inference.load_models(args.models_dir)
+    names = [name for name in (args.models or inference.VALID_MODELS) if name in inference.PIPELINES]
+    if not names:
+        raise SystemExit(f"No models could be loaded from {args.models_dir}; run save_models.py first")
+    rows = feature_rows(max(args.sizes))
+    
+    results = []
+    for name in names:
+        results.extend(bench_model(name, sorted(args.sizes), rows, args))
+    summary = summarize(results, args.knee)
+    
+    print_table(results)
+    print(f"\n{'model':<20} {'pipeline':<13} {'1 row us':>9} {'best us/row':>12} {'efficient batch':>16} {'model MB':>9}")
+    for name, entry in summary.items():
+        stats = inference.LOAD_STATS.get(name, {})
+        entry["file_bytes"] = stats.get("file_bytes")
+        size = f"{entry['file_bytes'] / 2**20:.1f}" if entry["file_bytes"] else '-'
+        single = f"{entry['single_row_us']:.0f}" if entry["single_row_us"] is not None else '-'
+        print(f"{name:<20} {stats.get('pipeline', '-'):<13} {single:>9} {entry['best_us_per_row']:>12.2f} "
+              f"{entry['smallest_efficient_batch']:>16} {size:>9}")
+    
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({"results": results, "summary": summary, "cpu_count": os.cpu_count()}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Throughput of the preprocessing layers on the dataset CSV.
+
+Fits preprocessing.py on the CSV, then encodes it chunk by chunk. Each
+layer is timed on its own: reading the CSV, the IQR clipping of the
+model inputs, and encode() (date parts and one-hot columns). The chunks
+are encoded --passes times so the rates cover millions of rows.
+
+Usage:
+    python bench_preprocessing.py
+    python bench_preprocessing.py --data ../ad_campaign_data.csv --chunksize 100000 --passes 20 --json prep.json
+"""
+import argparse
+import json
+import os
+import time
+
+import pandas as pd
+
+from inference import FEATURE_NAMES
+from preprocessing import fit_csv
+
+def main():
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    
+    parser = argparse.ArgumentParser(description="Benchmark the preprocessing layers in rows/min")
+    parser.add_argument('--data', default=os.path.join(os.path.dirname(backend_dir), 'ad_campaign_data.csv'))
+    parser.add_argument('--chunksize', type=int, default=50000, help="CSV rows per chunk")
+    parser.add_argument('--passes', type=int, default=10, help="times the chunks are encoded")
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args()
+    
+    if not os.path.exists(args.data):
+        args.data = os.path.join(backend_dir, 'ad_campaign_data.csv')
+    preprocessor = fit_csv(args.data, list(FEATURE_NAMES))
+    
+    started = time.perf_counter()
+    chunks = list(pd.read_csv(args.data, chunksize=args.chunksize))
+    seconds = {"read_csv": time.perf_counter() - started, "clip": 0.0, "encode": 0.0}
+    rows = sum(len(chunk) for chunk in chunks)
+    
+    for _ in range(args.passes):
+        for chunk in chunks:
+            started = time.perf_counter()
+            preprocessor.transform(chunk[FEATURE_NAMES].to_numpy(), FEATURE_NAMES)
+            seconds["clip"] += time.perf_counter() - started
+            started = time.perf_counter()
+            encoded = preprocessor.encode(chunk)
+            seconds["encode"] += time.perf_counter() - started
+    
+    results = {
+        "rows": rows,
+        "chunksize": args.chunksize,
+        "passes": args.passes,
+        "encoded_columns": len(encoded.columns) - len(chunks[-1].columns),
+        "rows_per_minute": {
+            "read_csv": 60.0 * rows / seconds["read_csv"],
+            "clip": 60.0 * rows * args.passes / seconds["clip"],
+            "encode": 60.0 * rows * args.passes / seconds["encode"]
+        }
+    }
+    
+    print(f"\n{rows} rows in chunks of {args.chunksize}, {args.passes} passes, "
+          f"{results['encoded_columns']} columns added by encode()")
+    print(f"{'layer':<10} {'M rows/min':>11}")
+    for layer, rate in results["rows_per_minute"].items():
+        print(f"{layer:<10} {rate / 1e6:>11.1f}")
+    
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""
+K-Means segmentation of the dataset for /api/visualizations/clusters.
+
+The notebook's numeric columns are standardized and clustered with
+MiniBatchKMeans over streamed chunks, so the CSV never has to fit in
+memory:
+    1. StandardScaler.partial_fit on every chunk
+    2. MiniBatchKMeans.partial_fit on mini-batches of every chunk
+    3. assign every row, aggregate per-cluster sizes and sums with
+       np.bincount, and keep a reservoir sample for the silhouette score
+The fitted ClusterModel assigns new rows without going through sklearn's
+input validation.
+"""
+import os
+
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.metrics import silhouette_score
+from sklearn.preprocessing import StandardScaler
+
+from dataset_store import DATASET_CACHE_DIR, source_signature
+from dataset_stats import STATS_CHUNK_SIZE, iter_complete_rows, reservoir_slots
+from jobs import CachedJob
+from pca_projection import NOTEBOOK_PCA_COLUMNS
+
+CLUSTER_COLUMNS = NOTEBOOK_PCA_COLUMNS
+N_CLUSTERS = int(os.environ.get('N_CLUSTERS', 5))
+KMEANS_BATCH_SIZE = 4096
+SILHOUETTE_SAMPLE_SIZE = int(os.environ.get('SILHOUETTE_SAMPLE_SIZE', 10000))
+CLUSTER_CACHE_PATH = os.path.join(DATASET_CACHE_DIR, 'clusters', 'clusters.joblib')
+
+class ClusterModel:
+    """Fitted scaler and centroids; assigns rows to their nearest centroid"""
+    
+    def __init__(self, scaler, centers, columns=CLUSTER_COLUMNS):
+        self.columns = list(columns)
+        self.mean = scaler.mean_.copy()
+        self.scale = scaler.scale_.copy()
+        self.centers = np.ascontiguousarray(centers, dtype=np.float64)
+        self.center_norms = (self.centers ** 2).sum(axis=1)
+    
+    @property
+    def n_clusters(self):
+        return len(self.centers)
+    
+    def transform(self, X):
+        return (np.asarray(X, dtype=np.float64) - self.mean) / self.scale
+    
+    def assign(self, X, scaled=False):
+        """Nearest centroid for every row of X, and its squared distance"""
+        Z = np.asarray(X, dtype=np.float64) if scaled else self.transform(X)
+        # ||z - c||^2 = ||z||^2 - 2 z.c + ||c||^2; ||z||^2 does not change the argmin
+        distances = self.center_norms - 2.0 * (Z @ self.centers.T)
+        labels = distances.argmin(axis=1)
+        nearest = distances[np.arange(len(Z)), labels] + (Z ** 2).sum(axis=1)
+        return labels, np.maximum(nearest, 0.0)
+
+def fit_clusters(csv_path, n_clusters=N_CLUSTERS, sample_size=SILHOUETTE_SAMPLE_SIZE,
+                 batch_size=KMEANS_BATCH_SIZE, chunksize=STATS_CHUNK_SIZE, seed=42):
+    """Three streaming passes: scaler, mini-batch k-means, then assignment and aggregates"""
+    columns = CLUSTER_COLUMNS
+    scaler = StandardScaler()
+    for X in iter_complete_rows(csv_path, columns, chunksize):
+        if len(X):
+            scaler.partial_fit(X)
+    if not hasattr(scaler, 'mean_') or scaler.n_samples_seen_ < n_clusters:
+        raise ValueError(f"Not enough complete rows to fit {n_clusters} clusters")
+    
+    kmeans = MiniBatchKMeans(n_clusters=n_clusters, batch_size=batch_size, random_state=seed, n_init=3)
+    for X in iter_complete_rows(csv_path, columns, chunksize):
+        Z = scaler.transform(X)
+        for start in range(0, len(Z), batch_size):
+            batch = Z[start:start + batch_size]
+            # The first call initialises the centroids, so it needs n_clusters rows
+            if len(batch) >= n_clusters or hasattr(kmeans, 'cluster_centers_'):
+                kmeans.partial_fit(batch)
+    
+    model = ClusterModel(scaler, kmeans.cluster_centers_, columns)
+    rng = np.random.default_rng(seed)
+    sizes = np.zeros(n_clusters, dtype=np.int64)
+    sums = np.zeros((n_clusters, len(columns)))
+    inertia = 0.0
+    sample = np.empty((sample_size, len(columns)))
+    sample_labels = np.zeros(sample_size, dtype=np.int64)
+    seen = 0
+    for X in iter_complete_rows(csv_path, columns, chunksize):
+        Z = model.transform(X)
+        labels, distances = model.assign(Z, scaled=True)
+        sizes += np.bincount(labels, minlength=n_clusters)
+        for j in range(len(columns)):
+            sums[:, j] += np.bincount(labels, weights=X[:, j], minlength=n_clusters)
+        inertia += float(distances.sum())
+        rows, slots = reservoir_slots(seen, len(Z), sample_size, rng)
+        sample[slots] = Z[rows]
+        sample_labels[slots] = labels[rows]
+        seen += len(Z)
+    
+    kept = min(seen, sample_size)
+    silhouette = None
+    if len(np.unique(sample_labels[:kept])) > 1:
+        silhouette = float(silhouette_score(sample[:kept], sample_labels[:kept]))
+    
+    means = sums / np.maximum(sizes, 1)[:, None]
+    return {
+        "model": model,
+        "sizes": sizes,
+        "sums": sums,
+        "means": means,
+        "inertia": inertia,
+        "silhouette_score": silhouette,
+        "silhouette_sample_size": int(kept),
+        "rows": int(seen)
+    }
+
+def cluster_summary(result):
+    """JSON-ready distribution and per-cluster characteristics"""
+    columns = result["model"].columns
+    index = {col: j for j, col in enumerate(columns)}
+    characteristics = {}
+    for k, size in enumerate(result["sizes"]):
+        characteristics[str(k)] = {
+            "size": int(size),
+            "total_clicks": float(result["sums"][k, index['clicks']]),
+            "total_conversions": float(result["sums"][k, index['conversions']]),
+            "avg_engagement_duration": float(result["means"][k, index['engagement_duration']]),
+            "means": {col: float(result["means"][k, j]) for col, j in index.items()}
+        }
+    return {
+        "distribution": {
+            "labels": [f"Cluster {k}" for k in range(len(result["sizes"]))],
+            "values": [int(size) for size in result["sizes"]]
+        },
+        "characteristics": characteristics,
+        "silhouette_score": result["silhouette_score"],
+        "silhouette_sample_size": result["silhouette_sample_size"],
+        "inertia": result["inertia"],
+        "num_clusters": len(result["sizes"]),
+        "columns": columns,
+        "rows": result["rows"]
+    }
+
+CLUSTER_JOB = CachedJob('clusters', fit_clusters, CLUSTER_CACHE_PATH)
+
+def get_clusters(csv_path, n_clusters=N_CLUSTERS, sample_size=SILHOUETTE_SAMPLE_SIZE, background=True):
+    """Cached clustering for the dataset as it is now, or the previous one while it refits"""
+    key = CachedJob.make_key(source_signature(csv_path), n_clusters, sample_size)
+    result = CLUSTER_JOB.get(key, csv_path, n_clusters, sample_size, background=background)
+    return result, CLUSTER_JOB.status(key)
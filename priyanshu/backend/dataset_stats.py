@@ -0,0 +1,351 @@
+"""
+Streaming statistics for ad_campaign_data.csv.
+
+One pass over the CSV in chunks gathers the row count, per-column null
+counts, and min/max/mean/variance for numeric columns (Welford, merged
+chunk by chunk). It also keeps a fixed-size reservoir sample of rows for
+approximate quartiles. The result is cached by the file's size and
+mtime. When rows are appended, only the new tail of the file is read.
+
+Compute it ahead of time with:
+    python dataset_stats.py ../ad_campaign_data.csv
+"""
+import copy
+import hashlib
+import io
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from dataset_store import DATASET_CACHE_DIR, source_signature
+
+STATS_DIR = os.path.join(DATASET_CACHE_DIR, 'stats')
+STATS_CHUNK_SIZE = 100000
+RESERVOIR_SIZE = 20000
+# Bytes just before the processed offset, hashed to recognise an append
+TAIL_CHECK_BYTES = 4096
+
+class _BoundedReader(io.RawIOBase):
+    """Read a file from its current position up to a fixed end offset"""
+    
+    def __init__(self, f, end):
+        self.f = f
+        self.end = end
+    
+    def readable(self):
+        return True
+    
+    def readinto(self, buffer):
+        remaining = self.end - self.f.tell()
+        if remaining <= 0:
+            return 0
+        data = self.f.read(min(len(buffer), remaining))
+        buffer[:len(data)] = data
+        return len(data)
+
+def _complete_lines_end(path, size):
+    """Offset just past the last newline, so a half-written row is left for later"""
+    with open(path, 'rb') as f:
+        position = size
+        while position > 0:
+            step = min(65536, position)
+            f.seek(position - step)
+            block = f.read(step)
+            index = block.rfind(b'\n')
+            if index >= 0:
+                return position - step + index + 1
+            position -= step
+    return 0
+
+def _tail_hash(path, offset):
+    with open(path, 'rb') as f:
+        f.seek(max(0, offset - TAIL_CHECK_BYTES))
+        return hashlib.sha256(f.read(min(offset, TAIL_CHECK_BYTES))).hexdigest()
+
+def reservoir_slots(seen, n, size, rng):
+    """
+    Vectorized Algorithm R for a chunk of n rows after `seen` earlier rows.
+    Returns (chunk rows, reservoir slots) to write in order; a later row
+    landing on the same slot overwrites an earlier one, as in the serial form.
+    """
+    index = seen + np.arange(n)
+    fill = index < size
+    rows = [np.flatnonzero(fill)]
+    slots = [index[fill]]
+    rest = np.flatnonzero(~fill)
+    if len(rest):
+        draws = (rng.random(len(rest)) * (index[rest] + 1)).astype(np.int64)
+        keep = draws < size
+        rows.append(rest[keep])
+        slots.append(draws[keep])
+    return np.concatenate(rows), np.concatenate(slots)
+
+class DatasetStats:
+    """Mergeable running statistics over a CSV"""
+    
+    def __init__(self, columns, numeric_columns, reservoir_size=RESERVOIR_SIZE, seed=42):
+        self.columns = list(columns)
+        self.numeric_columns = list(numeric_columns)
+        p = len(self.numeric_columns)
+        self.rows = 0
+        self.complete_rows = 0
+        self.null_counts = np.zeros(len(self.columns), dtype=np.int64)
+        self.count = np.zeros(p, dtype=np.int64)
+        self.mean = np.zeros(p)
+        self.m2 = np.zeros(p)
+        self.min = np.full(p, np.inf)
+        self.max = np.full(p, -np.inf)
+        # Row reservoir (Algorithm R) of numeric values for quantiles and sampling
+        self.reservoir_size = reservoir_size
+        self.reservoir = np.full((reservoir_size, p), np.nan)
+        self.reservoir_complete = np.zeros(reservoir_size, dtype=bool)
+        self.rng = np.random.default_rng(seed)
+        # Source file position the stats cover
+        self.source = None
+        self.offset = 0
+        self.tail_hash = None
+    
+    def update(self, chunk):
+        """Fold one DataFrame chunk into the running statistics"""
+        n = len(chunk)
+        if n == 0:
+            return
+        nulls = chunk[self.columns].isna().to_numpy()
+        self.null_counts += nulls.sum(axis=0)
+        complete = ~nulls.any(axis=1)
+        self.complete_rows += int(complete.sum())
+        
+        X = chunk[self.numeric_columns].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64)
+        valid = ~np.isnan(X)
+        count_b = valid.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_b = np.where(count_b > 0, np.nansum(X, axis=0) / np.maximum(count_b, 1), 0.0)
+            m2_b = np.nansum((X - mean_b) ** 2, axis=0)
+            self.min = np.minimum(self.min, np.where(valid, X, np.inf).min(axis=0))
+            self.max = np.maximum(self.max, np.where(valid, X, -np.inf).max(axis=0))
+        
+        # Chan et al. parallel merge of (count, mean, M2)
+        total = self.count + count_b
+        delta = mean_b - self.mean
+        safe_total = np.maximum(total, 1)
+        self.mean = self.mean + delta * count_b / safe_total
+        self.m2 = self.m2 + m2_b + delta ** 2 * self.count * count_b / safe_total
+        self.count = total
+        
+        self._sample(X, complete)
+        self.rows += n
+    
+    def _sample(self, X, complete):
+        rows, slots = reservoir_slots(self.rows, len(X), self.reservoir_size, self.rng)
+        self.reservoir[slots] = X[rows]
+        self.reservoir_complete[slots] = complete[rows]
+    
+    def sample(self, complete_only=False):
+        """Reservoir rows as an (m, p) array over numeric_columns"""
+        filled = min(self.rows, self.reservoir_size)
+        sample = self.reservoir[:filled]
+        if complete_only:
+            sample = sample[self.reservoir_complete[:filled]]
+        return sample
+    
+    def quantiles(self, probabilities=(0.25, 0.5, 0.75)):
+        """Approximate per-column quantiles over complete rows, like df.dropna().approxQuantile"""
+        sample = self.sample(complete_only=True)
+        if len(sample) == 0:
+            return np.full((len(probabilities), len(self.numeric_columns)), np.nan)
+        return np.quantile(sample, probabilities, axis=0)
+    
+    def summary(self):
+        """JSON-ready statistics"""
+        q1, median, q3 = self.quantiles((0.25, 0.5, 0.75))
+        iqr = q3 - q1
+        with np.errstate(invalid='ignore', divide='ignore'):
+            variance = np.where(self.count > 1, self.m2 / np.maximum(self.count - 1, 1), np.nan)
+        
+        def clean(value):
+            value = float(value)
+            return None if not np.isfinite(value) else value
+        
+        numeric = {}
+        for i, col in enumerate(self.numeric_columns):
+            numeric[col] = {
+                "count": int(self.count[i]),
+                "min": clean(self.min[i]),
+                "max": clean(self.max[i]),
+                "mean": clean(self.mean[i]) if self.count[i] else None,
+                "variance": clean(variance[i]),
+                "std": clean(np.sqrt(variance[i])),
+                "q1": clean(q1[i]),
+                "median": clean(median[i]),
+                "q3": clean(q3[i]),
+                "iqr": clean(iqr[i]),
+                # 1.5 * IQR outlier bounds from DATA_PROCESSING.ipynb
+                "lower_bound": clean(q1[i] - 1.5 * iqr[i]),
+                "upper_bound": clean(q3[i] + 1.5 * iqr[i])
+            }
+        return {
+            "total_rows": int(self.rows),
+            "complete_rows": int(self.complete_rows),
+            "columns": self.columns,
+            "missing_counts": {col: int(n) for col, n in zip(self.columns, self.null_counts)},
+            "numeric": numeric,
+            "quantile_sample_size": int(min(self.rows, self.reservoir_size)),
+            "source": self.source
+        }
+    
+    def save(self, stats_dir=STATS_DIR):
+        os.makedirs(stats_dir, exist_ok=True)
+        state = {
+            "columns": self.columns,
+            "numeric_columns": self.numeric_columns,
+            "rows": self.rows,
+            "complete_rows": self.complete_rows,
+            "reservoir_size": self.reservoir_size,
+            "source": self.source,
+            "offset": self.offset,
+            "tail_hash": self.tail_hash
+        }
+        arrays_path = os.path.join(stats_dir, 'state.npz')
+        np.savez(arrays_path + '.tmp.npz', null_counts=self.null_counts, count=self.count,
+                 mean=self.mean, m2=self.m2, min=self.min, max=self.max,
+                 reservoir=self.reservoir, reservoir_complete=self.reservoir_complete)
+        os.replace(arrays_path + '.tmp.npz', arrays_path)
+        json_path = os.path.join(stats_dir, 'state.json')
+        with open(json_path + '.tmp', 'w') as f:
+            json.dump(state, f)
+        os.replace(json_path + '.tmp', json_path)
+    
+    @classmethod
+    def load(cls, stats_dir=STATS_DIR):
+        json_path = os.path.join(stats_dir, 'state.json')
+        arrays_path = os.path.join(stats_dir, 'state.npz')
+        if not (os.path.exists(json_path) and os.path.exists(arrays_path)):
+            return None
+        with open(json_path) as f:
+            state = json.load(f)
+        stats = cls(state["columns"], state["numeric_columns"], state["reservoir_size"])
+        with np.load(arrays_path) as arrays:
+            for name in ('null_counts', 'count', 'mean', 'm2', 'min', 'max', 'reservoir', 'reservoir_complete'):
+                setattr(stats, name, arrays[name])
+        stats.rows = state["rows"]
+        stats.complete_rows = state["complete_rows"]
+        stats.source = state["source"]
+        stats.offset = state["offset"]
+        stats.tail_hash = state["tail_hash"]
+        # Continue the sample with a fresh stream; already-kept rows stay valid
+        stats.rng = np.random.default_rng(stats.rows)
+        return stats
+
+def _read_range(path, start, end, columns=None, chunksize=STATS_CHUNK_SIZE):
+    """Chunks of rows between byte offsets; start=0 reads the header"""
+    f = open(path, 'rb')
+    f.seek(start)
+    reader = io.BufferedReader(_BoundedReader(f, end), buffer_size=1 << 20)
+    try:
+        if start == 0:
+            yield from pd.read_csv(reader, chunksize=chunksize)
+        else:
+            yield from pd.read_csv(reader, chunksize=chunksize, header=None, names=columns)
+    finally:
+        f.close()
+
+def iter_complete_rows(csv_path, columns, chunksize=STATS_CHUNK_SIZE):
+    """Float64 matrices of the rows with no missing value in columns, one per chunk"""
+    for chunk in pd.read_csv(csv_path, usecols=columns, chunksize=chunksize):
+        X = chunk[columns].to_numpy(dtype=np.float64)
+        yield X[~np.isnan(X).any(axis=1)]
+
+def compute_stats(csv_path, previous=None, chunksize=STATS_CHUNK_SIZE, reservoir_size=RESERVOIR_SIZE):
+    """
+    Statistics for csv_path. If previous covers a prefix of the file that
+    is unchanged (rows were only appended), only the new bytes are read.
+    """
+    signature = source_signature(csv_path)
+    end = _complete_lines_end(csv_path, signature["size"])
+    
+    stats = None
+    start = 0
+    if (previous is not None and previous.source and previous.source["path"] == signature["path"]
+            and 0 < previous.offset <= end and previous.tail_hash == _tail_hash(csv_path, previous.offset)):
+        # Work on a copy so readers of the cached stats never see a half-applied update
+        stats = copy.deepcopy(previous)
+        start = previous.offset
+    
+    chunks = _read_range(csv_path, start, end, stats.columns if stats else None, chunksize) if start < end else []
+    for chunk in chunks:
+        if stats is None:
+            numeric = [col for col in chunk.columns if chunk[col].dtype.kind in 'biuf']
+            stats = DatasetStats(chunk.columns, numeric, reservoir_size)
+        stats.update(chunk)
+    
+    if stats is None:
+        header = pd.read_csv(csv_path, nrows=0)
+        stats = DatasetStats(header.columns, [], reservoir_size)
+    
+    stats.source = signature
+    stats.offset = end
+    stats.tail_hash = _tail_hash(csv_path, end)
+    return stats
+
+_cache = {"stats": None, "building": False}
+_cache_lock = threading.Lock()
+
+def get_stats(csv_path, stats_dir=STATS_DIR, background=True):
+    """
+    Cached statistics for csv_path, refreshed when the file changes.
+    While a refresh runs in the background the previous (stale) stats are
+    returned, or None if there are none yet.
+    """
+    stats = _cache["stats"]
+    if stats is None:
+        stats = DatasetStats.load(stats_dir)
+        _cache["stats"] = stats
+    
+    try:
+        signature = source_signature(csv_path)
+    except OSError:
+        return stats
+    if stats is not None and stats.source == signature:
+        return stats
+    
+    def refresh():
+        try:
+            started = time.perf_counter()
+            fresh = compute_stats(csv_path, _cache["stats"])
+            fresh.save(stats_dir)
+            _cache["stats"] = fresh
+            print(f"Dataset stats updated ({fresh.rows} rows) in {time.perf_counter() - started:.1f} s")
+        except Exception as e:
+            print(f"Could not compute dataset stats: {e}")
+        finally:
+            _cache["building"] = False
+    
+    with _cache_lock:
+        if _cache["building"]:
+            return stats
+        _cache["building"] = True
+    
+    if background:
+        threading.Thread(target=refresh, name="dataset-stats", daemon=True).start()
+        return stats
+    refresh()
+    return _cache["stats"]
+
+def _reset_after_fork():
+    """A refresh running in the parent does not exist in a forked child"""
+    global _cache_lock
+    _cache_lock = threading.Lock()
+    _cache["building"] = False
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+if __name__ == '__main__':
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else 'ad_campaign_data.csv'
+    stats = get_stats(csv_path, background=False)
+    print(json.dumps(stats.summary(), indent=2))
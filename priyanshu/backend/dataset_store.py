@@ -0,0 +1,224 @@
+"""
+Columnar cache of ad_campaign_data.csv for fast, paged previews.
+
+The CSV is converted once into row groups of per-column .npy files plus a
+manifest that indexes the row offset of every group. Reading a page
+memory-maps only the groups it touches, so deep pages cost the same as
+the first one. The cache is rebuilt when the CSV's size or mtime changes.
+
+Build it ahead of time with:
+    python dataset_store.py ../ad_campaign_data.csv
+"""
+import json
+import os
+import shutil
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+
+DATASET_CACHE_DIR = 'data_cache'
+COLUMN_STORE_DIR = os.path.join(DATASET_CACHE_DIR, 'columns')
+ROW_GROUP_SIZE = 65536
+MANIFEST_FILE = 'manifest.json'
+
+def source_signature(csv_path):
+    """Size and mtime of the source CSV, used to detect stale caches"""
+    st = os.stat(csv_path)
+    return {"path": os.path.abspath(csv_path), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+def _write_group(group_dir, chunk):
+    """Write one chunk as per-column .npy files, returning column dtypes"""
+    os.makedirs(group_dir)
+    dtypes = {}
+    for index, col in enumerate(chunk.columns):
+        series = chunk[col]
+        if series.dtype.kind in 'biuf':
+            values = series.to_numpy()
+            nulls = None
+        else:
+            nulls = series.isna().to_numpy()
+            values = series.astype(str).where(~nulls, '').to_numpy(dtype=str)
+        np.save(os.path.join(group_dir, f"{index}.npy"), values)
+        if nulls is not None and nulls.any():
+            np.save(os.path.join(group_dir, f"{index}.null.npy"), nulls)
+        dtypes[col] = values.dtype.str
+    return dtypes
+
+def build_store(csv_path, store_dir=COLUMN_STORE_DIR, row_group_size=ROW_GROUP_SIZE):
+    """Convert a CSV into a columnar store, replacing any previous one atomically"""
+    signature = source_signature(csv_path)
+    tmp_dir = f"{store_dir}.tmp-{os.getpid()}-{threading.get_ident()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    
+    groups = []
+    columns = None
+    offset = 0
+    for number, chunk in enumerate(pd.read_csv(csv_path, chunksize=row_group_size)):
+        if columns is None:
+            columns = chunk.columns.tolist()
+        dtypes = _write_group(os.path.join(tmp_dir, f"rg_{number:05d}"), chunk)
+        groups.append({"offset": offset, "rows": len(chunk), "dtypes": dtypes})
+        offset += len(chunk)
+    
+    manifest = {
+        "source": signature,
+        "columns": columns or [],
+        "total_rows": offset,
+        "row_group_size": row_group_size,
+        "row_groups": groups
+    }
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f)
+    
+    # Swap the finished store in place of the old one
+    old_dir = None
+    if os.path.exists(store_dir):
+        old_dir = f"{tmp_dir}.old"
+        os.rename(store_dir, old_dir)
+    os.rename(tmp_dir, store_dir)
+    if old_dir:
+        shutil.rmtree(old_dir, ignore_errors=True)
+    return ColumnStore(store_dir, manifest)
+
+class ColumnStore:
+    """Read-only view over a built columnar store"""
+    
+    def __init__(self, store_dir, manifest):
+        self.store_dir = store_dir
+        self.manifest = manifest
+        self.columns = manifest["columns"]
+        self.total_rows = manifest["total_rows"]
+        self._offsets = np.array([group["offset"] for group in manifest["row_groups"]], dtype=np.int64)
+        self._column_index = {col: index for index, col in enumerate(self.columns)}
+    
+    @classmethod
+    def open(cls, store_dir=COLUMN_STORE_DIR):
+        manifest_path = os.path.join(store_dir, MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            return None
+        with open(manifest_path) as f:
+            return cls(store_dir, json.load(f))
+    
+    def is_fresh(self, csv_path):
+        """True if the store was built from the CSV as it is now"""
+        try:
+            return self.manifest["source"] == source_signature(csv_path)
+        except OSError:
+            return False
+    
+    def _load(self, number, col):
+        group_dir = os.path.join(self.store_dir, f"rg_{number:05d}")
+        index = self._column_index[col]
+        values = np.load(os.path.join(group_dir, f"{index}.npy"), mmap_mode='r')
+        null_path = os.path.join(group_dir, f"{index}.null.npy")
+        nulls = np.load(null_path, mmap_mode='r') if os.path.exists(null_path) else None
+        return values, nulls
+    
+    def read(self, offset=0, limit=50, columns=None):
+        """
+        Rows [offset, offset + limit) as {column: (values, null_mask)}.
+        Only the row groups that overlap the page are touched.
+        """
+        columns = columns or self.columns
+        start = max(0, min(offset, self.total_rows))
+        stop = min(self.total_rows, start + max(0, limit))
+        result = {}
+        if stop <= start:
+            for col in columns:
+                result[col] = (np.empty(0), None)
+            return result
+        
+        first = int(np.searchsorted(self._offsets, start, side='right') - 1)
+        last = int(np.searchsorted(self._offsets, stop - 1, side='right') - 1)
+        
+        for col in columns:
+            parts = []
+            null_parts = []
+            has_nulls = False
+            for number in range(first, last + 1):
+                group_start = int(self._offsets[number])
+                lo = max(start - group_start, 0)
+                hi = min(stop - group_start, self.manifest["row_groups"][number]["rows"])
+                values, nulls = self._load(number, col)
+                parts.append(np.asarray(values[lo:hi]))
+                if nulls is not None:
+                    has_nulls = True
+                    null_parts.append(np.asarray(nulls[lo:hi]))
+                else:
+                    null_parts.append(np.zeros(hi - lo, dtype=bool))
+            values = parts[0] if len(parts) == 1 else np.concatenate(parts)
+            nulls = np.concatenate(null_parts) if has_nulls else None
+            result[col] = (values, nulls)
+        return result
+
+def column_lists(page):
+    """Per-column Python lists with None for missing values"""
+    lists = {}
+    for col, (values, nulls) in page.items():
+        if values.dtype.kind == 'f':
+            nulls = np.isnan(values) if nulls is None else nulls | np.isnan(values)
+        if nulls is not None and nulls.any():
+            column = values.astype(object)
+            column[nulls] = None
+            lists[col] = column.tolist()
+        else:
+            lists[col] = values.tolist()
+    return lists
+
+def to_records(page):
+    """Row dicts for a page, built column-wise instead of with iterrows"""
+    lists = column_lists(page)
+    names = list(lists)
+    return [dict(zip(names, row)) for row in zip(*lists.values())]
+
+_build_lock = threading.Lock()
+_building = set()
+
+def get_store(csv_path, store_dir=COLUMN_STORE_DIR, background=True):
+    """
+    Fresh store for csv_path, or None while it is being (re)built.
+    With background=False the build runs on the calling thread.
+    """
+    store = ColumnStore.open(store_dir)
+    if store is not None and store.is_fresh(csv_path):
+        return store
+    
+    if not background:
+        with _build_lock:
+            return build_store(csv_path, store_dir)
+    
+    with _build_lock:
+        if store_dir in _building:
+            return None
+        _building.add(store_dir)
+    
+    def build():
+        try:
+            build_store(csv_path, store_dir)
+            print(f"Built columnar dataset cache in {store_dir}")
+        except Exception as e:
+            print(f"Could not build dataset cache: {e}")
+        finally:
+            with _build_lock:
+                _building.discard(store_dir)
+    
+    threading.Thread(target=build, name="dataset-store-build", daemon=True).start()
+    return None
+
+def _reset_after_fork():
+    """A build running in the parent does not exist in a forked child"""
+    global _build_lock
+    _build_lock = threading.Lock()
+    _building.clear()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+if __name__ == '__main__':
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else 'ad_campaign_data.csv'
+    store_dir = sys.argv[2] if len(sys.argv) > 2 else COLUMN_STORE_DIR
+    store = build_store(csv_path, store_dir)
+    print(f"✓ {store.total_rows} rows, {len(store.manifest['row_groups'])} row groups -> {store_dir}")
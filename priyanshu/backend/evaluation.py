@@ -0,0 +1,150 @@
+"""
+Evaluation of the loaded models on a held-out split of the dataset.
+
+Rows are assigned to the held-out split by a hash of their row number,
+so the split does not depend on chunk size and never changes between
+runs. One streaming pass scores every held-out row with every loaded
+model and counts the confusion matrix at the 0.5 threshold. The ROC
+curve and AUC come from sorting each model's scores once. Results are
+cached per dataset signature and artifact hash, so the endpoints only
+return precomputed values.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import auc
+
+from dataset_store import DATASET_CACHE_DIR, source_signature
+from dataset_stats import STATS_CHUNK_SIZE
+from inference import FEATURE_NAMES, VALID_MODELS, LOAD_STATS, get_pipeline, preprocess
+from jobs import CachedJob
+
+TARGET_COLUMN = 'conversions'
+TEST_FRACTION = float(os.environ.get('EVAL_TEST_FRACTION', 0.2))
+ROC_POINTS = int(os.environ.get('ROC_POINTS', 101))
+DECISION_THRESHOLD = 0.5
+EVALUATION_CACHE_PATH = os.path.join(DATASET_CACHE_DIR, 'evaluation', 'evaluation.joblib')
+
+MODEL_DISPLAY_NAMES = {
+    'random_forest': 'Random Forest',
+    'gradient_boosting': 'Gradient Boosting',
+    'logistic_regression': 'Logistic Regression',
+    'svm': 'SVM',
+    'pca_lr': 'Logistic Regression (PCA)'
+}
+
+def row_uniform(row_index):
+    """Fixed value in [0, 1) per row number (Fibonacci hash)"""
+    hashed = np.asarray(row_index, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+    return (hashed >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+def holdout_mask(row_index, fraction=TEST_FRACTION):
+    """True for rows in the held-out split"""
+    return row_uniform(row_index) < fraction
+
+def iter_holdout_chunks(csv_path, fraction=TEST_FRACTION, chunksize=STATS_CHUNK_SIZE):
+    """(features, labels) for the complete held-out rows of every chunk"""
+    offset = 0
+    columns = FEATURE_NAMES + [TARGET_COLUMN]
+    for chunk in pd.read_csv(csv_path, usecols=columns, chunksize=chunksize):
+        held_out = holdout_mask(np.arange(offset, offset + len(chunk)), fraction)
+        offset += len(chunk)
+        values = chunk[columns].to_numpy(dtype=np.float64)[held_out]
+        values = values[~np.isnan(values).any(axis=1)]
+        yield values[:, :-1], values[:, -1] > 0
+
+def roc_curve_sorted(scores, labels):
+    """Exact ROC points and AUC from a single descending sort of the scores"""
+    order = np.argsort(-scores, kind='stable')
+    sorted_scores = scores[order]
+    sorted_labels = labels[order]
+    # Last index of every run of equal scores is one threshold
+    cuts = np.r_[np.flatnonzero(np.diff(sorted_scores)), len(sorted_scores) - 1]
+    tps = np.cumsum(sorted_labels)[cuts]
+    fps = cuts + 1 - tps
+    positives = max(int(tps[-1]), 1)
+    negatives = max(int(fps[-1]), 1)
+    fpr = np.r_[0.0, fps / negatives]
+    tpr = np.r_[0.0, tps / positives]
+    return fpr, tpr, float(auc(fpr, tpr))
+
+def downsample_curve(fpr, tpr, points=ROC_POINTS):
+    """At most `points` ROC points evenly spaced along the curve, keeping both ends"""
+    if len(fpr) <= points:
+        return fpr, tpr
+    index = np.unique(np.linspace(0, len(fpr) - 1, points).round().astype(np.int64))
+    return fpr[index], tpr[index]
+
+def classification_metrics(tn, fp, fn, tp):
+    total = tn + fp + fn + tp
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {
+        "accuracy": (tp + tn) / total if total else 0.0,
+        "precision": precision,
+        "recall": recall,
+        "f1_score": f1
+    }
+
+def evaluate_models(csv_path, models, fraction=TEST_FRACTION, roc_points=ROC_POINTS):
+    """Score the held-out split with every model in one pass"""
+    pipelines = {name: get_pipeline(name) for name in models}
+    pipelines = {name: pipeline for name, pipeline in pipelines.items() if pipeline is not None}
+    if not pipelines:
+        raise ValueError("No models are loaded")
+    
+    scores = {name: [] for name in pipelines}
+    counts = {name: np.zeros(4, dtype=np.int64) for name in pipelines}
+    labels = []
+    for X, y in iter_holdout_chunks(csv_path, fraction):
+        if not len(X):
+            continue
+        labels.append(y)
+        X = preprocess(X)
+        for name, pipeline in pipelines.items():
+            probabilities = pipeline.predict_proba(X)
+            predicted = probabilities > DECISION_THRESHOLD
+            # tn, fp, fn, tp
+            counts[name] += np.bincount(2 * y + predicted, minlength=4)
+            scores[name].append(probabilities)
+    if not labels:
+        raise ValueError("The held-out split has no complete rows")
+    labels = np.concatenate(labels)
+    
+    results = {}
+    for name in pipelines:
+        tn, fp, fn, tp = (int(v) for v in counts[name])
+        fpr, tpr, roc_auc = roc_curve_sorted(np.concatenate(scores[name]), labels)
+        fpr, tpr = downsample_curve(fpr, tpr, roc_points)
+        metrics = classification_metrics(tn, fp, fn, tp)
+        metrics["roc_auc"] = roc_auc
+        results[name] = {
+            "metrics": metrics,
+            "confusion_matrix": [[tn, fp], [fn, tp]],
+            "roc": {"fpr": fpr.tolist(), "tpr": tpr.tolist(), "auc": roc_auc}
+        }
+    return {
+        "models": results,
+        "test_rows": int(len(labels)),
+        "positives": int(labels.sum()),
+        "test_fraction": fraction,
+        "threshold": DECISION_THRESHOLD
+    }
+
+EVALUATION_JOB = CachedJob('model evaluation', evaluate_models, EVALUATION_CACHE_PATH)
+
+def model_versions(models=VALID_MODELS):
+    """Artifact hash of every loaded model"""
+    return {name: LOAD_STATS[name].get("version") for name in models if name in LOAD_STATS}
+
+def get_evaluation(csv_path, models=VALID_MODELS, background=True):
+    """
+    Cached evaluation for the dataset and artifacts as they are now.
+    Lazy models are loaded by the job itself, not on the request path.
+    """
+    versions = model_versions(models)
+    key = CachedJob.make_key(source_signature(csv_path), versions, TEST_FRACTION, ROC_POINTS)
+    result = EVALUATION_JOB.get(key, csv_path, list(models), background=background)
+    return result, EVALUATION_JOB.status(key)
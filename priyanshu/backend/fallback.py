@@ -0,0 +1,119 @@
+"""
+Rule-based conversion scorer used when a model cannot be used.
+
+Nodes whose models/ directory has not been synced (or whose model raises)
+still answer with a heuristic: a weighted sum of the click-through rate
+and a few raw features, times a per-model multiplier, clipped to a
+range. Each model's weights are compiled into one vector, so scoring a
+batch is a single matrix product.
+
+The weights can be overridden per model with a JSON file
+(FALLBACK_WEIGHTS, default models/fallback_weights.json):
+
+    {
+        "default": {"weights": {"ctr": 0.4, "sentiment_score": 0.2}, "clip": [0.05, 0.95]},
+        "models": {"svm": {"multiplier": 0.9}}
+    }
+"""
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+# The original hand-written formula: ctr * 0.3 + ctr * 0.1, engagement / 100 * 0.2, ...
+DEFAULT_CONFIG = {
+    "default": {
+        "weights": {
+            "ctr": 0.4,
+            "engagement_duration": 0.002,
+            "sentiment_score": 0.2,
+            "previous_interaction_score": 0.2
+        },
+        "intercept": 0.0,
+        "multiplier": 1.0,
+        "clip": [0.05, 0.95]
+    },
+    "models": {
+        "svm": {"multiplier": 0.9},
+        "random_forest": {"multiplier": 1.0},
+        "logistic_regression": {"multiplier": 1.1}
+    }
+}
+
+def load_fallback_config(path):
+    """DEFAULT_CONFIG with the file's "default" and per-model entries laid over it"""
+    config = {
+        "default": dict(DEFAULT_CONFIG["default"]),
+        "models": {name: dict(entry) for name, entry in DEFAULT_CONFIG["models"].items()}
+    }
+    if path and os.path.exists(path):
+        with open(path) as f:
+            overrides = json.load(f)
+        config["default"].update(overrides.get("default", {}))
+        for name, entry in overrides.get("models", {}).items():
+            config["models"].setdefault(name, {}).update(entry)
+    return config
+
+class FallbackScorer:
+    """Vectorized rule-based probabilities with per-model weights and usage counters"""
+    
+    def __init__(self, feature_names, config=None, source=None):
+        self.feature_names = list(feature_names)
+        self._impressions = self.feature_names.index('impressions')
+        self._clicks = self.feature_names.index('clicks')
+        self._lock = threading.Lock()
+        self.stats = {}
+        self.configure(config or DEFAULT_CONFIG, source)
+    
+    def configure(self, config, source=None):
+        """Compile every model's weights into (weights, ctr weight, intercept, low, high)"""
+        compiled = {}
+        names = set(config.get("models", {})) | {None}
+        for name in names:
+            entry = dict(config["default"])
+            if name is not None:
+                entry.update(config["models"][name])
+            weights = np.zeros(len(self.feature_names))
+            ctr_weight = 0.0
+            for feature, weight in entry["weights"].items():
+                if feature == 'ctr':
+                    ctr_weight = float(weight)
+                elif feature in self.feature_names:
+                    weights[self.feature_names.index(feature)] = weight
+                else:
+                    raise ValueError(f"Unknown fallback feature: {feature}")
+            multiplier = float(entry.get("multiplier", 1.0))
+            low, high = entry.get("clip", [0.0, 1.0])
+            compiled[name] = (weights * multiplier, ctr_weight * multiplier,
+                              float(entry.get("intercept", 0.0)) * multiplier, float(low), float(high))
+        self.config = config
+        self.source = source
+        self._compiled = compiled
+    
+    def predict_proba(self, X, model_name):
+        """Rule-based probabilities for every row of X"""
+        weights, ctr_weight, intercept, low, high = self._compiled.get(model_name, self._compiled[None])
+        ctr = X[:, self._clicks] / np.maximum(X[:, self._impressions], 1)
+        score = X @ weights
+        score += ctr * ctr_weight
+        score += intercept
+        return np.clip(score, low, high, out=score)
+    
+    def record(self, model_name, rows, reason):
+        """Count rows answered by the fallback for a model"""
+        with self._lock:
+            stats = self.stats.setdefault(model_name, {"calls": 0, "rows": 0, "last_reason": None, "last_used": None})
+            stats["calls"] += 1
+            stats["rows"] += int(rows)
+            stats["last_reason"] = reason
+            stats["last_used"] = time.time()
+    
+    def metrics(self):
+        with self._lock:
+            stats = {name: dict(entry) for name, entry in self.stats.items()}
+        return {
+            "weights_source": self.source or "defaults",
+            "models": stats
+        }
@@ -0,0 +1,130 @@
+"""
+Feature importances of the loaded models over the 10 raw input features:
+    - tree ensembles: the model's own feature_importances_
+    - logistic regression (with or without PCA, sklearn or SGD): coefficients in
+      standardized feature space, with the scaler and PCA folded in,
+      normalized to sum to 1
+    - SVM and anything else: permutation importance (mean drop in ROC AUC)
+      over a sample of the held-out split, one feature per joblib worker
+
+Results are cached per artifact hash (and dataset signature for the
+permutation sample) and computed on a background thread.
+"""
+import os
+
+import numpy as np
+from joblib import Parallel, delayed
+
+from dataset_store import DATASET_CACHE_DIR, source_signature
+from dataset_stats import reservoir_slots
+from evaluation import iter_holdout_chunks, model_versions, roc_curve_sorted
+from inference import FEATURE_NAMES, VALID_MODELS, MODELS, SCALERS, get_pipeline, preprocess
+from jobs import CachedJob
+from pipelines import fuse_linear
+
+PERMUTATION_SAMPLE_SIZE = int(os.environ.get('PERMUTATION_SAMPLE_SIZE', 5000))
+PERMUTATION_REPEATS = int(os.environ.get('PERMUTATION_REPEATS', 5))
+PERMUTATION_JOBS = int(os.environ.get('PERMUTATION_JOBS', -1))
+IMPORTANCE_CACHE_PATH = os.path.join(DATASET_CACHE_DIR, 'importance', 'feature_importance.joblib')
+
+def importance_method(model):
+    """How importances are derived for a model"""
+    if hasattr(model, 'feature_importances_'):
+        return 'impurity'
+    if type(model).__name__ == 'LogisticRegression' or getattr(model, 'loss', None) in ('log_loss', 'log'):
+        return 'scaled_coefficients'
+    return 'permutation'
+
+def scaled_coefficients(name):
+    """|coefficient| of each raw feature in standardized units, normalized to sum to 1"""
+    scaler = SCALERS.get(name)
+    pca = SCALERS.get('pca') if name == 'pca_lr' else None
+    weights = fuse_linear(MODELS[name], scaler, pca, len(FEATURE_NAMES)).weights
+    if scaler is not None and getattr(scaler, 'scale_', None) is not None:
+        weights = weights * scaler.scale_
+    magnitude = np.abs(weights)
+    total = magnitude.sum()
+    return magnitude / total if total else magnitude
+
+def holdout_sample(csv_path, sample_size=PERMUTATION_SAMPLE_SIZE, seed=42):
+    """Uniform sample of complete held-out rows as (X, y)"""
+    rng = np.random.default_rng(seed)
+    X_sample = np.empty((sample_size, len(FEATURE_NAMES)))
+    y_sample = np.zeros(sample_size, dtype=bool)
+    seen = 0
+    for X, y in iter_holdout_chunks(csv_path):
+        rows, slots = reservoir_slots(seen, len(X), sample_size, rng)
+        X_sample[slots] = X[rows]
+        y_sample[slots] = y[rows]
+        seen += len(X)
+    kept = min(seen, sample_size)
+    return X_sample[:kept], y_sample[:kept]
+
+def _permuted_scores(pipeline, X, y, column, repeats, seed):
+    """ROC AUC with one column shuffled, once per repeat"""
+    rng = np.random.default_rng([seed, column])
+    X = X.copy()
+    original = X[:, column].copy()
+    scores = []
+    for _ in range(repeats):
+        X[:, column] = rng.permutation(original)
+        scores.append(roc_curve_sorted(pipeline.predict_proba(X), y)[2])
+    return scores
+
+def permutation_importance(pipeline, X, y, repeats=PERMUTATION_REPEATS, n_jobs=PERMUTATION_JOBS, seed=42):
+    """Mean and std of the ROC AUC drop per feature, features scored in parallel"""
+    if y.all() or not y.any():
+        raise ValueError("Permutation sample needs both classes")
+    baseline = roc_curve_sorted(pipeline.predict_proba(X), y)[2]
+    scores = Parallel(n_jobs=n_jobs)(
+        delayed(_permuted_scores)(pipeline, X, y, column, repeats, seed)
+        for column in range(X.shape[1])
+    )
+    drops = baseline - np.array(scores)
+    return drops.mean(axis=1), drops.std(axis=1)
+
+def compute_importances(csv_path, models):
+    """Importances for every loaded model; the held-out sample is read only if needed"""
+    results = {}
+    sample = None
+    for name in models:
+        pipeline = get_pipeline(name)
+        model = MODELS.get(name)
+        if pipeline is None or model is None:
+            continue
+        method = importance_method(model)
+        std = None
+        if method == 'impurity':
+            values = np.asarray(model.feature_importances_, dtype=np.float64)
+        elif method == 'scaled_coefficients':
+            values = scaled_coefficients(name)
+        else:
+            if sample is None:
+                X, y = holdout_sample(csv_path)
+                # Clipping is per column, so clipping before permuting equals clipping after
+                sample = (preprocess(X), y)
+            values, std = permutation_importance(pipeline, *sample)
+        results[name] = {
+            "method": method,
+            "importances": values,
+            "std": std
+        }
+    return {
+        "models": results,
+        "features": list(FEATURE_NAMES),
+        "permutation_rows": 0 if sample is None else int(len(sample[1]))
+    }
+
+def ranked(values, features=FEATURE_NAMES):
+    """{feature: value} from most to least important"""
+    order = np.argsort(-np.asarray(values), kind='stable')
+    return {features[i]: float(values[i]) for i in order}
+
+IMPORTANCE_JOB = CachedJob('feature importance', compute_importances, IMPORTANCE_CACHE_PATH)
+
+def get_importances(csv_path, models=VALID_MODELS, background=True):
+    """Cached importances for the artifacts (and dataset) as they are now"""
+    versions = model_versions(models)
+    key = CachedJob.make_key(source_signature(csv_path), versions, PERMUTATION_SAMPLE_SIZE, PERMUTATION_REPEATS)
+    result = IMPORTANCE_JOB.get(key, csv_path, list(models), background=background)
+    return result, IMPORTANCE_JOB.status(key)
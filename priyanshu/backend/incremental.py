@@ -0,0 +1,224 @@
+"""
+Out-of-core training of the linear models.
+
+The CSV is streamed in chunks several times and never held in memory,
+so memory use depends on --chunksize, not on the size of the file:
+    1. StandardScaler.partial_fit, plus class counts for the weights
+    2. IncrementalPCA.partial_fit on the scaled rows (pca_lr only)
+    3. --epochs passes of SGDClassifier.partial_fit, rows shuffled
+       within each chunk
+    4. Platt scaling of the linear SVM on a calibration slice of the
+       training rows
+    5. held-out metrics, with the AUC from a score histogram
+
+logistic_regression and pca_lr become averaged SGDClassifier(loss='log_loss').
+The linear SVM becomes SGDClassifier(loss='hinge') wrapped in
+PlattLinearSVM. All three still compile to fused pipelines.
+
+The minority class is weighted by n / (2 * count), the same as
+class_weight='balanced', instead of oversampling rows the way the
+notebooks did.
+"""
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.decomposition import IncrementalPCA
+from sklearn.linear_model import SGDClassifier
+from sklearn.preprocessing import StandardScaler
+from scipy.special import expit
+
+from evaluation import TARGET_COLUMN, row_uniform
+from inference import FEATURE_NAMES
+from pipelines import PlattLinearSVM
+
+OUT_OF_CORE_MODELS = ['logistic_regression', 'svm', 'pca_lr']
+CLASSES = np.array([0, 1])
+# Score histogram bins for the streaming held-out AUC
+AUC_BINS = 10000
+# Decision-value bins the Platt sigmoid is fitted on
+PLATT_BINS = 4096
+
+def iter_split_chunks(csv_path, chunksize, low, high, preprocessor=None):
+    """
+    (X, y, row_uniform) for complete rows whose row_uniform falls in
+    [low, high), X run through the preprocessor's transform if given
+    """
+    columns = FEATURE_NAMES + [TARGET_COLUMN]
+    offset = 0
+    for chunk in pd.read_csv(csv_path, usecols=columns, chunksize=chunksize):
+        u = row_uniform(np.arange(offset, offset + len(chunk)))
+        offset += len(chunk)
+        values = chunk[columns].to_numpy(dtype=np.float64)
+        keep = (u >= low) & (u < high) & ~np.isnan(values).any(axis=1)
+        if keep.any():
+            values = values[keep]
+            X = values[:, :-1]
+            if preprocessor is not None:
+                X = preprocessor.transform(X, FEATURE_NAMES)
+            yield X, (values[:, -1] > 0).astype(int), u[keep]
+
+def histogram_auc(positive, negative):
+    """ROC AUC from per-bin counts of positive and negative scores (ties count half)"""
+    negatives_below = np.cumsum(negative) - negative
+    pairs = positive.sum() * negative.sum()
+    if not pairs:
+        return None
+    return float((positive * (negatives_below + 0.5 * negative)).sum() / pairs)
+
+class _HeldOut:
+    """Streaming accuracy, log loss and histogram AUC of one model"""
+    
+    def __init__(self):
+        self.rows = 0
+        self.correct = 0
+        self.log_loss = 0.0
+        self.positive = np.zeros(AUC_BINS)
+        self.negative = np.zeros(AUC_BINS)
+    
+    def update(self, probabilities, y):
+        self.rows += len(y)
+        self.correct += int(((probabilities >= 0.5) == (y == 1)).sum())
+        clipped = np.clip(probabilities, 1e-15, 1 - 1e-15)
+        self.log_loss -= float(np.where(y == 1, np.log(clipped), np.log(1 - clipped)).sum())
+        bins = np.minimum((probabilities * AUC_BINS).astype(np.int64), AUC_BINS - 1)
+        self.positive += np.bincount(bins[y == 1], minlength=AUC_BINS)
+        self.negative += np.bincount(bins[y == 0], minlength=AUC_BINS)
+    
+    def metrics(self):
+        return {
+            "test_auc": histogram_auc(self.positive, self.negative),
+            "test_accuracy": self.correct / self.rows if self.rows else None,
+            "test_log_loss": self.log_loss / self.rows if self.rows else None
+        }
+
+def calibrate_platt(svm, scaler, chunks, bins=PLATT_BINS, max_iter=50):
+    """
+    PlattLinearSVM from a fitted SVM and calibration chunks.
+    chunks() returns a fresh iterator of (X, y, _). The decision values
+    are streamed twice: once for their range, once into per-bin label
+    counts. sigmoid(a * f + b) is then fitted on the bins by Newton's
+    method.
+    """
+    low, high = np.inf, -np.inf
+    for X, _, _ in chunks():
+        f = svm.decision_function(scaler.transform(X))
+        low, high = min(low, f.min()), max(high, f.max())
+    if not np.isfinite(low):
+        raise ValueError("No calibration rows; raise --calibration-fraction")
+    width = (high - low) / bins or 1.0
+    counts = np.zeros((2, bins))
+    for X, y, _ in chunks():
+        f = svm.decision_function(scaler.transform(X))
+        index = np.minimum(((f - low) / width).astype(np.int64), bins - 1)
+        counts[0] += np.bincount(index[y == 0], minlength=bins)
+        counts[1] += np.bincount(index[y == 1], minlength=bins)
+    negatives, positives = counts.sum(axis=1)
+    if not positives or not negatives:
+        raise ValueError("Calibration rows need both classes; raise --calibration-fraction")
+    
+    # Platt's smoothed targets keep the sigmoid from overfitting the extremes
+    centers = np.tile(low + (np.arange(bins) + 0.5) * width, 2)
+    n = counts.ravel()
+    t = np.repeat([1.0 / (negatives + 2.0), (positives + 1.0) / (positives + 2.0)], bins)
+    a, b = 1.0, float(np.log((positives + 1.0) / (negatives + 1.0)))
+    for _ in range(max_iter):
+        p = expit(a * centers + b)
+        w = n * np.maximum(p * (1 - p), 1e-12)
+        residual = n * (p - t)
+        gradient = np.array([(residual * centers).sum(), residual.sum()])
+        hessian = np.array([[(w * centers * centers).sum() + 1e-12, (w * centers).sum()],
+                            [(w * centers).sum(), w.sum() + 1e-12]])
+        step = np.linalg.solve(hessian, gradient)
+        a, b = a - step[0], b - step[1]
+        if np.abs(step).max() < 1e-9:
+            break
+    return PlattLinearSVM(svm, a, b)
+
+def train_out_of_core(csv_path, models, args, preprocessor=None):
+    """
+    Stream-train the requested linear models. Returns (scaler, pca,
+    [(name, model, metrics)], data info) like save_models.train_in_memory.
+    Training and held-out rows all go through the preprocessor's transform.
+    """
+    test_fraction = args.test_fraction
+    calibration_end = test_fraction + args.calibration_fraction
+    rng = np.random.default_rng(args.seed)
+    
+    # Pass 1: scaler and class counts
+    started = time.perf_counter()
+    scaler = StandardScaler()
+    counts = np.zeros(2, dtype=np.int64)
+    for X, y, _ in iter_split_chunks(csv_path, args.chunksize, test_fraction, 1.0, preprocessor):
+        scaler.partial_fit(X)
+        counts += np.bincount(y, minlength=2)
+    if not counts.all():
+        raise ValueError(f"Training rows need both classes, got counts {counts.tolist()}")
+    weights = {label: float(counts.sum() / (2.0 * count)) for label, count in enumerate(counts)}
+    print(f"✓ Scaler fitted on {counts.sum()} rows ({counts[1] / counts.sum():.1%} positive)")
+    
+    # Pass 2: PCA on the scaled rows
+    pca = None
+    if 'pca_lr' in models:
+        pca = IncrementalPCA(n_components=3)
+        for X, _, _ in iter_split_chunks(csv_path, args.chunksize, test_fraction, 1.0, preprocessor):
+            if len(X) >= pca.n_components:
+                pca.partial_fit(scaler.transform(X))
+        print("✓ IncrementalPCA fitted")
+    
+    # Passes 3..: SGD epochs; the SVM leaves the calibration slice for Platt scaling
+    estimators = {}
+    for name in models:
+        loss = 'hinge' if name == 'svm' else 'log_loss'
+        # Averaged SGD lands within noise of the exact liblinear solution
+        estimators[name] = SGDClassifier(loss=loss, alpha=args.alpha, class_weight=weights, average=True,
+                                         random_state=args.seed)
+    seconds = dict.fromkeys(models, 0.0)
+    rows = dict.fromkeys(models, 0)
+    for epoch in range(args.epochs):
+        for X, y, u in iter_split_chunks(csv_path, args.chunksize, test_fraction, 1.0, preprocessor):
+            order = rng.permutation(len(X))
+            scaled = scaler.transform(X[order])
+            y = y[order]
+            fit_rows = u[order] >= calibration_end
+            projected = pca.transform(scaled) if pca is not None else None
+            for name, estimator in estimators.items():
+                features = projected if name == 'pca_lr' else scaled
+                target = y
+                if name == 'svm':
+                    features, target = features[fit_rows], y[fit_rows]
+                tick = time.perf_counter()
+                estimator.partial_fit(features, target, classes=CLASSES)
+                seconds[name] += time.perf_counter() - tick
+                if epoch == 0:
+                    rows[name] += len(target)
+        print(f"✓ Epoch {epoch + 1}/{args.epochs}")
+    
+    fitted = {name: estimator for name, estimator in estimators.items() if name != 'svm'}
+    if 'svm' in estimators:
+        fitted['svm'] = calibrate_platt(estimators['svm'], scaler, lambda: iter_split_chunks(
+            csv_path, args.chunksize, test_fraction, calibration_end, preprocessor))
+        print("✓ SVM Platt-scaled")
+    
+    # Held-out metrics
+    held_out = {name: _HeldOut() for name in fitted}
+    for X, y, _ in iter_split_chunks(csv_path, args.chunksize, 0.0, test_fraction, preprocessor):
+        scaled = scaler.transform(X)
+        for name, model in fitted.items():
+            features = pca.transform(scaled) if name == 'pca_lr' else scaled
+            held_out[name].update(model.predict_proba(features)[:, 1], y)
+    
+    results = []
+    for name in models:
+        metrics = held_out[name].metrics()
+        metrics.update(train_seconds=round(seconds[name], 3), train_rows=rows[name], epochs=args.epochs)
+        results.append((name, fitted[name], metrics))
+    data_info = {
+        "train_rows": int(counts.sum()),
+        "test_rows": held_out[models[0]].rows if models else 0,
+        "test_fraction": test_fraction,
+        "positive_rate": float(counts[1] / counts.sum()),
+        "class_weights": {str(label): weight for label, weight in weights.items()},
+        "seconds": round(time.perf_counter() - started, 3)
+    }
+    return scaler, pca, results, data_info
@@ -0,0 +1,403 @@
+"""
+Model loading and scoring shared by the Flask API and the command-line tools.
+"""
+import numpy as np
+import joblib
+import hashlib
+import os
+import threading
+import time
+
+from fallback import FallbackScorer, load_fallback_config
+from pipelines import compile_pipeline
+from preprocessing import PREPROCESSING_FILE, Preprocessor
+from telemetry import PREDICTED_ROWS, observe_stages
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Loaded models and scalers, keyed by model name
+MODELS = {}
+SCALERS = {}
+# Compiled scaler+PCA+model pipelines, built once per model when it loads
+PIPELINES = {}
+# Per-model load time, memory and artifact version, reported by /api/health
+LOAD_STATS = {}
+# Artifact (mtime, size) at load time, used to detect changed files
+FINGERPRINTS = {}
+MODELS_DIR = 'models'
+SCALERS_DIR = os.path.join(MODELS_DIR, 'scalers')
+
+MODEL_FILES = {
+    'random_forest': 'random_forest_model.pkl',
+    'gradient_boosting': 'gradient_boosting_model.pkl',
+    'logistic_regression': 'logistic_regression_model.pkl',
+    'svm': 'svm_model.pkl',
+    'pca_lr': 'pca_lr_model.pkl'
+}
+
+SCALER_FILES = {
+    'random_forest': 'random_forest_scaler.pkl',
+    'gradient_boosting': 'gradient_boosting_scaler.pkl',
+    'logistic_regression': 'logistic_regression_scaler.pkl',
+    'svm': 'svm_scaler.pkl',
+    'pca_lr': 'pca_lr_scaler.pkl'
+}
+
+PCA_FILE = 'pca_transformer.pkl'
+
+# Where and how models are loaded; set by load_models
+LOAD_CONFIG = {"models_dir": MODELS_DIR, "lazy": False, "mmap": False}
+_load_lock = threading.Lock()
+_attempted = set()
+
+def _resident_bytes():
+    """Current process resident set size, or None if it cannot be read"""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def _load_artifact(path, mmap=False):
+    """joblib.load, memory-mapping numpy arrays when mmap is set"""
+    if mmap:
+        # Compressed pickles cannot be mapped; joblib warns and loads them normally
+        return joblib.load(path, mmap_mode='r')
+    return joblib.load(path)
+
+def artifact_paths(name):
+    """Model, scaler and (for pca_lr) PCA artifact paths for a model"""
+    models_dir = LOAD_CONFIG["models_dir"]
+    scalers_dir = os.path.join(models_dir, 'scalers')
+    paths = {
+        "model": os.path.join(models_dir, MODEL_FILES[name]),
+        "scaler": os.path.join(scalers_dir, SCALER_FILES[name])
+    }
+    if name == 'pca_lr':
+        paths["pca"] = os.path.join(scalers_dir, PCA_FILE)
+    return paths
+
+def artifact_fingerprint(name):
+    """(mtime, size) of each artifact file, for cheap change detection"""
+    fingerprint = []
+    for path in artifact_paths(name).values():
+        try:
+            st = os.stat(path)
+            fingerprint.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            fingerprint.append(None)
+    return tuple(fingerprint)
+
+def artifact_hash(name):
+    """Content hash over a model's artifact files"""
+    digest = hashlib.sha256()
+    for path in artifact_paths(name).values():
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+        digest.update(b'\0')
+    return digest.hexdigest()[:16]
+
+def load_model(name, mmap=None, strict=False):
+    """
+    Load one model with its scaler (and PCA) and compile its pipeline.
+    The new pipeline replaces the old one in a single assignment, so
+    callers always see a matching model, scaler and PCA. With strict=True
+    (used for hot reloads) any artifact that fails to load aborts the swap
+    and the previous pipeline keeps serving.
+    """
+    mmap = LOAD_CONFIG["mmap"] if mmap is None else mmap
+    paths = artifact_paths(name)
+    _attempted.add(name)
+    
+    if not os.path.exists(paths["model"]):
+        return None
+    
+    # Taken before reading so a write during the load is seen as a change
+    fingerprint = artifact_fingerprint(name)
+    rss_before = _resident_bytes()
+    started = time.perf_counter()
+    try:
+        model = _load_artifact(paths["model"], mmap)
+        print(f"Loaded {name} model")
+    except Exception as e:
+        print(f"Could not load {name}: {e}")
+        LOAD_STATS.setdefault(name, {})["error"] = str(e)
+        FINGERPRINTS[name] = fingerprint
+        return None
+    
+    scaler = None
+    if os.path.exists(paths["scaler"]):
+        try:
+            scaler = _load_artifact(paths["scaler"], mmap)
+            print(f"Loaded {name} scaler")
+        except Exception as e:
+            print(f"Could not load {name} scaler: {e}")
+            if strict:
+                LOAD_STATS.setdefault(name, {})["error"] = str(e)
+                FINGERPRINTS[name] = fingerprint
+                return None
+    
+    # Load PCA for PCA+LR model
+    pca = None
+    if "pca" in paths and os.path.exists(paths["pca"]):
+        try:
+            pca = _load_artifact(paths["pca"], mmap)
+            print("Loaded PCA transformer")
+        except Exception as e:
+            print(f"Could not load PCA: {e}")
+            if strict:
+                LOAD_STATS.setdefault(name, {})["error"] = str(e)
+                FINGERPRINTS[name] = fingerprint
+                return None
+    
+    pipeline = compile_pipeline(model, scaler, pca, len(FEATURE_NAMES))
+    if mmap:
+        # Some estimators (libsvm-based SVC) refuse read-only mapped arrays
+        try:
+            pipeline.predict_proba(np.zeros((1, len(FEATURE_NAMES))))
+        except Exception as e:
+            print(f"{name} cannot use memory-mapped arrays ({e}), loading into memory")
+            return load_model(name, mmap=False, strict=strict)
+    
+    load_ms = (time.perf_counter() - started) * 1000.0
+    rss_after = _resident_bytes()
+    
+    MODELS[name] = model
+    if scaler is not None:
+        SCALERS[name] = scaler
+    if pca is not None:
+        SCALERS['pca'] = pca
+    FINGERPRINTS[name] = fingerprint
+    LOAD_STATS[name] = {
+        "load_ms": round(load_ms, 3),
+        "resident_bytes": rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+        "file_bytes": os.path.getsize(paths["model"]),
+        "mmap": mmap,
+        "pipeline": pipeline.kind,
+        "version": artifact_hash(name),
+        "loaded_at": time.time()
+    }
+    # Swap in the complete bundle last
+    PIPELINES[name] = pipeline
+    print(f"Compiled {name} pipeline ({pipeline.kind}) in {load_ms:.1f} ms")
+    return pipeline
+
+def load_models(models_dir=None, lazy=False, mmap=False):
+    """
+    Load trained models if they exist.
+    With lazy=True nothing is read until a model is first used; with
+    mmap=True numpy arrays are memory-mapped so forked workers share them.
+    """
+    LOAD_CONFIG["models_dir"] = models_dir or MODELS_DIR
+    LOAD_CONFIG["lazy"] = lazy
+    LOAD_CONFIG["mmap"] = mmap
+    
+    weights_path = os.environ.get('FALLBACK_WEIGHTS', os.path.join(LOAD_CONFIG["models_dir"], FALLBACK_WEIGHTS_FILE))
+    try:
+        FALLBACK.configure(load_fallback_config(weights_path), weights_path if os.path.exists(weights_path) else None)
+    except (ValueError, KeyError, TypeError) as e:
+        print(f"Ignoring fallback weights in {weights_path}: {e}")
+    load_preprocessing()
+    
+    if lazy:
+        return
+    
+    for name in MODEL_FILES:
+        with _load_lock:
+            load_model(name)
+
+def get_pipeline(name):
+    """Compiled pipeline for a model, loading it on first use in lazy mode"""
+    pipeline = PIPELINES.get(name)
+    if pipeline is not None or name not in MODEL_FILES:
+        return pipeline
+    with _load_lock:
+        if name in PIPELINES:
+            return PIPELINES[name]
+        if name in _attempted:
+            return None
+        return load_model(name)
+
+def changed_models():
+    """Models whose artifact files differ from what was last loaded, with their fingerprints"""
+    changed = {}
+    for name in MODEL_FILES:
+        if name not in _attempted:
+            continue
+        fingerprint = artifact_fingerprint(name)
+        if fingerprint[0] is not None and fingerprint != FINGERPRINTS.get(name):
+            changed[name] = fingerprint
+    return changed
+
+def reload_models(names):
+    """
+    Reload the given models. Each reload builds a new pipeline off to the
+    side and swaps it in, so scoring never pauses. Returns the names that
+    were reloaded.
+    """
+    reloaded = []
+    for name in names:
+        with _load_lock:
+            if name in PIPELINES:
+                pipeline = load_model(name, strict=True)
+            elif LOAD_CONFIG["lazy"]:
+                # Not loaded yet; let the next request pick it up
+                _attempted.discard(name)
+                continue
+            else:
+                pipeline = load_model(name)
+        if pipeline is not None:
+            reloaded.append(name)
+    if reloaded:
+        load_preprocessing()
+    return reloaded
+
+def available_models():
+    """Models with an artifact on disk, loaded or not"""
+    models_dir = LOAD_CONFIG["models_dir"]
+    return [name for name, filename in MODEL_FILES.items()
+            if os.path.exists(os.path.join(models_dir, filename))]
+
+class ModelUnavailableError(Exception):
+    """Raised by strict scoring when a model has no loaded pipeline"""
+
+# Feature order expected by every model and scaler
+FEATURE_NAMES = [
+    'age', 'gender', 'location', 'device_type', 'impressions',
+    'clicks', 'engagement_duration', 'sentiment_score',
+    'previous_interaction_score', 'ad_category'
+]
+
+VALID_MODELS = ['random_forest', 'gradient_boosting', 'logistic_regression', 'svm', 'pca_lr']
+
+# Rule-based scorer for models that are missing or fail (see fallback.py)
+FALLBACK = FallbackScorer(FEATURE_NAMES)
+FALLBACK_WEIGHTS_FILE = 'fallback_weights.json'
+
+# Vocabularies and IQR bounds fitted by save_models.py (see preprocessing.py)
+PREPROCESSING = {"preprocessor": None, "path": None}
+
+def load_preprocessing():
+    """Load preprocessing.json from the models directory, if save_models.py wrote one"""
+    path = os.path.join(LOAD_CONFIG["models_dir"], PREPROCESSING_FILE)
+    preprocessor = None
+    if os.path.exists(path):
+        try:
+            preprocessor = Preprocessor.load(path)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Ignoring preprocessing state in {path}: {e}")
+    PREPROCESSING["preprocessor"] = preprocessor
+    PREPROCESSING["path"] = path if preprocessor is not None else None
+    return preprocessor
+
+def input_warnings(X):
+    """
+    Per row of X, the values the models do not see as sent: outliers that
+    preprocess() clips to the IQR fences and categories missing from the
+    vocabularies. None when no preprocessing state is loaded.
+    """
+    preprocessor = PREPROCESSING["preprocessor"]
+    if preprocessor is None:
+        return None
+    return preprocessor.issues(X, FEATURE_NAMES)
+
+def preprocess(X):
+    """X clipped to the IQR fences the models were trained with (X itself when none are loaded)"""
+    preprocessor = PREPROCESSING["preprocessor"]
+    if preprocessor is None:
+        return X
+    return preprocessor.transform(X, FEATURE_NAMES)
+
+def features_to_matrix(rows):
+    """Build an (n, 10) float64 matrix from a list of feature dicts"""
+    return np.array([[row[name] for name in FEATURE_NAMES] for row in rows], dtype=np.float64)
+
+def columns_to_matrix(columns):
+    """Build an (n, 10) float64 matrix from columnar feature arrays"""
+    return np.column_stack([np.asarray(columns[name], dtype=np.float64) for name in FEATURE_NAMES])
+
+def label_predictions(probabilities):
+    """Vectorized prediction labels and confidence buckets"""
+    margin = np.abs(probabilities - 0.5)
+    predictions = np.where(probabilities > 0.5, "Will Convert", "Will Not Convert")
+    confidence = np.select([margin > 0.3, margin > 0.15], ["High", "Medium"], default="Low")
+    return predictions, confidence
+
+def fallback_probabilities(X, model_name, reason="model not loaded"):
+    """Rule-based conversion probabilities for a feature matrix, counted in FALLBACK.stats"""
+    FALLBACK.record(model_name, len(X), reason)
+    started = time.perf_counter()
+    probabilities = FALLBACK.predict_proba(X, model_name)
+    observe_stages(model_name, 'fallback', {'predict_proba': time.perf_counter() - started})
+    PREDICTED_ROWS.labels(model_name, 'fallback').inc(len(X))
+    return probabilities
+
+def predict_proba_batch(X, model_name='svm', strict=False):
+    """
+    Conversion probabilities for every row of X through the compiled
+    pipeline. Falls back to rule-based scoring unless strict, in which
+    case a missing or failing model raises. Rows go through the same
+    preprocessing transform as the training rows.
+    """
+    X = preprocess(X)
+    pipeline = get_pipeline(model_name)
+    if pipeline is None:
+        if strict:
+            raise ModelUnavailableError(f"Model {model_name} is not loaded")
+        return fallback_probabilities(X, model_name)
+    
+    timings = {}
+    try:
+        probabilities = pipeline.predict_proba(X, timings)
+    except Exception as e:
+        if strict:
+            raise
+        print(f"Error using model {model_name}: {e}")
+        return fallback_probabilities(X, model_name, f"{type(e).__name__}: {e}")
+    
+    observe_stages(model_name, 'model', timings)
+    PREDICTED_ROWS.labels(model_name, 'model').inc(len(X))
+    return probabilities
+
+def conversion_result(probability):
+    """Prediction label and confidence bucket for one probability"""
+    prediction = "Will Convert" if probability > 0.5 else "Will Not Convert"
+    confidence = "High" if abs(probability - 0.5) > 0.3 else "Medium" if abs(probability - 0.5) > 0.15 else "Low"
+    
+    return {
+        "probability": float(probability),
+        "prediction": prediction,
+        "confidence": confidence
+    }
+
+def predict_conversion(data, model_name='svm'):
+    """
+    Predict conversion using loaded models or fallback to rule-based.
+    """
+    X = features_to_matrix([data])
+    result = conversion_result(predict_proba_batch(X, model_name)[0])
+    warnings = input_warnings(X)
+    if warnings is not None:
+        result["input_warnings"] = warnings[0]
+    return result
+
+def predict_conversion_batch(X, model_name='svm'):
+    """Predict conversion for a feature matrix, returning columnar results"""
+    return batch_result(predict_proba_batch(X, model_name))
+
+def batch_result(probabilities):
+    """Columnar probabilities, labels and confidence buckets"""
+    predictions, confidence = label_predictions(probabilities)
+    
+    return {
+        "probabilities": probabilities.tolist(),
+        "predictions": predictions.tolist(),
+        "confidence": confidence.tolist()
+    }
@@ -0,0 +1,136 @@
+"""
+Process pool for CPU-heavy model execution.
+
+predict_proba on large tree ensembles holds the GIL, so a slow batch in a
+Flask thread stalls every other request in the process. InferencePool
+runs it in a fixed number of worker processes, each of which loads the
+models once when it starts. The pool is bounded: when max_pending
+chunks are already queued, submit raises PoolBusyError (HTTP 429).
+
+Large batches are split into chunks of chunk_rows. When a request times
+out, its chunks that have not started yet are cancelled. A chunk that is
+already running finishes in its worker and the result is dropped.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+
+import numpy as np
+
+import inference
+
+class PoolBusyError(Exception):
+    """Raised when the pool already has max_pending chunks queued"""
+
+class PoolTimeoutError(Exception):
+    """Raised when a request's chunks did not finish within its timeout"""
+
+def _init_worker(models_dir, mmap):
+    """Load every model once per worker process"""
+    inference.load_models(models_dir, lazy=False, mmap=mmap)
+
+def _score_chunk(model_name, X, version):
+    """Score one chunk in a worker, first reloading the model if the parent has a newer one"""
+    loaded = inference.LOAD_STATS.get(model_name, {}).get("version")
+    if version is not None and loaded != version:
+        inference.reload_models([model_name])
+    return inference.predict_proba_batch(X, model_name, strict=True)
+
+def _ping():
+    return os.getpid()
+
+class InferencePool:
+    """Fixed-size process pool with preloaded models, bounded queue and per-request timeouts"""
+    
+    def __init__(self, workers=2, max_pending=64, timeout=10.0, chunk_rows=5000):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.chunk_rows = chunk_rows
+        self._executor = None
+        self._pid = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "chunks": 0, "rejected": 0, "timeouts": 0, "cancelled": 0, "errors": 0}
+    
+    def _get_executor(self):
+        # A forked server worker cannot use its parent's pool, so it builds its own
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                    initargs=(os.path.abspath(inference.LOAD_CONFIG["models_dir"]), inference.LOAD_CONFIG["mmap"])
+                )
+                self._pid = os.getpid()
+                self._pending = 0
+            return self._executor
+    
+    def warm(self):
+        """Start every worker process (and so load the models) before the first request"""
+        executor = self._get_executor()
+        futures = [executor.submit(_ping) for _ in range(self.workers)]
+        return sorted({future.result() for future in futures})
+    
+    def _release(self, future):
+        with self._lock:
+            self._pending -= 1
+    
+    def submit(self, X, model_name):
+        """Queue X in chunks; returns the list of futures or raises PoolBusyError"""
+        executor = self._get_executor()
+        chunks = max(1, -(-len(X) // self.chunk_rows))
+        with self._lock:
+            if self._pending + chunks > self.max_pending:
+                self._stats["rejected"] += 1
+                raise PoolBusyError(f"Inference pool is busy ({self._pending} chunks queued)")
+            self._pending += chunks
+            self._stats["requests"] += 1
+            self._stats["chunks"] += chunks
+        
+        version = inference.LOAD_STATS.get(model_name, {}).get("version")
+        futures = []
+        for start in range(0, max(len(X), 1), self.chunk_rows):
+            future = executor.submit(_score_chunk, model_name, X[start:start + self.chunk_rows], version)
+            future.add_done_callback(self._release)
+            futures.append(future)
+        return futures
+    
+    def cancel(self, futures):
+        """Cancel the chunks that have not started; returns how many were cancelled"""
+        cancelled = sum(1 for future in futures if future.cancel())
+        with self._lock:
+            self._stats["cancelled"] += cancelled
+        return cancelled
+    
+    def predict_proba(self, X, model_name, timeout=None):
+        """Probabilities for X computed in the pool, within timeout seconds"""
+        timeout = self.timeout if timeout is None else timeout
+        futures = self.submit(X, model_name)
+        deadline = time.monotonic() + timeout
+        try:
+            parts = [future.result(max(0.0, deadline - time.monotonic())) for future in futures]
+        except FutureTimeoutError:
+            self.cancel(futures)
+            with self._lock:
+                self._stats["timeouts"] += 1
+            raise PoolTimeoutError(f"Scoring with {model_name} took longer than {timeout:g} s")
+        except Exception:
+            self.cancel(futures)
+            with self._lock:
+                self._stats["errors"] += 1
+            raise
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+    
+    def metrics(self):
+        with self._lock:
+            return dict(self._stats, workers=self.workers, pending=self._pending, max_pending=self.max_pending)
+    
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,130 @@
+"""
+Background computation of expensive, cacheable results.
+
+A CachedJob keeps the latest result of a computation together with the
+key it was computed for (dataset signature, model versions, settings).
+When the key changes the job is rerun on a background thread while the
+previous result keeps being served, so request handlers never block on it.
+Results are persisted, so other worker processes pick them up from disk.
+"""
+import json
+import os
+import threading
+import time
+
+import joblib
+
+# Every CachedJob, so forked workers can reset them
+JOBS = []
+
+class CachedJob:
+    """One cached result, recomputed in the background when its key changes"""
+    
+    def __init__(self, name, compute, cache_path=None):
+        self.name = name
+        self.compute = compute
+        self.cache_path = cache_path
+        self.key = None
+        self.result = None
+        self.error = None
+        self.running = False
+        self.computed_at = None
+        self.duration = None
+        self._failed_key = None
+        self._lock = threading.Lock()
+        self._disk_mtime = None
+        JOBS.append(self)
+    
+    @staticmethod
+    def make_key(*parts):
+        return json.dumps(parts, sort_keys=True, default=str)
+    
+    def _load_from_disk(self):
+        """Pick up a result saved by this or another process since the last read"""
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            mtime = os.stat(self.cache_path).st_mtime_ns
+            if mtime == self._disk_mtime:
+                return
+            self._disk_mtime = mtime
+            saved = joblib.load(self.cache_path)
+            self.key = saved["key"]
+            self.result = saved["result"]
+            self.computed_at = saved.get("computed_at")
+        except Exception as e:
+            print(f"Could not read cached {self.name}: {e}")
+    
+    def _save_to_disk(self):
+        if not self.cache_path:
+            return
+        os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+        tmp_path = f"{self.cache_path}.tmp-{os.getpid()}"
+        joblib.dump({"key": self.key, "result": self.result, "computed_at": self.computed_at}, tmp_path)
+        os.replace(tmp_path, self.cache_path)
+        self._disk_mtime = os.stat(self.cache_path).st_mtime_ns
+    
+    def _run(self, key, args):
+        started = time.perf_counter()
+        try:
+            result = self.compute(*args)
+            with self._lock:
+                self.key = key
+                self.result = result
+                self.error = None
+                self.computed_at = time.time()
+                self.duration = time.perf_counter() - started
+            self._save_to_disk()
+            print(f"Computed {self.name} in {self.duration:.1f} s")
+        except Exception as e:
+            # Not retried until the key changes
+            self.error = str(e)
+            self._failed_key = key
+            print(f"Could not compute {self.name}: {e}")
+        finally:
+            self.running = False
+    
+    def get(self, key, *args, background=True):
+        """
+        Result for key. If it is missing or stale, start computing it (on
+        a thread unless background=False) and return what is cached now.
+        """
+        with self._lock:
+            if self.key != key and not self.running:
+                self._load_from_disk()
+            if self.key == key or self.running or self._failed_key == key:
+                return self.result
+            self.running = True
+        
+        if background:
+            threading.Thread(target=self._run, args=(key, args), name=f"job-{self.name}", daemon=True).start()
+            return self.result
+        self._run(key, args)
+        return self.result
+    
+    def after_fork(self):
+        """Threads do not survive fork: forget a computation running in the parent"""
+        self._lock = threading.Lock()
+        if self.running:
+            self.running = False
+            self._disk_mtime = None
+    
+    def is_fresh(self, key):
+        return self.key == key and self.result is not None
+    
+    def status(self, key=None):
+        return {
+            "ready": self.result is not None,
+            "fresh": key is None or self.key == key,
+            "running": self.running,
+            "computed_at": self.computed_at,
+            "duration_seconds": self.duration,
+            "error": self.error
+        }
+
+def _reset_jobs_after_fork():
+    for job in JOBS:
+        job.after_fork()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_jobs_after_fork)
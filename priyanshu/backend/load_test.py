@@ -0,0 +1,296 @@
+"""
+Load test of the HTTP API with per-endpoint latency percentiles.
+
+Starts serve.py on a free local port (or targets a running server with
+--url) and sends concurrent load to each scenario in turn: single-row
+and batch /api/predict for every model, /api/dataset/preview and the
+visualization routes. Every client thread keeps one HTTP/1.1
+connection open, like a browser or a service client would.
+
+Results (throughput, p50/p95/p99 latency and status codes per scenario)
+can be written as JSON and compared against an earlier run; scenarios
+whose p95 or throughput got worse by more than --tolerance are flagged
+and the exit code is 1.
+
+Usage:
+    python load_test.py --workers 2 --threads 4 --concurrency 8
+    python load_test.py --url http://127.0.0.1:5000 --scenarios predict
+    python load_test.py --json results.json --baseline baseline.json
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+
+import numpy as np
+
+from bench_data import feature_rows
+from inference import FEATURE_NAMES, VALID_MODELS
+
+VISUALIZATIONS = ['roc', 'confusion_matrix', 'feature_importance', 'missing_data', 'pca', 'clusters']
+GROUPS = ['predict', 'batch', 'dataset', 'visualizations']
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def start_server(args, port):
+    """serve.py as a subprocess; returns once /api/health answers"""
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    command = [sys.executable, os.path.join(backend_dir, 'serve.py'), '--port', str(port),
+               '--workers', str(args.workers), '--threads', str(args.threads), '--server', args.server]
+    log = open(args.server_log, 'w') if args.server_log else subprocess.DEVNULL
+    process = subprocess.Popen(command, cwd=backend_dir, stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.time() + args.startup_timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"serve.py exited with code {process.returncode}"
+                               + (f"; see {args.server_log}" if args.server_log else "; rerun with --server-log"))
+        try:
+            status, _ = request_once(f"http://127.0.0.1:{port}", 'GET', '/api/health')
+            if status == 200:
+                return process
+        except OSError:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(f"serve.py did not answer within {args.startup_timeout}s")
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+def request_once(url, method, path, body=None):
+    parsed = urllib.parse.urlsplit(url)
+    conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=10)
+    try:
+        conn.request(method, path, body=body, headers={'Content-Type': 'application/json'} if body else {})
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+def build_scenarios(args, models):
+    """[(name, method, path or [paths], [bodies])]; requests cycle through paths and bodies"""
+    rows = feature_rows(args.distinct, seed=args.seed)
+    scenarios = []
+    if 'predict' in args.scenarios:
+        for model in models:
+            bodies = [json.dumps(dict(zip(FEATURE_NAMES, row), model=model)).encode()
+                      for row in rows.tolist()]
+            scenarios.append((f"predict/{model}", 'POST', '/api/predict', bodies))
+    if 'batch' in args.scenarios:
+        for model in models:
+            bodies = []
+            for start in range(0, max(len(rows) - args.batch_size, 0) + 1, args.batch_size):
+                batch = rows[start:start + args.batch_size].tolist()
+                bodies.append(json.dumps({"model": model, "rows": batch}).encode())
+            scenarios.append((f"batch{args.batch_size}/{model}", 'POST', '/api/predict/batch', bodies))
+    if 'dataset' in args.scenarios:
+        paths = [f"/api/dataset/preview?offset={offset}&limit=50" for offset in range(0, 5000, 50)]
+        scenarios.append(("dataset/preview", 'GET', paths, [None]))
+    if 'visualizations' in args.scenarios:
+        for name in VISUALIZATIONS:
+            scenarios.append((f"visualizations/{name}", 'GET', f"/api/visualizations/{name}", [None]))
+    return scenarios
+
+def drive(url, method, paths, bodies, requests, concurrency, latencies=None, statuses=None, failures=None):
+    """Closed-loop load: concurrency clients, each sending its next request when the last one returns"""
+    parsed = urllib.parse.urlsplit(url)
+    headers = {'Content-Type': 'application/json'} if method == 'POST' else {}
+    next_index = [0]
+    lock = threading.Lock()
+    
+    def client():
+        conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=30)
+        while True:
+            with lock:
+                index = next_index[0]
+                next_index[0] += 1
+            if index >= requests:
+                break
+            started = time.perf_counter()
+            try:
+                conn.request(method, paths[index % len(paths)], body=bodies[index % len(bodies)], headers=headers)
+                response = conn.getresponse()
+                response.read()
+                status = str(response.status)
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=30)
+                status = 'error'
+                if failures is not None and len(failures) < 5:
+                    failures.append(str(e))
+            if latencies is not None:
+                latencies[index] = time.perf_counter() - started
+            if statuses is not None:
+                with lock:
+                    statuses[status] = statuses.get(status, 0) + 1
+        conn.close()
+    
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started
+
+def run_scenario(url, method, paths, bodies, requests, concurrency, warmup):
+    """Throughput, latency percentiles (ms) and status codes of one scenario"""
+    paths = paths if isinstance(paths, list) else [paths]
+    if warmup:
+        drive(url, method, paths, bodies, warmup, concurrency)
+    latencies = np.zeros(requests)
+    statuses = {}
+    failures = []
+    wall = drive(url, method, paths, bodies, requests, concurrency, latencies, statuses, failures)
+    
+    latencies *= 1000
+    ok = sum(count for status, count in statuses.items() if status.startswith('2'))
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "ok": ok,
+        "errors": requests - ok,
+        "statuses": statuses,
+        "failures": failures,
+        "throughput_rps": requests / wall,
+        "mean_ms": float(latencies.mean()),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "max_ms": float(latencies.max())
+    }
+
+def compare(results, baseline, tolerance, slack_ms):
+    """
+    Scenarios whose p95 rose (by more than tolerance and slack_ms) or whose
+    throughput fell by more than tolerance vs the baseline.
+    """
+    previous = {result["scenario"]: result for result in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        before = previous.get(result["scenario"])
+        if before is None:
+            continue
+        result["baseline_p95_ms"] = before["p95_ms"]
+        result["baseline_throughput_rps"] = before["throughput_rps"]
+        reasons = []
+        if result["p95_ms"] > max(before["p95_ms"] * (1 + tolerance), before["p95_ms"] + slack_ms):
+            reasons.append(f"p95 {before['p95_ms']:.1f} -> {result['p95_ms']:.1f} ms")
+        if before["throughput_rps"] and result["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+            reasons.append(f"throughput {before['throughput_rps']:.0f} -> {result['throughput_rps']:.0f} req/s")
+        if result["errors"] > before.get("errors", 0):
+            reasons.append(f"errors {before.get('errors', 0)} -> {result['errors']}")
+        if reasons:
+            result["regression"] = reasons
+            regressions.append((result["scenario"], reasons))
+    return regressions
+
+def print_table(results):
+    print(f"\n{'scenario':<36} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} {'vs p95':>8}")
+    for result in results:
+        delta = '-'
+        if result.get("baseline_p95_ms"):
+            delta = f"{result['p95_ms'] / result['baseline_p95_ms'] - 1:+.0%}"
+        flag = '  REGRESSION' if result.get("regression") else ''
+        print(f"{result['scenario']:<36} {result['throughput_rps']:>8.1f} {result['p50_ms']:>8.1f} "
+              f"{result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} {result['errors']:>7} {delta:>8}{flag}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the backend API")
+    parser.add_argument('--url', help="test a running server instead of starting serve.py")
+    parser.add_argument('--workers', type=int, default=2, help="serve.py worker processes")
+    parser.add_argument('--threads', type=int, default=4, help="serve.py threads per worker")
+    parser.add_argument('--server', default='auto', help="serve.py --server")
+    parser.add_argument('--server-log', help="write the server's output to this file")
+    parser.add_argument('--startup-timeout', type=float, default=300,
+                        help="seconds to wait for serve.py (it precomputes the dataset analyses)")
+    parser.add_argument('--scenarios', nargs='*', default=GROUPS, choices=GROUPS)
+    parser.add_argument('--models', nargs='*', help="models to score (default: all available)")
+    parser.add_argument('--requests', type=int, default=500, help="requests per scenario")
+    parser.add_argument('--concurrency', type=int, default=8, help="concurrent clients")
+    parser.add_argument('--warmup', type=int, default=20, help="unmeasured requests before each scenario")
+    parser.add_argument('--batch-size', type=int, default=100, help="rows per /api/predict/batch request")
+    parser.add_argument('--distinct', type=int, default=5000,
+                        help="distinct feature rows; fewer rows means more prediction cache hits")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help="write the results to this file")
+    parser.add_argument('--baseline', help="results file of an earlier run to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="allowed relative p95 increase / throughput drop before flagging")
+    parser.add_argument('--slack-ms', type=float, default=1.0,
+                        help="p95 increases smaller than this are never flagged (timer noise)")
+    args = parser.parse_args()
+    
+    process = None
+    url = args.url
+    if url is None:
+        port = free_port()
+        url = f"http://127.0.0.1:{port}"
+        print(f"Starting serve.py on {url} ({args.workers} worker(s) x {args.threads} thread(s))...")
+        process = start_server(args, port)
+    
+    try:
+        status, body = request_once(url, 'GET', '/api/health')
+        if status != 200:
+            sys.exit(f"{url}/api/health returned {status}")
+        health = json.loads(body)
+        models = args.models or [name for name in health.get("models_available", VALID_MODELS) if name in VALID_MODELS]
+        
+        results = []
+        for name, method, paths, bodies in build_scenarios(args, models):
+            result = run_scenario(url, method, paths, bodies, args.requests, args.concurrency, args.warmup)
+            result["scenario"] = name
+            results.append(result)
+            print(f"{name}: {result['throughput_rps']:.1f} req/s, p95 {result['p95_ms']:.1f} ms"
+                  + (f", {result['errors']} errors {result['failures'][:1]}" if result['errors'] else ""))
+    finally:
+        if process is not None:
+            stop_server(process)
+    
+    report = {
+        "timestamp": time.time(),
+        "url": args.url,
+        "server": None if args.url else {"workers": args.workers, "threads": args.threads, "server": args.server},
+        "options": {"requests": args.requests, "concurrency": args.concurrency,
+                    "batch_size": args.batch_size, "distinct": args.distinct},
+        "cpu_count": os.cpu_count(),
+        "models_loaded": health.get("models_loaded"),
+        "results": results
+    }
+    
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("options") != report["options"] or baseline.get("server") != report["server"]:
+            print(f"Warning: the baseline ran with {baseline.get('options')} on {baseline.get('server')}; "
+                  "latencies are only comparable under the same load")
+        regressions = compare(results, baseline, args.tolerance, args.slack_ms)
+    print_table(results)
+    
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.json}")
+    
+    if regressions:
+        print(f"\n{len(regressions)} scenario(s) regressed by more than {args.tolerance:.0%}:")
+        for name, reasons in regressions:
+            print(f"  {name}: {'; '.join(reasons)}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+2-D PCA projection of the dataset for /api/visualizations/pca.
+
+One streaming pass over the CSV keeps a reservoir sample of rows. The
+sample is projected through the trained pca_transformer.pkl (with the
+pca_lr scaler) when it is loaded. Otherwise an IncrementalPCA is fitted
+in the same pass on the numeric columns the notebooks use. The result
+is cached per dataset signature, PCA artifact version and sample size,
+and computed on a background thread.
+"""
+import os
+
+import numpy as np
+from sklearn.decomposition import IncrementalPCA
+
+from dataset_store import DATASET_CACHE_DIR, source_signature
+from dataset_stats import STATS_CHUNK_SIZE, iter_complete_rows, reservoir_slots
+from inference import FEATURE_NAMES, SCALERS, LOAD_STATS, get_pipeline
+from jobs import CachedJob
+
+PCA_SAMPLE_SIZE = int(os.environ.get('PCA_SAMPLE_SIZE', 50000))
+PCA_CACHE_PATH = os.path.join(DATASET_CACHE_DIR, 'pca', 'projection.joblib')
+
+# Columns projected in DATA_PROCESSING.ipynb when no trained PCA is available
+NOTEBOOK_PCA_COLUMNS = [
+    'age', 'impressions', 'clicks', 'conversions', 'engagement_duration',
+    'previous_interaction_score', 'sentiment_score'
+]
+
+def stream_sample(csv_path, columns, sample_size, ipca=None, chunksize=STATS_CHUNK_SIZE, seed=42):
+    """
+    Reservoir sample of complete rows over columns, optionally fitting an
+    IncrementalPCA on every chunk in the same pass.
+    """
+    rng = np.random.default_rng(seed)
+    reservoir = np.empty((sample_size, len(columns)))
+    seen = 0
+    for X in iter_complete_rows(csv_path, columns, chunksize):
+        if ipca is not None and len(X) >= ipca.n_components:
+            ipca.partial_fit(X)
+        rows, slots = reservoir_slots(seen, len(X), sample_size, rng)
+        reservoir[slots] = X[rows]
+        seen += len(X)
+    return reservoir[:min(seen, sample_size)], seen
+
+def compute_projection(csv_path, sample_size, scaler=None, pca=None):
+    """Project a reservoir sample onto its first two principal components"""
+    if pca is not None and getattr(pca, 'n_components_', 0) >= 2:
+        sample, seen = stream_sample(csv_path, FEATURE_NAMES, sample_size)
+        features = scaler.transform(sample) if scaler is not None else sample
+        points = pca.transform(features)[:, :2]
+        explained = pca.explained_variance_ratio_[:2]
+        method = "pca_transformer"
+        columns = FEATURE_NAMES
+    else:
+        ipca = IncrementalPCA(n_components=2)
+        sample, seen = stream_sample(csv_path, NOTEBOOK_PCA_COLUMNS, sample_size, ipca)
+        points = ipca.transform(sample)
+        explained = ipca.explained_variance_ratio_
+        method = "incremental_pca"
+        columns = NOTEBOOK_PCA_COLUMNS
+    
+    return {
+        "points": np.ascontiguousarray(points, dtype='<f4'),
+        "explained_variance": [float(v) for v in explained],
+        "method": method,
+        "columns": columns,
+        "rows_seen": int(seen)
+    }
+
+PCA_JOB = CachedJob('pca projection', compute_projection, PCA_CACHE_PATH)
+
+def get_projection(csv_path, sample_size=PCA_SAMPLE_SIZE, background=True):
+    """Cached projection for the dataset as it is now, or the previous one while it recomputes"""
+    # Loads pca_lr (and so the PCA transformer) if it is still lazy
+    get_pipeline('pca_lr')
+    pca = SCALERS.get('pca')
+    scaler = SCALERS.get('pca_lr')
+    version = LOAD_STATS.get('pca_lr', {}).get('version') if pca is not None else None
+    
+    key = CachedJob.make_key(source_signature(csv_path), version, sample_size)
+    result = PCA_JOB.get(key, csv_path, sample_size, scaler, pca, background=background)
+    return result, PCA_JOB.status(key)
@@ -0,0 +1,188 @@
+"""
+Inference pipelines compiled once when models are loaded.
+
+Linear models (logistic regression, linear-kernel SVM, PCA + logistic
+regression, and their out-of-core SGD equivalents) have the StandardScaler and PCA projection folded into a
+single weight vector and bias, so scoring is one dot product plus a
+sigmoid. Everything else keeps the sklearn transform/predict_proba path.
+"""
+import time
+
+import numpy as np
+from scipy.special import expit
+
+# Max allowed difference between a fused pipeline and sklearn. For some
+# fits libsvm's SVC probabilities drift from sigmoid(A * f + B) by 1e-3 or
+# more; those fail the probe and keep the sklearn path.
+FUSED_TOLERANCE = 1e-6
+
+def _lap(timings, stage, started):
+    """Store the seconds since started under timings[stage]; returns now"""
+    now = time.perf_counter()
+    if timings is not None:
+        timings[stage] = now - started
+    return now
+
+class PlattLinearSVM:
+    """
+    Linear SVM (e.g. SGDClassifier(loss='hinge')) with Platt-scaled
+    probabilities: P(positive) = sigmoid(a * decision_function + b).
+    """
+    
+    def __init__(self, svm, a, b):
+        self.svm = svm
+        self.a = float(a)
+        self.b = float(b)
+    
+    @property
+    def classes_(self):
+        return self.svm.classes_
+    
+    @property
+    def coef_(self):
+        return self.svm.coef_
+    
+    @property
+    def intercept_(self):
+        return self.svm.intercept_
+    
+    def decision_function(self, X):
+        return self.svm.decision_function(X)
+    
+    def predict_proba(self, X):
+        positive = expit(self.a * self.decision_function(X) + self.b)
+        return np.column_stack([1.0 - positive, positive])
+    
+    def predict(self, X):
+        return self.classes_[(self.predict_proba(X)[:, 1] >= 0.5).astype(int)]
+
+class SklearnPipeline:
+    """Scaler -> PCA -> model, run through sklearn"""
+    kind = 'sklearn'
+    
+    def __init__(self, model, scaler=None, pca=None):
+        self.model = model
+        self.scaler = scaler
+        self.pca = pca
+    
+    def predict_proba(self, X, timings=None):
+        """Positive-class probability for every row of X, with per-stage seconds in timings"""
+        features = X
+        started = time.perf_counter()
+        if self.scaler is not None:
+            features = self.scaler.transform(features)
+            started = _lap(timings, 'scaling', started)
+        if self.pca is not None:
+            features = self.pca.transform(features)
+            started = _lap(timings, 'pca', started)
+        probabilities = self.model.predict_proba(features)[:, 1]
+        _lap(timings, 'predict_proba', started)
+        return probabilities
+
+class LinearPipeline:
+    """Scaler, PCA and a linear model folded into sigmoid(X @ weights + bias)"""
+    kind = 'fused_linear'
+    
+    def __init__(self, weights, bias):
+        self.weights = np.ascontiguousarray(weights, dtype=np.float64)
+        self.bias = float(bias)
+    
+    def predict_proba(self, X, timings=None):
+        """Positive-class probability for every row of X (one stage: predict_proba)"""
+        started = time.perf_counter()
+        probabilities = expit(X @ self.weights + self.bias)
+        _lap(timings, 'predict_proba', started)
+        return probabilities
+
+def _scaler_affine(scaler, n_features):
+    """StandardScaler as (W, c) with transform(X) == X @ W + c"""
+    mean = scaler.mean_ if getattr(scaler, 'mean_', None) is not None and scaler.with_mean else np.zeros(n_features)
+    scale = scaler.scale_ if getattr(scaler, 'scale_', None) is not None and scaler.with_std else np.ones(n_features)
+    return np.diag(1.0 / scale), -mean / scale
+
+def _pca_affine(pca):
+    """PCA as (W, c) with transform(X) == X @ W + c"""
+    W = pca.components_.T
+    if pca.whiten:
+        W = W / np.sqrt(pca.explained_variance_)
+    return W, -pca.mean_ @ W
+
+def _linear_logit(model):
+    """(coef, intercept) so the positive-class logit is z @ coef + intercept"""
+    name = type(model).__name__
+    coef = np.ravel(model.coef_)
+    intercept = float(np.ravel(model.intercept_)[0])
+    
+    if name == 'LogisticRegression' or name == 'SGDClassifier':
+        return coef, intercept
+    
+    if name == 'SVC':
+        # Platt scaling over the sklearn decision function
+        A, B = float(model.probA_[0]), float(model.probB_[0])
+        return -A * coef, B - A * intercept
+    
+    if name == 'PlattLinearSVM':
+        return model.a * coef, model.a * intercept + model.b
+    
+    raise TypeError(f"{name} has no fused form")
+
+def _is_fusable(model):
+    """True for binary linear models whose probabilities are a sigmoid of a dot product"""
+    if getattr(model, 'classes_', None) is None or len(model.classes_) != 2:
+        return False
+    name = type(model).__name__
+    if name == 'LogisticRegression' or name == 'PlattLinearSVM':
+        return True
+    if name == 'SGDClassifier':
+        return model.loss in ('log_loss', 'log')
+    if name == 'SVC':
+        return model.kernel == 'linear' and len(getattr(model, 'probA_', [])) == 1
+    return False
+
+def fuse_linear(model, scaler=None, pca=None, n_features=10):
+    """Fold scaler and PCA into the linear model's weights"""
+    W = np.eye(n_features)
+    c = np.zeros(n_features)
+    
+    if scaler is not None:
+        Ws, cs = _scaler_affine(scaler, n_features)
+        W, c = W @ Ws, c @ Ws + cs
+    
+    if pca is not None:
+        Wp, cp = _pca_affine(pca)
+        W, c = W @ Wp, c @ Wp + cp
+    
+    coef, intercept = _linear_logit(model)
+    return LinearPipeline(W @ coef, c @ coef + intercept)
+
+def compile_pipeline(model, scaler=None, pca=None, n_features=10):
+    """
+    Build the fastest pipeline that reproduces sklearn's predict_proba.
+    Fused pipelines are checked against sklearn on probe rows around the
+    scaler mean and dropped if they disagree.
+    """
+    reference = SklearnPipeline(model, scaler, pca)
+    if not _is_fusable(model):
+        return reference
+    
+    try:
+        fused = fuse_linear(model, scaler, pca, n_features)
+        
+        rng = np.random.default_rng(0)
+        center = scaler.mean_ if scaler is not None and getattr(scaler, 'mean_', None) is not None else np.zeros(n_features)
+        spread = scaler.scale_ if scaler is not None and getattr(scaler, 'scale_', None) is not None else np.ones(n_features)
+        probe = center + rng.normal(size=(64, n_features)) * spread
+        
+        fused_probabilities = fused.predict_proba(probe)
+        reference_probabilities = reference.predict_proba(probe)
+        error = np.max(np.abs(fused_probabilities - reference_probabilities))
+        if error > FUSED_TOLERANCE:
+            print(f"Fused pipeline differs from sklearn by {error:.2e}, using sklearn path")
+            return reference
+        if not np.array_equal(fused_probabilities > 0.5, reference_probabilities > 0.5):
+            print("Fused pipeline changes predicted labels, using sklearn path")
+            return reference
+        return fused
+    except Exception as e:
+        print(f"Could not fuse {type(model).__name__}: {e}")
+        return reference
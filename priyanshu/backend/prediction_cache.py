@@ -0,0 +1,183 @@
+"""
+In-process cache of conversion probabilities.
+
+Requests repeat the same feature tuples, so the probability for each
+(model, artifact version, feature row) is kept in an LRU of bounded size
+with an optional time-to-live. Continuous features can be quantized
+first (e.g. engagement_duration to whole seconds), so that nearby values
+share one entry. The quantized row is what gets scored, so a cached
+answer never depends on which request in the bucket came first.
+
+Entries of a model are dropped as soon as its artifact version changes,
+so a hot reload never serves the previous model's probabilities.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from inference import FEATURE_NAMES, LOAD_STATS
+
+PREDICTION_CACHE_SIZE = int(os.environ.get('PREDICTION_CACHE_SIZE', 100000))
+PREDICTION_CACHE_TTL = float(os.environ.get('PREDICTION_CACHE_TTL', 0))
+# Batches larger than this skip the cache (bulk scoring rarely repeats rows)
+PREDICTION_CACHE_MAX_BATCH = int(os.environ.get('PREDICTION_CACHE_MAX_BATCH', 1000))
+# e.g. "engagement_duration=1,sentiment_score=0.01"
+PREDICTION_CACHE_QUANTIZE = os.environ.get('PREDICTION_CACHE_QUANTIZE', '')
+
+def parse_quantize(spec):
+    """{feature: step} from "feature=step,..." """
+    steps = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, step = item.partition('=')
+        name = name.strip()
+        if name not in FEATURE_NAMES:
+            raise ValueError(f"Unknown feature to quantize: {name}")
+        steps[name] = float(step)
+        if steps[name] <= 0:
+            raise ValueError(f"Quantization step for {name} must be positive")
+    return steps
+
+def model_version(model_name):
+    return LOAD_STATS.get(model_name, {}).get("version")
+
+class PredictionCache:
+    """LRU/TTL cache of per-row probabilities keyed by model, artifact version and features"""
+    
+    backend = 'memory'
+    
+    def __init__(self, max_entries=PREDICTION_CACHE_SIZE, ttl=PREDICTION_CACHE_TTL,
+                 quantize=None, max_batch=PREDICTION_CACHE_MAX_BATCH):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_batch = max_batch
+        self.quantize_steps = dict(quantize or {})
+        self._columns = [FEATURE_NAMES.index(name) for name in self.quantize_steps]
+        self._steps = np.array(list(self.quantize_steps.values()), dtype=np.float64)
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._stats = {}
+        self.evictions = 0
+        self._lock = threading.Lock()
+    
+    def quantize(self, X):
+        """Copy of X with the configured features rounded to their step"""
+        Xq = np.array(X, dtype=np.float64)
+        if self._columns:
+            Xq[:, self._columns] = np.round(Xq[:, self._columns] / self._steps) * self._steps
+        # -0.0 and 0.0 must map to the same key
+        Xq += 0.0
+        return Xq
+    
+    def _count(self, model_name, **counts):
+        with self._lock:
+            stats = self._stats.get(model_name)
+            if stats is None:
+                stats = self._stats[model_name] = {
+                    "hits": 0, "misses": 0, "expired": 0, "invalidations": 0, "bypassed": 0
+                }
+            for name, value in counts.items():
+                stats[name] += value
+    
+    def _check_version(self, model_name, version):
+        """Drop a model's entries once its artifact version changes"""
+        with self._lock:
+            previous = self._versions.get(model_name, version)
+            self._versions[model_name] = version
+        if previous != version:
+            self._drop_version(model_name, previous)
+            self._count(model_name, invalidations=1)
+    
+    def _drop_version(self, model_name, version):
+        with self._lock:
+            stale = [key for key in self._entries if key[0] == model_name]
+            for key in stale:
+                del self._entries[key]
+    
+    def _lookup(self, model_name, version, rows, probabilities, now):
+        """Fill probabilities for cached rows; returns (indices of missing rows, expired count)"""
+        missing = []
+        expired = 0
+        with self._lock:
+            for i, row in enumerate(rows):
+                key = (model_name, version, row)
+                entry = self._entries.get(key)
+                if entry is not None and (entry[1] is None or entry[1] > now):
+                    self._entries.move_to_end(key)
+                    probabilities[i] = entry[0]
+                    continue
+                if entry is not None:
+                    del self._entries[key]
+                    expired += 1
+                missing.append(i)
+        return missing, expired
+    
+    def _store(self, model_name, version, rows, probabilities, expires):
+        with self._lock:
+            for row, probability in zip(rows, probabilities):
+                key = (model_name, version, row)
+                self._entries[key] = (probability, expires)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def score(self, X, model_name, score_fn):
+        """
+        Probabilities for every row of X. Rows already cached are answered
+        from the cache and the rest are scored together with
+        score_fn(X, model_name).
+        """
+        # Bypassed rows are quantized too, so a row's probability never
+        # depends on the size of the batch it arrived in
+        Xq = self.quantize(X)
+        if self.max_entries <= 0 or len(X) > self.max_batch:
+            self._count(model_name, bypassed=len(X))
+            return score_fn(Xq, model_name)
+        
+        version = model_version(model_name)
+        self._check_version(model_name, version)
+        rows = [row.tobytes() for row in Xq]
+        probabilities = np.empty(len(rows), dtype=np.float64)
+        now = time.time()
+        missing, expired = self._lookup(model_name, version, rows, probabilities, now)
+        self._count(model_name, hits=len(rows) - len(missing), misses=len(missing), expired=expired)
+        if not missing:
+            return probabilities
+        
+        scored = np.asarray(score_fn(Xq[missing], model_name), dtype=np.float64)
+        probabilities[missing] = scored
+        # A reload (or lazy first load) while scoring: the result belongs to neither version
+        if model_version(model_name) != version:
+            return probabilities
+        
+        expires = now + self.ttl if self.ttl > 0 else None
+        self._store(model_name, version, [rows[i] for i in missing], scored.tolist(), expires)
+        return probabilities
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def size(self):
+        with self._lock:
+            return len(self._entries)
+    
+    def metrics(self):
+        with self._lock:
+            models = {}
+            for model_name, stats in self._stats.items():
+                lookups = stats["hits"] + stats["misses"]
+                models[model_name] = dict(stats, hit_rate=stats["hits"] / lookups if lookups else None)
+            evictions = self.evictions
+        return {
+            "backend": self.backend,
+            "entries": self.size(),
+            "max_entries": self.max_entries,
+            "evictions": evictions,
+            "ttl_seconds": self.ttl,
+            "quantize": self.quantize_steps,
+            "models": models
+        }
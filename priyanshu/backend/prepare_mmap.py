@@ -0,0 +1,41 @@
+"""
+Rewrite model artifacts so joblib.load(..., mmap_mode='r') can map them.
+
+Compressed pickles (e.g. saved from a notebook with compress=3) are loaded
+and saved again uncompressed. Start the backend with MMAP_MODELS=1 to
+memory-map the arrays.
+
+Usage:
+    python prepare_mmap.py [models_dir]
+"""
+import os
+import sys
+
+import joblib
+
+def rewrite_uncompressed(path):
+    """Re-dump one artifact without compression, replacing it atomically"""
+    obj = joblib.load(path)
+    tmp_path = path + '.tmp'
+    joblib.dump(obj, tmp_path, compress=0)
+    os.replace(tmp_path, path)
+
+def main():
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    models_dir = sys.argv[1] if len(sys.argv) > 1 else os.path.join(backend_dir, 'models')
+    
+    for root, _, files in os.walk(models_dir):
+        for filename in sorted(files):
+            if not filename.endswith('.pkl'):
+                continue
+            path = os.path.join(root, filename)
+            try:
+                rewrite_uncompressed(path)
+                print(f"✓ {os.path.relpath(path, models_dir)}")
+            except Exception as e:
+                print(f"✗ {os.path.relpath(path, models_dir)}: {e}")
+    
+    print("\nArtifacts ready. Start the backend with MMAP_MODELS=1 to memory-map them.")
+
+if __name__ == '__main__':
+    main()
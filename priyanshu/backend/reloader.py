@@ -0,0 +1,91 @@
+"""
+Hot reload of model artifacts.
+
+ModelWatcher polls the artifact files under models/ and reloads a model
+once its files have stopped changing for one poll interval, so a
+half-copied scaler is never paired with a new model. /api/admin/reload
+triggers the same reload on demand.
+"""
+import threading
+import time
+
+from inference import PIPELINES, changed_models, reload_models
+
+class ModelWatcher:
+    """Background thread that reloads models whose artifacts changed"""
+    
+    def __init__(self, interval=5.0):
+        self.interval = interval
+        self.last_poll = None
+        self.last_reload = None
+        self.reloaded = []
+        self._pending = {}
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="model-watcher", daemon=True)
+            self._thread.start()
+        return self
+    
+    def stop(self):
+        self._stop.set()
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"Model watcher error: {e}")
+    
+    def poll(self):
+        """Reload models whose fingerprint is unchanged since the previous poll"""
+        changed = changed_models()
+        settled = [name for name, fingerprint in changed.items() if self._pending.get(name) == fingerprint]
+        self._pending = {name: fingerprint for name, fingerprint in changed.items() if name not in settled}
+        self.last_poll = time.time()
+        
+        if settled:
+            self.reloaded = reload_models(settled)
+            self.last_reload = time.time()
+            if self.reloaded:
+                print(f"Hot-reloaded models: {', '.join(self.reloaded)}")
+        return settled
+    
+    def status(self):
+        return {
+            "interval_seconds": self.interval,
+            "running": self._thread is not None and self._thread.is_alive(),
+            "last_poll": self.last_poll,
+            "last_reload": self.last_reload,
+            "last_reloaded": self.reloaded,
+            "pending": sorted(self._pending)
+        }
+
+_reload_lock = threading.Lock()
+_reload_state = {"running": False, "started": None, "finished": None, "reloaded": [], "requested": []}
+
+def reload_now(names=None, force=False):
+    """Reload changed models (or all loaded ones with force) right away"""
+    if names is None:
+        names = list(PIPELINES) if force else list(changed_models())
+    with _reload_lock:
+        _reload_state.update(running=True, started=time.time(), requested=list(names))
+        try:
+            reloaded = reload_models(names)
+        finally:
+            _reload_state.update(running=False, finished=time.time())
+        _reload_state["reloaded"] = reloaded
+    return reloaded
+
+def reload_in_background(names=None, force=False):
+    """Start reload_now on a background thread; returns False if one is already running"""
+    if _reload_state["running"]:
+        return False
+    threading.Thread(target=reload_now, args=(names, force), name="model-reload", daemon=True).start()
+    return True
+
+def reload_status():
+    return dict(_reload_state)
@@ -0,0 +1,221 @@
+"""
+Compiled request schema for the scoring endpoints.
+
+A FeatureSchema is built once per feature list and parses a request
+straight into a preallocated float64 matrix in one pass, collecting
+every problem as a structured {"row", "field", "error"} entry instead of
+stopping at the first one. Besides JSON, high-volume clients can send
+    - application/octet-stream: raw little-endian float32 rows, with the
+      model in the query string (?model=svm)
+    - application/msgpack: the same payload as the JSON body; "float32"
+      may hold the rows as raw little-endian float32 bytes
+"""
+import math
+
+import numpy as np
+
+from inference import FEATURE_NAMES
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON_TYPES = ('application/json',)
+MSGPACK_TYPES = ('application/msgpack', 'application/x-msgpack')
+FLOAT32_TYPES = ('application/octet-stream', 'application/x-float32')
+# Errors listed in one response; the count is always complete
+MAX_REPORTED_ERRORS = 50
+
+class SchemaError(ValueError):
+    """Invalid scoring payload, with one entry per bad field"""
+    
+    def __init__(self, errors, fields=FEATURE_NAMES):
+        self.errors = errors
+        self.fields = list(fields)
+        super().__init__(self.message())
+    
+    @staticmethod
+    def describe(error):
+        prefix = f"Row {error['row']}: " if error.get('row') is not None else ""
+        if error.get('field') is None:
+            return f"{prefix}{error['error']}"
+        if error['error'] == 'missing':
+            return f"{prefix}Missing field: {error['field']}"
+        return f"{prefix}Invalid value for {error['field']}: {error['error']}"
+    
+    def message(self):
+        if not self.errors:
+            return "Invalid payload"
+        missing = [e['field'] for e in self.errors if e['error'] == 'missing' and e.get('row') is None]
+        if missing and len(missing) == len(self.errors):
+            return f"Missing fields: {', '.join(missing)}"
+        more = len(self.errors) - 1
+        return self.describe(self.errors[0]) + (f" (and {more} more)" if more else "")
+    
+    def to_dict(self):
+        return {
+            "error": self.message(),
+            "errors": [{key: value for key, value in error.items() if value is not None}
+                       for error in self.errors[:MAX_REPORTED_ERRORS]],
+            "error_count": len(self.errors),
+            "required_fields": self.fields
+        }
+
+class UnsupportedPayload(ValueError):
+    """Content type the scoring endpoints cannot decode"""
+
+def decode_payload(content_type, body, json_fn, args):
+    """
+    Request body as a dict: parsed JSON, unpacked MessagePack, or
+    {"model": ?model, "float32": body} for raw float32 rows.
+    """
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    if content_type in FLOAT32_TYPES:
+        return {"model": args.get('model', 'svm'), "float32": body}
+    if content_type in MSGPACK_TYPES:
+        if msgpack is None:
+            raise UnsupportedPayload("MessagePack payloads need the msgpack package (pip install msgpack)")
+        try:
+            data = msgpack.unpackb(body, raw=False)
+        except Exception as e:
+            raise UnsupportedPayload(f"Invalid MessagePack payload: {e}")
+        if not isinstance(data, dict):
+            raise UnsupportedPayload("MessagePack payload must be a map")
+        return data
+    if content_type in JSON_TYPES or content_type.endswith('+json'):
+        data = json_fn()
+        if data is not None and not isinstance(data, dict):
+            raise UnsupportedPayload("JSON payload must be an object")
+        return data
+    raise UnsupportedPayload("Request must be JSON, MessagePack or float32 rows (application/octet-stream)")
+
+class FeatureSchema:
+    """Parser of feature payloads into (n, len(fields)) float64 matrices"""
+    
+    def __init__(self, fields=FEATURE_NAMES):
+        self.fields = tuple(fields)
+        self.width = len(self.fields)
+    
+    def _fill(self, out, data, row, errors):
+        """Copy one dict into out, appending an entry to errors for each bad field"""
+        for j, field in enumerate(self.fields):
+            try:
+                out[j] = data[field]
+            except KeyError:
+                errors.append({"row": row, "field": field, "error": "missing"})
+            except (TypeError, ValueError):
+                errors.append({"row": row, "field": field, "error": "must be a number"})
+    
+    def _check_finite(self, X, errors, numbered=True):
+        if not errors and not np.isfinite(X).all():
+            for i, j in np.argwhere(~np.isfinite(X))[:MAX_REPORTED_ERRORS]:
+                errors.append({"row": int(i) if numbered else None, "field": self.fields[j], "error": "must be finite"})
+    
+    def parse_row(self, data):
+        """(1, width) matrix from one {field: value} dict"""
+        # Fast path for a valid row; anything else is re-parsed field by field
+        try:
+            X = np.array([[data[field] for field in self.fields]], dtype=np.float64)
+            if math.isfinite(sum(X[0].tolist())):
+                return X
+        except (KeyError, TypeError, ValueError):
+            pass
+        
+        X = np.empty((1, self.width), dtype=np.float64)
+        errors = []
+        if not isinstance(data, dict):
+            raise SchemaError([{"row": None, "field": None, "error": "expected an object of features"}], self.fields)
+        self._fill(X[0], data, None, errors)
+        self._check_finite(X, errors, numbered=False)
+        if errors:
+            raise SchemaError(errors, self.fields)
+        return X
+    
+    def parse_rows(self, rows):
+        """Matrix from a list of dicts or of width-long value lists"""
+        if not isinstance(rows, list):
+            raise SchemaError([{"row": None, "field": "rows", "error": "must be a list"}], self.fields)
+        if not rows:
+            raise SchemaError([{"row": None, "field": "rows", "error": "must not be empty"}], self.fields)
+        errors = []
+        X = np.empty((len(rows), self.width), dtype=np.float64)
+        if rows and not isinstance(rows[0], dict):
+            try:
+                X[:] = rows
+            except (TypeError, ValueError):
+                for i, row in enumerate(rows):
+                    if isinstance(row, dict) or not hasattr(row, '__len__') or len(row) != self.width:
+                        errors.append({"row": i, "field": None, "error": f"expected {self.width} values"})
+                        continue
+                    for j, value in enumerate(row):
+                        try:
+                            X[i, j] = value
+                        except (TypeError, ValueError):
+                            errors.append({"row": i, "field": self.fields[j], "error": "must be a number"})
+        else:
+            for i, row in enumerate(rows):
+                if not isinstance(row, dict):
+                    errors.append({"row": i, "field": None, "error": "expected an object of features"})
+                    continue
+                self._fill(X[i], row, i, errors)
+        self._check_finite(X, errors)
+        if errors:
+            raise SchemaError(errors, self.fields)
+        return X
+    
+    def parse_columns(self, columns):
+        """Matrix from {field: [values]} arrays of equal length"""
+        if not isinstance(columns, dict):
+            raise SchemaError([{"row": None, "field": "columns", "error": "must be an object"}], self.fields)
+        errors = [{"row": None, "field": field, "error": "missing"} for field in self.fields if field not in columns]
+        if errors:
+            raise SchemaError(errors, self.fields)
+        lengths = {len(columns[field]) if isinstance(columns[field], list) else -1 for field in self.fields}
+        if len(lengths) != 1 or -1 in lengths:
+            raise SchemaError([{"row": None, "field": "columns", "error": "must be lists of equal length"}], self.fields)
+        n_rows = lengths.pop()
+        if not n_rows:
+            raise SchemaError([{"row": None, "field": "columns", "error": "must not be empty"}], self.fields)
+        X = np.empty((n_rows, self.width), dtype=np.float64)
+        for j, field in enumerate(self.fields):
+            try:
+                X[:, j] = columns[field]
+            except (TypeError, ValueError):
+                errors.append({"row": None, "field": field, "error": "must be a number"})
+        self._check_finite(X, errors)
+        if errors:
+            raise SchemaError(errors, self.fields)
+        return X
+    
+    def parse_float32(self, body):
+        """Matrix from raw little-endian float32 rows"""
+        if not isinstance(body, (bytes, bytearray, memoryview)):
+            raise SchemaError([{"row": None, "field": "float32", "error": "must be bytes"}], self.fields)
+        row_bytes = 4 * self.width
+        if not len(body):
+            raise SchemaError([{"row": None, "field": "float32", "error": "must not be empty"}], self.fields)
+        if len(body) % row_bytes:
+            raise SchemaError([{"row": None, "field": "float32",
+                                "error": f"length must be a multiple of {row_bytes} bytes"}], self.fields)
+        X = np.frombuffer(body, dtype='<f4').reshape(-1, self.width).astype(np.float64)
+        errors = []
+        self._check_finite(X, errors)
+        if errors:
+            raise SchemaError(errors, self.fields)
+        return X
+    
+    def parse_batch(self, data):
+        """Matrix from a batch payload with "rows", "columns" or "float32" """
+        if not isinstance(data, dict):
+            raise SchemaError([{"row": None, "field": None, "error": "expected an object"}], self.fields)
+        if data.get('float32') is not None:
+            return self.parse_float32(data['float32'])
+        if data.get('columns') is not None:
+            return self.parse_columns(data['columns'])
+        if data.get('rows') is not None:
+            return self.parse_rows(data['rows'])
+        raise SchemaError([{"row": None, "field": None, "error": "provide 'rows', 'columns' or 'float32'"}],
+                          self.fields)
+
+FEATURE_SCHEMA = FeatureSchema(FEATURE_NAMES)
@@ -0,0 +1,133 @@
+"""
+Serialized-response cache for the read-only dashboard endpoints.
+
+Each cached route is rendered once per version of its inputs (dataset
+signature, model artifact hashes, background job results). The body is
+kept as bytes together with gzip and, when the brotli package is
+installed, brotli encodings and a strong ETag per encoding. Repeated
+requests are served from those bytes, and If-None-Match gets a 304.
+"""
+import functools
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from flask import Response, make_response, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 256))
+RESPONSE_CACHE_MAX_AGE = int(os.environ.get('RESPONSE_CACHE_MAX_AGE', 0))
+MIN_COMPRESS_BYTES = 1024
+
+# Headers rebuilt for every cached response instead of replayed
+_SKIP_HEADERS = {'content-length', 'content-type', 'content-encoding', 'etag', 'cache-control', 'vary'}
+
+class _Entry:
+    """One rendered response in every encoding"""
+    
+    def __init__(self, version, response):
+        body = response.get_data()
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.version = version
+        self.status = response.status_code
+        self.content_type = response.content_type
+        self.headers = [(k, v) for k, v in response.headers.items() if k.lower() not in _SKIP_HEADERS]
+        self.bodies = {'identity': body}
+        if len(body) >= MIN_COMPRESS_BYTES:
+            self.bodies['gzip'] = gzip.compress(body, 6)
+            if brotli is not None:
+                self.bodies['br'] = brotli.compress(body, quality=5)
+        self.etags = {
+            encoding: f'"{digest}"' if encoding == 'identity' else f'"{digest}-{encoding}"'
+            for encoding in self.bodies
+        }
+    
+    @property
+    def size(self):
+        return sum(len(body) for body in self.bodies.values())
+
+class ResponseCache:
+    """LRU of rendered responses keyed by path and query string"""
+    
+    def __init__(self, max_entries=RESPONSE_CACHE_MAX_ENTRIES, max_age=RESPONSE_CACHE_MAX_AGE):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def cached(self, version_fn):
+        """
+        Decorator for a view whose output only depends on version_fn() and
+        the query string. Non-200 responses (e.g. 202 while a job is
+        still computing) pass through uncached.
+        """
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                key = (request.path, request.query_string)
+                version = version_fn()
+                with self._lock:
+                    entry = self._entries.get(key)
+                    if entry is not None and entry.version == version:
+                        self._entries.move_to_end(key)
+                        self.hits += 1
+                    else:
+                        entry = None
+                        self.misses += 1
+                
+                if entry is None:
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200 or response.is_streamed:
+                        return response
+                    entry = _Entry(version, response)
+                    with self._lock:
+                        self._entries[key] = entry
+                        self._entries.move_to_end(key)
+                        while len(self._entries) > self.max_entries:
+                            self._entries.popitem(last=False)
+                return self._serve(entry)
+            return wrapper
+        return decorator
+    
+    def _serve(self, entry):
+        headers = list(entry.headers)
+        headers.append(('Cache-Control', f"public, max-age={self.max_age}, must-revalidate"))
+        headers.append(('Vary', 'Accept-Encoding'))
+        
+        for encoding, etag in entry.etags.items():
+            if etag.strip('"') in request.if_none_match:
+                self.not_modified += 1
+                return Response(status=304, headers=headers + [('ETag', etag)])
+        
+        offered = [encoding for encoding in ('br', 'gzip', 'identity') if encoding in entry.bodies]
+        encoding = request.accept_encodings.best_match(offered, default='identity')
+        if encoding not in entry.bodies:
+            encoding = 'identity'
+        headers.append(('ETag', entry.etags[encoding]))
+        if encoding != 'identity':
+            headers.append(('Content-Encoding', encoding))
+        return Response(entry.bodies[encoding], status=entry.status, headers=headers, content_type=entry.content_type)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def metrics(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": sum(entry.size for entry in self._entries.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+                "brotli": brotli is not None
+            }
@@ -1,84 +1,359 @@
 """
-Script to save trained models from your notebooks.
-Run this after training your models in the notebooks.
+Train the five models on ad_campaign_data.csv and save them for the API.
+
+The CSV is read in chunks and split with the same row-number hash as
+evaluation.py, so the models never see the rows /api/models evaluates
+them on. One StandardScaler (and one PCA for pca_lr) is fitted on the
+training rows. The scaled matrix is shared by every model: joblib passes
+it to the parallel training workers as a memory map instead of a copy.
+The models train in parallel, longest first, and the random forest
+also spreads its trees over --rf-jobs cores.
+
+With --out-of-core only the linear models are trained, streaming the
+CSV through partial_fit so memory stays flat however large the file is
+(see incremental.py).
+
+Artifacts are written atomically under the names inference.py loads.
+models/manifest.json records, per model:
+    - the data split
+    - the parameters and library versions
+    - the training time and held-out AUC
+    - the sha256 of every file
+Entries of models that were not retrained are kept.
+
+Before training, preprocessing.py is fitted on the training rows. Every
+training and held-out row is clipped to its IQR fences, and the fences
+and vocabularies are saved as models/preprocessing.json, so the API
+clips requests the same way. --no-preprocess trains on the raw rows.
+The file is shared by every model, so a run is refused when it would
+change the preprocessing of models in --output that it does not retrain.
+
+Usage:
+    python save_models.py
+    python save_models.py --data ../ad_campaign_data.csv --jobs 4 --rf-jobs 4
+    python save_models.py --models logistic_regression pca_lr --output /tmp/models
+    python save_models.py --out-of-core --data full_history.csv --epochs 5
 """
+import argparse
+import hashlib
+import json
+import os
+import platform
+import shutil
+import time
 
 import joblib
 import numpy as np
 import pandas as pd
+import sklearn
+from sklearn.decomposition import PCA
 from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
 from sklearn.linear_model import LogisticRegression
-from sklearn.svm import SVC
+from sklearn.metrics import accuracy_score, roc_auc_score
 from sklearn.preprocessing import StandardScaler
-from sklearn.decomposition import PCA
-import os
+from sklearn.svm import SVC
+
+import inference
+from evaluation import TARGET_COLUMN, TEST_FRACTION, holdout_mask
+from incremental import OUT_OF_CORE_MODELS, train_out_of_core
+from inference import FEATURE_NAMES, MODEL_FILES, SCALER_FILES, PCA_FILE, VALID_MODELS
+from pipelines import PlattLinearSVM
+from preprocessing import PREPROCESSING_FILE, fit_csv
+
+MANIFEST_FILE = 'manifest.json'
+# Longest first, so the short fits fill in around the forest
+TRAINING_ORDER = ['random_forest', 'gradient_boosting', 'svm', 'logistic_regression', 'pca_lr']
+
+def read_split(csv_path, chunksize, test_fraction, preprocessor=None):
+    """
+    (X_train, y_train, X_test, y_test) from complete rows, split by
+    evaluation.holdout_mask, both run through the preprocessor's transform
+    """
+    columns = FEATURE_NAMES + [TARGET_COLUMN]
+    train, test = [], []
+    offset = 0
+    for chunk in pd.read_csv(csv_path, usecols=columns, chunksize=chunksize):
+        held_out = holdout_mask(np.arange(offset, offset + len(chunk)), test_fraction)
+        offset += len(chunk)
+        values = chunk[columns].to_numpy(dtype=np.float64)
+        complete = ~np.isnan(values).any(axis=1)
+        train.append(values[complete & ~held_out])
+        test.append(values[complete & held_out])
+    train = np.concatenate(train)
+    test = np.concatenate(test)
+    X_train, X_test = train[:, :-1], test[:, :-1]
+    if preprocessor is not None:
+        X_train = preprocessor.transform(X_train, FEATURE_NAMES)
+        X_test = preprocessor.transform(X_test, FEATURE_NAMES)
+    return X_train, (train[:, -1] > 0).astype(int), X_test, (test[:, -1] > 0).astype(int), offset
+
+def build_estimator(name, args):
+    if name == 'random_forest':
+        return RandomForestClassifier(n_estimators=200, random_state=args.seed, class_weight='balanced',
+                                      n_jobs=args.rf_jobs)
+    if name == 'gradient_boosting':
+        return GradientBoostingClassifier(n_estimators=100, learning_rate=0.1, random_state=args.seed)
+    if name == 'svm':
+        return SVC(kernel='linear', random_state=args.seed, probability=True, class_weight='balanced')
+    return LogisticRegression(solver='liblinear', random_state=args.seed, class_weight='balanced')
+
+def train_one(name, args, X, y, X_test, y_test):
+    """Fit one model on the shared (already scaled or projected) matrix; runs in a worker"""
+    if name == 'svm' and args.svm_rows and len(X) > args.svm_rows:
+        # libsvm with Platt scaling is roughly quadratic in the row count
+        rows = np.random.default_rng(args.seed).choice(len(X), args.svm_rows, replace=False)
+        X, y = X[rows], y[rows]
+    model = build_estimator(name, args)
+    started = time.perf_counter()
+    model.fit(X, y)
+    seconds = time.perf_counter() - started
+    probabilities = model.predict_proba(X_test)[:, 1]
+    return name, model, {
+        "train_seconds": round(seconds, 3),
+        "train_rows": int(len(X)),
+        "test_auc": float(roc_auc_score(y_test, probabilities)) if len(np.unique(y_test)) == 2 else None,
+        "test_accuracy": float(accuracy_score(y_test, probabilities >= 0.5))
+    }
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def preprocessing_sha256(preprocessor):
+    """sha256 of a fitted preprocessing state, None for raw rows"""
+    if preprocessor is None:
+        return None
+    return hashlib.sha256(json.dumps(preprocessor.to_dict(), sort_keys=True).encode()).hexdigest()
+
+def check_preprocessing(output, models, state_sha256):
+    """
+    Refuse to train when models in output that are not retrained were
+    trained with other preprocessing. Models without a recorded state
+    predate preprocessing.json and were trained on the raw rows.
+    """
+    recorded = {}
+    manifest_path = os.path.join(output, MANIFEST_FILE)
+    if os.path.exists(manifest_path):
+        try:
+            with open(manifest_path) as f:
+                recorded = json.load(f).get("models", {})
+        except (OSError, ValueError):
+            pass
+    kept = [name for name, filename in MODEL_FILES.items()
+            if name not in models and os.path.exists(os.path.join(output, filename))]
+    stale = [name for name in kept if recorded.get(name, {}).get("preprocessing_sha256") != state_sha256]
+    if stale:
+        raise SystemExit(
+            f"{', '.join(stale)} in {output} were trained with other preprocessing than this run's, "
+            f"and {PREPROCESSING_FILE} is shared by every model. Retrain them too "
+            f"(--models {' '.join(list(models) + stale)}) or use another --output."
+        )
+
+def estimator_params(model):
+    if isinstance(model, PlattLinearSVM):
+        return dict(model.svm.get_params(), platt_a=model.a, platt_b=model.b)
+    return model.get_params()
+
+def dump_atomic(obj, path):
+    """joblib.dump to a temporary file, then rename over path"""
+    tmp_path = path + '.tmp'
+    joblib.dump(obj, tmp_path)
+    os.replace(tmp_path, path)
+
+def copy_atomic(source, path):
+    tmp_path = path + '.tmp'
+    shutil.copyfile(source, tmp_path)
+    os.replace(tmp_path, path)
+
+def train_in_memory(data_path, args, preprocessor=None):
+    """(scaler, pca, [(name, model, metrics)], data info) with every training row in memory"""
+    print(f"Reading {data_path} in chunks of {args.chunksize} rows...")
+    X_train, y_train, X_test, y_test, raw_rows = read_split(data_path, args.chunksize, args.test_fraction,
+                                                            preprocessor)
+    print(f"✓ {len(X_train)} training and {len(X_test)} held-out rows ({y_train.mean():.1%} positive)")
+    
+    # Fitted once; every model trains on the same scaled matrix
+    scaler = StandardScaler().fit(X_train)
+    X_scaled = scaler.transform(X_train)
+    X_test_scaled = scaler.transform(X_test)
+    pca = None
+    if 'pca_lr' in args.models:
+        pca = PCA(n_components=3, random_state=args.seed).fit(X_scaled)
+    
+    tasks = []
+    for name in TRAINING_ORDER:
+        if name not in args.models:
+            continue
+        if name == 'pca_lr':
+            tasks.append((name, pca.transform(X_scaled), pca.transform(X_test_scaled)))
+        else:
+            tasks.append((name, X_scaled, X_test_scaled))
+    
+    print(f"Training {len(tasks)} model(s), {args.jobs} at a time...")
+    started = time.perf_counter()
+    results = joblib.Parallel(n_jobs=args.jobs)(
+        joblib.delayed(train_one)(name, args, X, y_train, X_test, y_test) for name, X, X_test in tasks
+    )
+    data_info = {
+        "raw_rows": raw_rows,
+        "train_rows": int(len(X_train)),
+        "test_rows": int(len(X_test)),
+        "test_fraction": args.test_fraction,
+        "positive_rate": float(y_train.mean()),
+        "seconds": round(time.perf_counter() - started, 3)
+    }
+    return scaler, pca, results, data_info
+
+def write_manifest(output, run, models, artifacts, removed=()):
+    """Merge this run's models and artifacts into output/manifest.json, dropping removed artifacts"""
+    manifest_path = os.path.join(output, MANIFEST_FILE)
+    manifest = {"models": {}, "artifacts": {}}
+    if os.path.exists(manifest_path):
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Replacing unreadable manifest {manifest_path}: {e}")
+    manifest.update(features=FEATURE_NAMES, target=TARGET_COLUMN, updated_at=run["created_at"], last_run=run)
+    manifest.setdefault("models", {}).update(models)
+    manifest.setdefault("artifacts", {}).update(artifacts)
+    for path in removed:
+        manifest["artifacts"].pop(path, None)
+    with open(manifest_path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2, default=str)
+    os.replace(manifest_path + '.tmp', manifest_path)
+    return manifest_path
+
+def fit_preprocessor(data_path, args):
+    """Preprocessor fitted on the training rows only, so held-out rows never shape the bounds"""
+    started = time.perf_counter()
+    columns = FEATURE_NAMES + [TARGET_COLUMN]
+    training_rows = lambda offset, n: ~holdout_mask(np.arange(offset, offset + n), args.test_fraction)
+    preprocessor = fit_csv(data_path, columns, args.chunksize, training_rows, seed=args.seed)
+    bounds = ', '.join(f"{col} [{low:g}, {high:g}]" for col, (low, high) in preprocessor.bounds.items())
+    print(f"✓ Preprocessing fitted on {preprocessor.rows_fitted} rows in {time.perf_counter() - started:.1f}s: {bounds}")
+    return preprocessor
 
-# Create models directory
-os.makedirs('models', exist_ok=True)
-os.makedirs('models/scalers', exist_ok=True)
-
-print("Creating example models...")
-print("Note: Replace these with your actual trained models from notebooks")
-
-# Sample data for training (replace with your actual data)
-np.random.seed(42)
-n_samples = 1000
-
-# Create sample features matching your dataset
-X_sample = np.random.rand(n_samples, 10)
-y_sample = (np.random.rand(n_samples) > 0.9).astype(int)  # 90/10 imbalance
-
-# StandardScaler
-scaler = StandardScaler()
-X_scaled = scaler.fit_transform(X_sample)
-
-# 1. Random Forest
-print("Training Random Forest...")
-rf_model = RandomForestClassifier(n_estimators=200, random_state=42, class_weight='balanced')
-rf_model.fit(X_scaled, y_sample)
-joblib.dump(rf_model, 'models/random_forest_model.pkl')
-joblib.dump(scaler, 'models/scalers/random_forest_scaler.pkl')
-print("✓ Random Forest saved")
-
-# 2. Gradient Boosting
-print("Training Gradient Boosting...")
-gb_model = GradientBoostingClassifier(n_estimators=100, learning_rate=0.1, random_state=42)
-gb_model.fit(X_scaled, y_sample)
-joblib.dump(gb_model, 'models/gradient_boosting_model.pkl')
-joblib.dump(scaler, 'models/scalers/gradient_boosting_scaler.pkl')
-print("✓ Gradient Boosting saved")
-
-# 3. Logistic Regression
-print("Training Logistic Regression...")
-lr_model = LogisticRegression(solver='liblinear', random_state=42, class_weight='balanced')
-lr_model.fit(X_scaled, y_sample)
-joblib.dump(lr_model, 'models/logistic_regression_model.pkl')
-joblib.dump(scaler, 'models/scalers/logistic_regression_scaler.pkl')
-print("✓ Logistic Regression saved")
-
-# 4. SVM
-print("Training SVM...")
-svm_model = SVC(kernel='linear', random_state=42, probability=True, class_weight='balanced')
-svm_model.fit(X_scaled, y_sample)
-joblib.dump(svm_model, 'models/svm_model.pkl')
-joblib.dump(scaler, 'models/scalers/svm_scaler.pkl')
-print("✓ SVM saved")
-
-# 5. PCA + Logistic Regression
-print("Training PCA + Logistic Regression...")
-pca = PCA(n_components=3)
-X_pca = pca.fit_transform(X_scaled)
-pca_lr_model = LogisticRegression(solver='liblinear', random_state=42, class_weight='balanced')
-pca_lr_model.fit(X_pca, y_sample)
-joblib.dump(pca_lr_model, 'models/pca_lr_model.pkl')
-joblib.dump(pca, 'models/scalers/pca_transformer.pkl')
-joblib.dump(scaler, 'models/scalers/pca_lr_scaler.pkl')
-print("✓ PCA + Logistic Regression saved")
-
-print("\n✅ All models saved!")
-print("\nTo use your actual models:")
-print("1. Train models in your notebooks")
-print("2. Replace the model training code above with:")
-print("   joblib.dump(your_model, 'models/your_model_name.pkl')")
-print("   joblib.dump(your_scaler, 'models/scalers/your_scaler.pkl')")
+def main():
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    
+    parser = argparse.ArgumentParser(description="Train and save the models served by the API")
+    parser.add_argument('--data', default=None, help="training CSV (default: ad_campaign_data.csv in the project)")
+    parser.add_argument('--output', default=os.path.join(backend_dir, 'models'), help="models directory")
+    parser.add_argument('--models', nargs='*', choices=VALID_MODELS,
+                        help="models to train (default: all, or the linear ones with --out-of-core)")
+    parser.add_argument('--chunksize', type=int, default=50000, help="CSV rows read at a time")
+    parser.add_argument('--test-fraction', type=float, default=TEST_FRACTION,
+                        help="held-out fraction; keep it equal to EVAL_TEST_FRACTION")
+    parser.add_argument('--jobs', type=int, default=min(len(VALID_MODELS), os.cpu_count() or 1),
+                        help="models trained at the same time")
+    parser.add_argument('--rf-jobs', type=int, default=os.cpu_count() or 1, help="random forest n_jobs")
+    parser.add_argument('--svm-rows', type=int, default=10000,
+                        help="training rows sampled for the SVM (0 for all; libsvm is quadratic)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--out-of-core', action='store_true',
+                        help="stream the CSV through partial_fit (linear models only)")
+    parser.add_argument('--epochs', type=int, default=5, help="SGD passes over the data (--out-of-core)")
+    parser.add_argument('--alpha', type=float, default=1e-4, help="SGD regularization strength (--out-of-core)")
+    parser.add_argument('--calibration-fraction', type=float, default=0.1,
+                        help="training rows kept back for the SVM's Platt scaling (--out-of-core)")
+    parser.add_argument('--no-preprocess', action='store_true',
+                        help="train on the raw rows, without IQR clipping or preprocessing.json")
+    args = parser.parse_args()
+    
+    if args.models is None:
+        args.models = OUT_OF_CORE_MODELS if args.out_of_core else VALID_MODELS
+    if args.out_of_core:
+        unsupported = [name for name in args.models if name not in OUT_OF_CORE_MODELS]
+        if unsupported:
+            parser.error(f"--out-of-core trains only {', '.join(OUT_OF_CORE_MODELS)}, not {', '.join(unsupported)}")
+    
+    data_path = args.data
+    if data_path is None:
+        candidates = [os.path.join(os.path.dirname(backend_dir), 'ad_campaign_data.csv'),
+                      os.path.join(backend_dir, 'ad_campaign_data.csv')]
+        data_path = next((path for path in candidates if os.path.exists(path)), None)
+        if data_path is None:
+            raise SystemExit("ad_campaign_data.csv not found; pass --data")
+    
+    total_started = time.perf_counter()
+    preprocessor = None if args.no_preprocess else fit_preprocessor(data_path, args)
+    state_sha256 = preprocessing_sha256(preprocessor)
+    check_preprocessing(args.output, args.models, state_sha256)
+    if args.out_of_core:
+        print(f"Streaming {data_path} in chunks of {args.chunksize} rows...")
+        scaler, pca, results, data_info = train_out_of_core(data_path, args.models, args, preprocessor)
+    else:
+        scaler, pca, results, data_info = train_in_memory(data_path, args, preprocessor)
+    
+    scalers_dir = os.path.join(args.output, 'scalers')
+    os.makedirs(scalers_dir, exist_ok=True)
+    # The scaler is pickled once; every model's scaler file is a copy of the same bytes
+    shared_scaler = os.path.join(scalers_dir, 'standard_scaler.pkl')
+    dump_atomic(scaler, shared_scaler)
+    if pca is not None:
+        dump_atomic(pca, os.path.join(scalers_dir, PCA_FILE))
+    # Before the models: a watcher that reloads a new model must already clip with its fences
+    preprocessing_path = os.path.join(args.output, PREPROCESSING_FILE)
+    if preprocessor is not None:
+        preprocessor.save(preprocessing_path)
+    elif os.path.exists(preprocessing_path):
+        # check_preprocessing made sure no model left in args.output still uses it
+        os.remove(preprocessing_path)
+    
+    mode = 'out_of_core' if args.out_of_core else 'in_memory'
+    data_sha256 = file_sha256(data_path)
+    manifest_models = {}
+    for name, model, metrics in results:
+        # Scaler before model, so a watcher that sees the new model also finds its scaler
+        copy_atomic(shared_scaler, os.path.join(scalers_dir, SCALER_FILES[name]))
+        dump_atomic(model, os.path.join(args.output, MODEL_FILES[name]))
+        manifest_models[name] = dict(metrics, estimator=type(model).__name__, params=estimator_params(model),
+                                     mode=mode, data_sha256=data_sha256, preprocessing_sha256=state_sha256,
+                                     trained_at=time.time())
+        auc = f"AUC {metrics['test_auc']:.4f}" if metrics["test_auc"] is not None else "AUC n/a"
+        print(f"✓ {name}: {metrics['train_seconds']:.1f}s on {metrics['train_rows']} rows, {auc}")
+    
+    inference.LOAD_CONFIG["models_dir"] = args.output
+    artifacts = {}
+    for name in manifest_models:
+        files = inference.artifact_paths(name)
+        manifest_models[name]["files"] = {kind: os.path.relpath(path, args.output) for kind, path in files.items()}
+        manifest_models[name]["version"] = inference.artifact_hash(name)
+        for path in files.values():
+            artifacts[os.path.relpath(path, args.output)] = {"sha256": file_sha256(path), "bytes": os.path.getsize(path)}
+    shared = [shared_scaler] + ([preprocessing_path] if preprocessor is not None else [])
+    for path in shared:
+        artifacts[os.path.relpath(path, args.output)] = {"sha256": file_sha256(path), "bytes": os.path.getsize(path)}
+    
+    run = {
+        "created_at": time.time(),
+        "mode": mode,
+        "models": [name for name, _, _ in results],
+        "data": dict(data_info, path=os.path.abspath(data_path), sha256=data_sha256),
+        "seed": args.seed,
+        "preprocessing": preprocessor.to_dict() if preprocessor is not None else None,
+        "options": {key: getattr(args, key) for key in (
+            ('chunksize', 'epochs', 'alpha', 'calibration_fraction') if args.out_of_core
+            else ('chunksize', 'jobs', 'rf_jobs', 'svm_rows')
+        )},
+        "versions": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "scikit-learn": sklearn.__version__,
+            "joblib": joblib.__version__
+        },
+        "total_seconds": round(time.perf_counter() - total_started, 3)
+    }
+    removed = [] if preprocessor is not None else [PREPROCESSING_FILE]
+    manifest_path = write_manifest(args.output, run, manifest_models, artifacts, removed)
+    
+    print(f"\n✅ Saved {len(manifest_models)} model(s) to {args.output} in {run['total_seconds']:.1f}s")
+    print(f"Manifest: {manifest_path}")
 
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+Score a CSV file of any size with one of the trained models.
+
+Usage:
+    python score_csv.py ad_campaign_data.csv -o scored.csv --model svm
+    python score_csv.py ad_campaign_data.csv --format ndjson > scored.ndjson
+"""
+import argparse
+import contextlib
+import os
+import sys
+
+from inference import VALID_MODELS, load_models, MODELS
+from streaming import DEFAULT_CHUNK_SIZE, OUTPUT_FORMATS, iter_scored_chunks, serialize_chunks
+
+def main():
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    
+    parser = argparse.ArgumentParser(description="Stream-score a CSV file in chunks")
+    parser.add_argument('input', help="CSV file to score ('-' for stdin)")
+    parser.add_argument('-o', '--output', help="Output file (default: stdout)")
+    parser.add_argument('--model', default='svm', choices=VALID_MODELS)
+    parser.add_argument('--format', default='csv', choices=OUTPUT_FORMATS)
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--passthrough', nargs='*', default=None,
+                        help="Input columns copied to the output (default: user_id ad_id)")
+    parser.add_argument('--models-dir', default=os.path.join(backend_dir, 'models'))
+    args = parser.parse_args()
+    
+    # Keep stdout clean for the scored rows
+    with contextlib.redirect_stdout(sys.stderr):
+        load_models(args.models_dir)
+    
+    if args.model not in MODELS:
+        print(f"Model {args.model} not loaded, using rule-based scoring", file=sys.stderr)
+    
+    source = sys.stdin if args.input == '-' else args.input
+    chunks = iter_scored_chunks(source, args.model, args.chunksize, args.passthrough)
+    
+    out = open(args.output, 'w', newline='') if args.output else sys.stdout
+    try:
+        for text in serialize_chunks(chunks, args.format):
+            out.write(text)
+    finally:
+        if args.output:
+            out.close()
+
+if __name__ == '__main__':
+    main()
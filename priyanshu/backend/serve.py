@@ -0,0 +1,145 @@
+"""
+Production entry point for the backend.
+
+On Linux/macOS the app runs under gunicorn with preload: models, scalers
+and the dataset analysis results are loaded once in the master process,
+then workers are forked and share those pages copy-on-write. On Windows
+(no fork) it falls back to waitress, and to Flask's threaded server if
+neither is installed. There are no interactive prompts, so it can run in
+a container or as a service.
+
+    python serve.py --workers 4 --threads 8
+    WEB_WORKERS=4 WEB_THREADS=8 PORT=8000 python serve.py --host 0.0.0.0
+
+SIGTERM (or Ctrl+C) stops accepting connections and lets in-flight
+requests finish for up to --graceful-timeout seconds.
+"""
+import argparse
+import os
+import sys
+import threading
+
+# Analysis jobs are computed once before forking instead of on threads
+# that the workers would not inherit
+os.environ.setdefault('DATASET_PRECOMPUTE', '0')
+# Each forked worker starts its own inference pool (see post_fork)
+os.environ.setdefault('INFERENCE_POOL_WARM', '0')
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:
+    BaseApplication = None
+
+try:
+    import waitress
+except ImportError:
+    waitress = None
+
+SERVERS = ['auto', 'gunicorn', 'waitress', 'dev']
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the backend with a production WSGI server")
+    parser.add_argument('--host', default=os.environ.get('HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 5000)))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('WEB_WORKERS', os.cpu_count() or 1)),
+                        help="worker processes (gunicorn only)")
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('WEB_THREADS', 4)),
+                        help="threads per worker")
+    parser.add_argument('--timeout', type=int, default=int(os.environ.get('WEB_TIMEOUT', 120)),
+                        help="seconds before a stuck worker is restarted")
+    parser.add_argument('--graceful-timeout', type=int, default=int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 30)),
+                        help="seconds in-flight requests get to finish on shutdown")
+    parser.add_argument('--server', choices=SERVERS, default=os.environ.get('WEB_SERVER', 'auto'))
+    parser.add_argument('--no-precompute', action='store_true',
+                        help="do not compute dataset statistics, PCA, clusters and evaluation before serving")
+    return parser.parse_args(argv)
+
+def pick_server(requested):
+    if requested != 'auto':
+        return requested
+    if BaseApplication is not None and hasattr(os, 'fork'):
+        return 'gunicorn'
+    if waitress is not None:
+        return 'waitress'
+    return 'dev'
+
+def load_app(precompute=True):
+    """Import the app (loading models) and optionally fill the analysis caches"""
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    os.chdir(backend_dir)
+    if backend_dir not in sys.path:
+        sys.path.insert(0, backend_dir)
+    
+    import app as backend
+    if precompute:
+        backend.warm_dataset_caches(background=False)
+    return backend
+
+if BaseApplication is not None:
+    class GunicornServer(BaseApplication):
+        """gunicorn configured from code, serving an already imported app"""
+        
+        def __init__(self, application, options):
+            self.application = application
+            self.options = options
+            super().__init__()
+        
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+        
+        def load(self):
+            return self.application
+
+def post_fork(server, worker):
+    """Restart the per-process background threads that fork does not copy"""
+    import app as backend
+    if backend.WATCHER is not None:
+        backend.WATCHER.start()
+    if backend.POOL is not None:
+        threading.Thread(target=backend.POOL.warm, name="inference-pool-warm", daemon=True).start()
+
+def worker_exit(server, worker):
+    import app as backend
+    if backend.WATCHER is not None:
+        backend.WATCHER.stop()
+    if backend.POOL is not None:
+        backend.POOL.shutdown()
+
+def run_gunicorn(backend, args):
+    options = {
+        'bind': f"{args.host}:{args.port}",
+        'workers': args.workers,
+        'threads': args.threads,
+        'worker_class': 'gthread' if args.threads > 1 else 'sync',
+        'preload_app': True,
+        'timeout': args.timeout,
+        'graceful_timeout': args.graceful_timeout,
+        'post_fork': post_fork,
+        'worker_exit': worker_exit
+    }
+    GunicornServer(backend.app, options).run()
+
+def main(argv=None):
+    args = parse_args(argv)
+    server = pick_server(args.server)
+    if server == 'gunicorn' and BaseApplication is None:
+        sys.exit("gunicorn is not installed (pip install gunicorn)")
+    if server == 'waitress' and waitress is None:
+        sys.exit("waitress is not installed (pip install waitress)")
+    
+    backend = load_app(precompute=not args.no_precompute)
+    print(f"Serving on http://{args.host}:{args.port}/api with {server} "
+          f"({args.workers if server == 'gunicorn' else 1} worker(s) x {args.threads} thread(s))")
+    
+    if server == 'gunicorn':
+        run_gunicorn(backend, args)
+    elif server == 'waitress':
+        waitress.serve(backend.app, host=args.host, port=args.port, threads=args.threads)
+    else:
+        if args.server == 'auto':
+            print("Neither gunicorn nor waitress is installed; using Flask's threaded server")
+        backend.app.run(host=args.host, port=args.port, threaded=True, debug=False, use_reloader=False)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+"""
+Prediction cache shared by every worker process on a host.
+
+Each process of serve.py would otherwise keep its own PredictionCache
+and its own misses. SharedPredictionCache keeps the same
+(model, artifact version, feature row) keys in one SQLite database in
+WAL mode, which stands in for a remote cache. Readers never block each
+other or the writer, so lookups take no lock. Writes are serialized by
+SQLite.
+
+Entries are evicted oldest-inserted first, so a hit does not need a
+write to update its recency. Counting the table is O(n), so eviction
+runs only after the ids have advanced by evict_every since this process
+last trimmed it. The table can exceed max_entries by up to that many rows
+in between. Caching is best effort: if the database is
+locked for longer than busy_timeout, the rows are simply scored.
+"""
+import os
+import sqlite3
+import threading
+
+from dataset_store import DATASET_CACHE_DIR
+from prediction_cache import PredictionCache
+
+PREDICTION_CACHE_PATH = os.environ.get('PREDICTION_CACHE_PATH', os.path.join(DATASET_CACHE_DIR, 'predictions.sqlite'))
+# Rows per SELECT ... IN (...) lookup
+LOOKUP_CHUNK = 500
+# Inserts between evictions, as a fraction of max_entries
+EVICT_FRACTION = 0.02
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS predictions (
+    id INTEGER PRIMARY KEY,
+    model TEXT NOT NULL,
+    version TEXT NOT NULL,
+    row BLOB NOT NULL,
+    probability REAL NOT NULL,
+    expires REAL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS predictions_key ON predictions (model, version, row);
+"""
+
+class SharedPredictionCache(PredictionCache):
+    """PredictionCache stored in a SQLite (WAL) file that all local workers open"""
+    
+    backend = 'sqlite'
+    
+    def __init__(self, path=PREDICTION_CACHE_PATH, busy_timeout=0.05, evict_every=None, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.evict_every = evict_every or max(1, int(self.max_entries * EVICT_FRACTION))
+        self._next_eviction = 0
+        self.errors = 0
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with sqlite3.connect(path, timeout=5.0) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+        conn.close()
+    
+    def _conn(self):
+        """One connection per thread, reopened in a forked child"""
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None,
+                                         check_same_thread=False)
+            local.conn.execute('PRAGMA synchronous=NORMAL')
+            local.pid = os.getpid()
+        return local.conn
+    
+    def _failed(self, action, error):
+        with self._lock:
+            self.errors += 1
+        print(f"Shared prediction cache {action} failed: {error}")
+    
+    def _drop_version(self, model_name, version):
+        try:
+            self._conn().execute('DELETE FROM predictions WHERE model = ? AND version = ?',
+                                 (model_name, version or ''))
+        except sqlite3.Error as e:
+            self._failed("invalidation", e)
+    
+    def _lookup(self, model_name, version, rows, probabilities, now):
+        positions = {}
+        for i, row in enumerate(rows):
+            positions.setdefault(row, []).append(i)
+        found = set()
+        expired = 0
+        unique = list(positions)
+        try:
+            conn = self._conn()
+            for start in range(0, len(unique), LOOKUP_CHUNK):
+                chunk = unique[start:start + LOOKUP_CHUNK]
+                cursor = conn.execute(
+                    'SELECT row, probability, expires FROM predictions '
+                    f'WHERE model = ? AND version = ? AND row IN ({",".join("?" * len(chunk))})',
+                    [model_name, version or ''] + chunk
+                )
+                for row, probability, expires in cursor:
+                    if expires is not None and expires <= now:
+                        expired += len(positions[row])
+                        continue
+                    probabilities[positions[row]] = probability
+                    found.add(row)
+        except sqlite3.Error as e:
+            self._failed("lookup", e)
+            found = set()
+        missing = [i for row in unique if row not in found for i in positions[row]]
+        return sorted(missing), expired
+    
+    def _store(self, model_name, version, rows, probabilities, expires):
+        values = [(model_name, version or '', row, probability, expires)
+                  for row, probability in zip(rows, probabilities)]
+        conn = self._conn()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.executemany(
+                    'INSERT OR REPLACE INTO predictions (model, version, row, probability, expires) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    values
+                )
+                # MAX(id) is one rowid b-tree lookup; the COUNT below only runs every evict_every ids
+                last_id = conn.execute('SELECT MAX(id) FROM predictions').fetchone()[0] or 0
+                evicted = 0
+                if last_id >= self._next_eviction:
+                    # By count, not by id: invalidations and replaces leave gaps in the ids.
+                    # MAX(..., 0) matters because a negative LIMIT means no limit.
+                    evicted = conn.execute(
+                        'DELETE FROM predictions WHERE id IN (SELECT id FROM predictions ORDER BY id '
+                        'LIMIT MAX((SELECT COUNT(*) FROM predictions) - ?, 0))',
+                        (self.max_entries,)
+                    ).rowcount
+                conn.execute('COMMIT')
+                if last_id >= self._next_eviction:
+                    self._next_eviction = last_id + self.evict_every
+            except sqlite3.Error:
+                conn.execute('ROLLBACK')
+                raise
+        except sqlite3.Error as e:
+            self._failed("store", e)
+            return
+        if evicted > 0:
+            with self._lock:
+                self.evictions += evicted
+    
+    def size(self):
+        try:
+            return self._conn().execute('SELECT COUNT(*) FROM predictions').fetchone()[0]
+        except sqlite3.Error:
+            return None
+    
+    def clear(self):
+        self._conn().execute('DELETE FROM predictions')
+    
+    def metrics(self):
+        metrics = super().metrics()
+        metrics.update(path=os.path.abspath(self.path), errors=self.errors, evict_every=self.evict_every)
+        return metrics
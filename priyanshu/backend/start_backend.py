@@ -10,6 +10,11 @@ def check_port(port):
     sock.close()
     return result != 0
 
+def pause_before_exit():
+    """Wait for Enter only when someone is at a terminal (not in containers or services)"""
+    if sys.stdin is not None and sys.stdin.isatty():
+        input("\nPress Enter to exit...")
+
 def main():
     print("=" * 60)
     print("Starting Backend Server")
@@ -27,7 +32,7 @@ def main():
     except ImportError as e:
         print(f"✗ Missing dependency: {e}")
         print("\nInstall with: pip install -r requirements.txt")
-        input("\nPress Enter to exit...")
+        pause_before_exit()
         sys.exit(1)
     
     # Check port
@@ -35,7 +40,7 @@ def main():
         print("⚠ Port 5000 is already in use!")
         print("   Please stop any process using port 5000")
         print("   Or kill it with: netstat -ano | findstr :5000")
-        input("\nPress Enter to exit...")
+        pause_before_exit()
         sys.exit(1)
     
     print("✓ Port 5000 is available")
@@ -59,14 +64,14 @@ def main():
         
         # Run app
         app.run(debug=True, port=5000, host='127.0.0.1', use_reloader=False)
-        
+    
     except KeyboardInterrupt:
         print("\n\nServer stopped by user")
     except Exception as e:
         print(f"\n✗ ERROR: {e}")
         import traceback
         traceback.print_exc()
-        input("\nPress Enter to exit...")
+        pause_before_exit()
         sys.exit(1)
 
 if __name__ == '__main__':
@@ -0,0 +1,67 @@
+"""
+Chunked bulk scoring of CSV files.
+
+Rows are read, scored and written one chunk at a time, so memory stays
+flat no matter how large the input file is.
+"""
+import numpy as np
+import pandas as pd
+
+from inference import FEATURE_NAMES, predict_proba_batch, label_predictions
+
+DEFAULT_CHUNK_SIZE = 50000
+
+# Identifier columns copied through to the scored output when present
+ID_COLUMNS = ['user_id', 'ad_id']
+
+OUTPUT_FORMATS = ['csv', 'ndjson']
+
+def score_chunk(chunk, model_name='svm', passthrough=None):
+    """Score one DataFrame chunk, returning passthrough columns plus results"""
+    passthrough = [col for col in (passthrough or ID_COLUMNS) if col in chunk.columns]
+    X = chunk[FEATURE_NAMES].to_numpy(dtype=np.float64)
+    
+    # Rows with missing features cannot be scored
+    valid = ~np.isnan(X).any(axis=1)
+    probabilities = np.full(len(X), np.nan)
+    if valid.any():
+        probabilities[valid] = predict_proba_batch(X[valid], model_name)
+    
+    predictions, confidence = label_predictions(probabilities)
+    
+    scored = chunk[passthrough].copy()
+    scored['probability'] = probabilities
+    scored['prediction'] = np.where(valid, predictions, None)
+    scored['confidence'] = np.where(valid, confidence, None)
+    return scored
+
+def iter_scored_chunks(source, model_name='svm', chunksize=DEFAULT_CHUNK_SIZE, passthrough=None):
+    """Yield scored DataFrames for each chunk of a CSV path or file object"""
+    wanted = set(FEATURE_NAMES) | set(passthrough or ID_COLUMNS)
+    reader = pd.read_csv(source, chunksize=chunksize, usecols=lambda col: col in wanted)
+    for chunk in reader:
+        missing = [name for name in FEATURE_NAMES if name not in chunk.columns]
+        if missing:
+            raise ValueError(f"CSV is missing feature columns: {', '.join(missing)}")
+        yield score_chunk(chunk, model_name, passthrough)
+
+def iter_csv(chunks):
+    """Serialize scored chunks as CSV text, header first"""
+    header = True
+    for chunk in chunks:
+        yield chunk.to_csv(index=False, header=header)
+        header = False
+
+def iter_ndjson(chunks):
+    """Serialize scored chunks as newline-delimited JSON"""
+    for chunk in chunks:
+        if len(chunk) == 0:
+            continue
+        text = chunk.to_json(orient='records', lines=True)
+        yield text if text.endswith('\n') else text + '\n'
+
+def serialize_chunks(chunks, output_format='csv'):
+    """Pick the serializer for an output format"""
+    if output_format == 'ndjson':
+        return iter_ndjson(chunks)
+    return iter_csv(chunks)
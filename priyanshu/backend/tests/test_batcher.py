@@ -0,0 +1,35 @@
+import threading
+
+import numpy as np
+import pytest
+
+from batcher import BatchTimeoutError, MicroBatcher
+
+def test_timed_out_rows_are_cancelled_and_never_scored():
+    scoring = threading.Event()
+    release = threading.Event()
+    scored = []
+    
+    def score_fn(X, model_name):
+        scored.extend(X[:, 0].tolist())
+        scoring.set()
+        release.wait(5)
+        return X[:, 0]
+    
+    batcher = MicroBatcher(score_fn, max_batch_rows=1, max_wait_ms=0.0)
+    stalled = batcher.submit('svm', np.array([0.0]))
+    assert scoring.wait(5)
+    
+    with pytest.raises(BatchTimeoutError):
+        batcher.predict_many('svm', [np.array([1.0]), np.array([2.0]), np.array([3.0])], timeout=0.05)
+    
+    release.set()
+    assert stalled.result(5) == 0.0
+    # The worker has to pass the cancelled rows to reach this one
+    assert batcher.predict('svm', np.array([4.0]), timeout=5) == 4.0
+    assert scored == [0.0, 4.0]
+    
+    stats = batcher.metrics()["models"]["svm"]
+    assert stats["timeouts"] == 1
+    assert stats["cancelled"] == 3
+    assert stats["rows"] == 2
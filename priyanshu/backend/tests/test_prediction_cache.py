@@ -0,0 +1,23 @@
+import numpy as np
+
+from prediction_cache import PredictionCache
+
+def score_first_column(X, model_name):
+    return np.asarray(X, dtype=np.float64)[:, 0].copy()
+
+def test_same_row_same_probability_in_cached_and_bypassed_batches():
+    cache = PredictionCache(max_entries=100, quantize={'age': 10.0}, max_batch=4)
+    row = np.array([[34.0, 1, 2, 0, 100, 5, 60.5, 0.2, 0.5, 3]])
+    
+    small = cache.score(row, 'svm', score_first_column)
+    large = cache.score(np.repeat(row, 10, axis=0), 'svm', score_first_column)
+    
+    assert cache.metrics()["models"]["svm"]["bypassed"] == 10
+    assert small[0] == 30.0
+    np.testing.assert_array_equal(large, np.full(10, small[0]))
+
+def test_disabled_cache_still_quantizes():
+    cache = PredictionCache(max_entries=0, quantize={'age': 10.0})
+    row = np.array([[34.0, 1, 2, 0, 100, 5, 60.5, 0.2, 0.5, 3]])
+    
+    assert cache.score(row, 'svm', score_first_column)[0] == 30.0
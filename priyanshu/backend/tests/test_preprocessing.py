@@ -0,0 +1,149 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import inference
+from evaluation import TARGET_COLUMN, holdout_mask
+from incremental import iter_split_chunks
+from inference import FEATURE_NAMES, predict_proba_batch
+from preprocessing import Preprocessor, date_parts, encode_csv, fit_csv
+from save_models import MANIFEST_FILE, check_preprocessing, preprocessing_sha256, read_split
+
+TEST_FRACTION = 0.2
+
+class RecordingPipeline:
+    """Stands in for a compiled pipeline and keeps the matrices it is given"""
+    kind = 'test'
+    
+    def __init__(self):
+        self.calls = []
+    
+    def predict_proba(self, X, timings=None):
+        self.calls.append(np.array(X))
+        return np.full(len(X), 0.5)
+
+def write_dataset(path, n=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({
+        'age': rng.integers(18, 65, n).astype(float),
+        'gender': rng.integers(0, 2, n),
+        'location': rng.integers(0, 3, n),
+        'device_type': rng.integers(0, 3, n),
+        'impressions': rng.integers(100, 5000, n),
+        'clicks': rng.integers(0, 200, n),
+        'engagement_duration': rng.uniform(0, 300, n),
+        'sentiment_score': rng.uniform(-1, 1, n),
+        'previous_interaction_score': rng.uniform(0, 1, n),
+        'ad_category': rng.integers(0, 5, n),
+        TARGET_COLUMN: rng.integers(0, 2, n)
+    })
+    # Outliers on both sides, and an incomplete row
+    frame.loc[::97, 'impressions'] = 10 ** 6
+    frame.loc[::89, 'age'] = -40.0
+    frame.loc[5, 'clicks'] = np.nan
+    frame.to_csv(path, index=False)
+    return frame
+
+def fitted(path):
+    training_rows = lambda offset, n: ~holdout_mask(np.arange(offset, offset + n), TEST_FRACTION)
+    return fit_csv(str(path), FEATURE_NAMES + [TARGET_COLUMN], 500, training_rows)
+
+def test_training_and_serving_see_the_same_matrix(tmp_path, monkeypatch):
+    path = tmp_path / 'data.csv'
+    write_dataset(path)
+    # Read back, so the raw rows carry the CSV's float rounding like the training rows
+    frame = pd.read_csv(path)
+    preprocessor = fitted(path)
+    X_train, _, X_test, _, _ = read_split(str(path), 500, TEST_FRACTION, preprocessor)
+    
+    pipeline = RecordingPipeline()
+    monkeypatch.setitem(inference.PIPELINES, 'svm', pipeline)
+    monkeypatch.setitem(inference.PREPROCESSING, 'preprocessor', Preprocessor.from_dict(preprocessor.to_dict()))
+    raw = frame[FEATURE_NAMES].to_numpy(dtype=np.float64)
+    complete = ~np.isnan(raw).any(axis=1)
+    held_out = holdout_mask(np.arange(len(frame)), TEST_FRACTION)
+    predict_proba_batch(raw[complete & ~held_out], 'svm')
+    predict_proba_batch(raw[complete & held_out], 'svm')
+    
+    np.testing.assert_array_equal(pipeline.calls[0], X_train)
+    np.testing.assert_array_equal(pipeline.calls[1], X_test)
+    # The outliers really were clipped, not dropped
+    assert len(X_train) + len(X_test) == complete.sum()
+    assert X_train[:, FEATURE_NAMES.index('impressions')].max() < 10 ** 6
+    assert X_train[:, FEATURE_NAMES.index('age')].min() > -40.0
+
+def test_out_of_core_chunks_match_read_split(tmp_path):
+    path = tmp_path / 'data.csv'
+    write_dataset(path)
+    preprocessor = fitted(path)
+    X_train, y_train, _, _, _ = read_split(str(path), 500, TEST_FRACTION, preprocessor)
+    
+    chunks = list(iter_split_chunks(str(path), 500, TEST_FRACTION, 1.0, preprocessor))
+    np.testing.assert_array_equal(np.concatenate([X for X, _, _ in chunks]), X_train)
+    np.testing.assert_array_equal(np.concatenate([y for _, y, _ in chunks]), y_train)
+
+def test_issues_flag_clipped_outliers_and_unknown_categories(tmp_path):
+    path = tmp_path / 'data.csv'
+    write_dataset(path)
+    preprocessor = fitted(path)
+    row = np.array([[30, 7, 1, 0, 10 ** 6, 5, 60, 0.2, 0.5, 3]], dtype=np.float64)
+    
+    issues = preprocessor.issues(row, FEATURE_NAMES)[0]
+    assert {(issue["field"], issue["issue"]) for issue in issues} == {
+        ('impressions', 'outlier'), ('gender', 'unknown_category')
+    }
+    outlier = next(issue for issue in issues if issue["issue"] == 'outlier')
+    assert outlier["clipped_to"] == preprocessor.transform(row, FEATURE_NAMES)[0, 4]
+
+def test_partial_retrain_refuses_to_change_kept_models_preprocessing(tmp_path):
+    path = tmp_path / 'data.csv'
+    write_dataset(path)
+    state = preprocessing_sha256(fitted(path))
+    output = tmp_path / 'models'
+    output.mkdir()
+    for name in ('svm', 'random_forest'):
+        (output / inference.MODEL_FILES[name]).write_bytes(b'')
+    manifest = {"models": {"svm": {"preprocessing_sha256": state}, "random_forest": {"preprocessing_sha256": state}}}
+    (output / MANIFEST_FILE).write_text(json.dumps(manifest))
+    
+    # Same fences, or every kept model retrained: allowed
+    check_preprocessing(str(output), ['svm'], state)
+    check_preprocessing(str(output), ['svm', 'random_forest'], None)
+    # Refit fences or --no-preprocess would change how random_forest is served
+    with pytest.raises(SystemExit, match='random_forest'):
+        check_preprocessing(str(output), ['svm'], 'other')
+    with pytest.raises(SystemExit, match='random_forest'):
+        check_preprocessing(str(output), ['svm'], None)
+    # Models with no recorded state were trained on raw rows
+    (output / inference.MODEL_FILES['pca_lr']).write_bytes(b'')
+    with pytest.raises(SystemExit, match='pca_lr'):
+        check_preprocessing(str(output), ['svm', 'random_forest'], state)
+
+def test_date_parts_number_days_like_spark():
+    day_of_week, month, year = date_parts(np.array(['2025-04-06 09:00:00', '2025-04-05', 'not a date', '2025-04-06']))
+    # 2025-04-06 was a Sunday (1 in Spark), 2025-04-05 a Saturday (7)
+    np.testing.assert_array_equal(day_of_week, [1, 7, np.nan, 1])
+    np.testing.assert_array_equal(month, [4, 4, np.nan, 4])
+    np.testing.assert_array_equal(year, [2025, 2025, np.nan, 2025])
+
+def test_encode_csv_chunks_match_one_frame(tmp_path):
+    path = tmp_path / 'data.csv'
+    frame = write_dataset(path, n=300)
+    frame['interaction_timestamps'] = pd.date_range('2025-01-01', periods=len(frame), freq='h').astype(str)
+    frame.to_csv(path, index=False)
+    preprocessor = fit_csv(str(path), FEATURE_NAMES, 100)
+    # A label the vocabulary has not seen
+    frame.loc[7, 'location'] = 9
+    frame.to_csv(path, index=False)
+    
+    encoded = pd.concat(list(encode_csv(str(path), preprocessor, 64)), ignore_index=True)
+    pd.testing.assert_frame_equal(encoded, preprocessor.encode(pd.read_csv(path)))
+    # dropLast: one column fewer than labels; the last label and unseen ones are all zeros
+    labels = preprocessor.vocabularies['location'].labels
+    onehot = encoded[[f"location_onehot_{i}" for i in range(len(labels) - 1)]].to_numpy()
+    index = encoded['location_index'].to_numpy()
+    assert index[7] == -1
+    np.testing.assert_array_equal(onehot.sum(axis=1), (index >= 0) & (index < len(labels) - 1))
+    np.testing.assert_array_equal(encoded['year'].unique(), [2025])
@@ -0,0 +1,25 @@
+import pytest
+
+from request_schema import FEATURE_SCHEMA, SchemaError, UnsupportedPayload, decode_payload
+
+def test_empty_rows_is_a_schema_error():
+    with pytest.raises(SchemaError, match="rows: must not be empty"):
+        FEATURE_SCHEMA.parse_batch({"rows": []})
+
+def test_empty_columns_is_a_schema_error():
+    columns = {field: [] for field in FEATURE_SCHEMA.fields}
+    with pytest.raises(SchemaError, match="columns: must not be empty"):
+        FEATURE_SCHEMA.parse_batch({"columns": columns})
+
+def test_empty_float32_body_is_a_schema_error():
+    data = decode_payload('application/octet-stream', b'', lambda: None, {})
+    with pytest.raises(SchemaError, match="float32: must not be empty"):
+        FEATURE_SCHEMA.parse_batch(data)
+
+def test_non_object_batch_is_a_schema_error():
+    with pytest.raises(SchemaError):
+        FEATURE_SCHEMA.parse_batch([[0.0] * 10])
+
+def test_non_object_json_payload_is_rejected():
+    with pytest.raises(UnsupportedPayload):
+        decode_payload('application/json', b'[]', lambda: [], {})
@@ -0,0 +1,48 @@
+import numpy as np
+
+from shared_cache import SharedPredictionCache
+
+def score_first_column(X, model_name):
+    return np.asarray(X, dtype=np.float64)[:, 0].copy()
+
+def rows(start, count):
+    X = np.zeros((count, 10))
+    X[:, 0] = np.arange(start, start + count)
+    return X
+
+def stored_rows(cache):
+    return [row for row, in cache._conn().execute('SELECT row FROM predictions ORDER BY id')]
+
+def test_eviction_keeps_max_entries_after_id_gaps(tmp_path):
+    cache = SharedPredictionCache(path=str(tmp_path / 'predictions.sqlite'), max_entries=10, evict_every=1)
+    cache.score(rows(0, 6), 'svm', score_first_column)
+    cache.score(rows(100, 2), 'pca_lr', score_first_column)
+    cache.score(rows(6, 2), 'svm', score_first_column)
+    # Invalidating pca_lr leaves a gap in the middle of the ids
+    cache._drop_version('pca_lr', None)
+    assert cache.size() == 8
+    
+    cache.score(rows(8, 4), 'svm', score_first_column)
+    assert cache.size() == 10
+    assert cache.metrics()["evictions"] == 2
+    # Oldest inserted go first
+    assert stored_rows(cache) == [row.tobytes() for row in rows(2, 10)]
+
+def test_eviction_never_empties_a_small_cache(tmp_path):
+    cache = SharedPredictionCache(path=str(tmp_path / 'predictions.sqlite'), max_entries=10, evict_every=1)
+    cache.score(rows(0, 3), 'svm', score_first_column)
+    cache.score(rows(3, 3), 'svm', score_first_column)
+    assert cache.size() == 6
+
+def test_eviction_runs_in_batches_and_stays_bounded(tmp_path):
+    cache = SharedPredictionCache(path=str(tmp_path / 'predictions.sqlite'), max_entries=10, evict_every=5)
+    sizes = []
+    for start in range(40):
+        cache.score(rows(start, 1), 'svm', score_first_column)
+        sizes.append(cache.size())
+    
+    assert max(sizes) <= 10 + 5
+    assert sizes[-1] >= 10
+    # Trimmed back to max_entries once every 5 inserts, not on every one
+    assert sizes.count(10) <= 40 // 5 + 1
+    assert cache.metrics()["evictions"] == 40 - sizes[-1]
@@ -771,14 +771,32 @@ async function loadConfusionMatrices() {
     }
 }
 
+// Fetch an analysis endpoint, polling while it answers 202 (job still computing)
+async function fetchWhenReady(url, attempts = 30, delayMs = 2000) {
+    let response = await fetch(url);
+    for (let attempt = 1; response.status === 202 && attempt < attempts; attempt++) {
+        await new Promise(resolve => setTimeout(resolve, delayMs));
+        response = await fetch(url);
+    }
+    return response;
+}
+
 // Load feature importance
 async function loadFeatureImportance() {
     try {
-        const response = await fetch(`${API_BASE}/visualizations/feature_importance`);
+        const response = await fetchWhenReady(`${API_BASE}/visualizations/feature_importance`);
         let data;
         
+        if (response.status === 202) {
+            console.warn('Feature importance is still being computed, try reloading later');
+            return;
+        }
         if (!response.ok) {
-            console.error('Failed to load feature importance, using fallback');
+            if (response.status === 404) {
+                console.error('Feature importance not found (no dataset), using fallback');
+            } else {
+                console.error(`Failed to load feature importance (HTTP ${response.status}), using fallback`);
+            }
             data = {
                 "random_forest": {
                     "PCA_7": 0.408,
@@ -976,6 +994,20 @@ function createMissingDataFallback() {
 }
 
 // PCA Visualization
+// Decode little-endian float32 x,y pairs sent as base64 by /visualizations/pca
+function decodePCAPoints(data) {
+    if (data.encoding !== 'float32-le-base64' || !data.points_b64) {
+        return data.points || [];
+    }
+    const bytes = Uint8Array.from(atob(data.points_b64), c => c.charCodeAt(0));
+    const view = new DataView(bytes.buffer);
+    const points = new Array(bytes.length / 8);
+    for (let i = 0; i < points.length; i++) {
+        points[i] = { x: view.getFloat32(i * 8, true), y: view.getFloat32(i * 8 + 4, true) };
+    }
+    return points;
+}
+
 async function loadPCAVisualization() {
     try {
         const response = await fetch(`${API_BASE}/visualizations/pca`);
@@ -998,15 +1030,17 @@ async function loadPCAVisualization() {
             data: {
                 datasets: [{
                     label: 'PCA Components',
-                    data: data.points || [],
+                    data: decodePCAPoints(data),
                     backgroundColor: 'rgba(0, 212, 255, 0.6)',
                     borderColor: '#00d4ff',
                     borderWidth: 1,
-                    pointRadius: 3
+                    pointRadius: 1
                 }]
             },
             options: {
                 responsive: true,
+                animation: false,
+                parsing: false,
                 maintainAspectRatio: true,
                 scales: {
                     x: {